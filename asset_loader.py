@@ -0,0 +1,179 @@
+"""Concurrent asset loading.
+
+PNG and WAV files are decoded (and images scaled) on a thread pool; pygame
+releases the GIL while it decodes, so the slow files overlap. Surfaces are
+converted to the display format on the main thread, which is the only thread
+allowed to touch the display. Loaded assets are cached so later calls to
+load_image / load_sound / load_sprite_sheet never go back to the disk.
+
+Run this file directly to compare serial and threaded load times:
+
+    python asset_loader.py
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pygame
+
+from asset_pack import default_manifest, open_pack, slice_sheet
+
+
+def _decode_image(path, size):
+    image = pygame.image.load(path)
+    if size:
+        image = pygame.transform.scale(image, size)
+    return image
+
+
+def _decode_sprite_sheet(path, frame_count, frame_width, frame_height, size):
+    return slice_sheet(pygame.image.load(path), frame_count, frame_width, frame_height, size)
+
+
+def _decode_sound(path, volume):
+    sound = pygame.mixer.Sound(path)
+    sound.set_volume(volume)
+    return sound
+
+
+def _to_display_format(surface):
+    if surface.get_flags() & pygame.SRCALPHA:
+        return surface.convert_alpha()
+    return surface.convert()
+
+
+class AssetLoader:
+    def __init__(self, max_workers=None, pack=None):
+        # max_workers=0 decodes everything serially on the calling thread
+        self.max_workers = min(8, os.cpu_count() or 1) if max_workers is None else max_workers
+        self.pack = pack
+        self._jobs = []
+        self._cache = {}
+
+    def add_image(self, path, size=None):
+        key = ('image', path, tuple(size) if size else None)
+        self._jobs.append((key, _decode_image, (path, key[2])))
+
+    def add_sprite_sheet(self, path, frame_count, frame_width, frame_height, size=None):
+        key = ('sheet', path, frame_count, frame_width, frame_height, tuple(size) if size else None)
+        self._jobs.append((key, _decode_sprite_sheet, (path, frame_count, frame_width, frame_height, key[5])))
+
+    def add_sound(self, path, volume=0.8):
+        self._jobs.append((('sound', path), _decode_sound, (path, volume)))
+
+    def image(self, path, size=None):
+        return self._cache.get(('image', path, tuple(size) if size else None))
+
+    def sprite_sheet(self, path, frame_count, frame_width, frame_height, size=None):
+        return self._cache.get(('sheet', path, frame_count, frame_width, frame_height, tuple(size) if size else None))
+
+    def sound(self, path):
+        return self._cache.get(('sound', path))
+
+    def _from_pack(self, key):
+        if not self.pack or key[-1] is None:
+            return None
+        if key[0] == 'image':
+            return self.pack.image(key[1], key[2])
+        if key[0] == 'sheet':
+            return self.pack.sprite_sheet(*key[1:])
+        return None
+
+    def _finish(self, key, asset):
+        # Runs on the main thread: display conversion is not thread safe
+        if key[0] == 'image':
+            asset = _to_display_format(asset)
+        elif key[0] == 'sheet':
+            asset = [_to_display_format(frame) for frame in asset]
+        self._cache[key] = asset
+
+    def load(self, on_progress=None):
+        """Load every queued asset, calling on_progress(loaded, total) as they finish.
+
+        Returns timing stats: wall-clock time and the summed per-file decode
+        time, which is what a serial load would have cost.
+        """
+        jobs, self._jobs = self._jobs, []
+        total = len(jobs)
+        stats = {'assets': 0, 'failed': 0, 'workers': self.max_workers, 'decode_ms': 0.0}
+        start = time.perf_counter()
+
+        def timed(decode, args):
+            t0 = time.perf_counter()
+            try:
+                return decode(*args), time.perf_counter() - t0
+            except (pygame.error, OSError) as e:
+                print(f"Error loading {args[0]}: {e}")
+                return None, time.perf_counter() - t0
+
+        def complete(key, result):
+            asset, seconds = result
+            stats['decode_ms'] += seconds * 1000
+            if asset is None:
+                stats['failed'] += 1
+            else:
+                self._finish(key, asset)
+                stats['assets'] += 1
+            if on_progress:
+                on_progress(stats['assets'] + stats['failed'], total)
+
+        pending = {}
+        executor = ThreadPoolExecutor(self.max_workers) if self.max_workers > 0 else None
+        try:
+            for key, decode, args in jobs:
+                if key in self._cache:
+                    stats['assets'] += 1
+                    continue
+                baked = self._from_pack(key)
+                if baked is not None:
+                    complete(key, (baked, 0.0))
+                elif executor is None:
+                    complete(key, timed(decode, args))
+                else:
+                    pending[executor.submit(timed, decode, args)] = key
+            while pending:
+                # Short timeout keeps the caller's progress screen and event queue alive
+                done, _ = wait(pending, timeout=1 / 60, return_when=FIRST_COMPLETED)
+                for future in done:
+                    complete(pending.pop(future), future.result())
+                if not done and on_progress:
+                    on_progress(stats['assets'] + stats['failed'], total)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        stats['wall_ms'] = (time.perf_counter() - start) * 1000
+        return stats
+
+
+def queue_game_assets(loader, width, height, grid_size, combat_sprite_size, sounds):
+    images, sheets = default_manifest(width, height, grid_size, combat_sprite_size)
+    for path, size in images:
+        if os.path.exists(path):
+            loader.add_image(path, size)
+    for path, frame_count, frame_width, frame_height, size in sheets:
+        loader.add_sprite_sheet(path, frame_count, frame_width, frame_height, size)
+    for path in sounds:
+        loader.add_sound(path)
+
+
+def main():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    sounds = sorted(os.path.join('sounds', name) for name in os.listdir('sounds'))
+    for label, workers, pack in [('serial', 0, None), ('threaded', None, None), ('baked pack', None, open_pack())]:
+        if label == 'baked pack' and pack is None:
+            print("No asset pack baked; run asset_pack.py to include it in the comparison")
+            continue
+        loader = AssetLoader(max_workers=workers, pack=pack)
+        queue_game_assets(loader, 1200, 800, 20, 100, sounds)
+        stats = loader.load()
+        print(f"{label:>10}: {stats['assets']} assets in {stats['wall_ms']:.0f} ms "
+              f"({stats['workers']} workers, {stats['decode_ms']:.0f} ms of decode work)")
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
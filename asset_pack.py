@@ -0,0 +1,218 @@
+"""Baked asset pack.
+
+Every image the game uses is decoded once, offline, scaled to the exact size the
+game draws it at and stored as raw pixels in a single indexed file. At runtime
+the pack is memory-mapped and surfaces are built straight from the mapping with
+``pygame.image.frombuffer``, so no PNG decoding or scaling happens on launch.
+
+Bake (or re-bake after changing any art) with:
+
+    python asset_pack.py
+
+The sizes below mirror the constants in dungeon-crawler-game.py. Any image the
+pack does not hold at the requested size, or whose source file changed after
+the bake, simply falls back to the normal decode path.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+
+import pygame
+
+from content import load as load_content
+
+PACK_PATH = 'assets.pack'
+PACK_VERSION = 1
+MAGIC = b'ELDPACK\x00'
+HEADER = struct.Struct('<8sII')  # magic, version, index length
+ALIGNMENT = 16
+
+
+def image_key(path, size):
+    return f"{path}@{size[0]}x{size[1]}"
+
+
+def sheet_key(path, frame_count, frame_width, frame_height, size):
+    return f"{path}#{frame_count}:{frame_width}x{frame_height}@{size[0]}x{size[1]}"
+
+
+def default_manifest(width=1200, height=800, grid_size=20, combat_sprite_size=100):
+    """Return (images, sheets) for everything the game loads at a fixed size."""
+    grid = (grid_size, grid_size)
+    combat = (combat_sprite_size, combat_sprite_size)
+    images = [
+        ('tiles/rock_tile.png', grid),
+        ('tiles/dungeon_tile1.png', grid),
+        ('tiles/dungeon_tile2.png', grid),
+        ('tiles/chest_tile.png', grid),
+        ('tiles/stairs_tile.png', grid),
+        ('background/start_menu.png', (width, height)),
+        ('background/battleground.png', (width, height)),
+    ]
+    # Treasure, party and enemy art is listed in the content tables
+    content = load_content()
+    images += [(path, (64, 64)) for path in dict.fromkeys(path for _, _, path, _ in content.treasures)]
+    images += [(path, combat) for path in content.role_sprites + content.enemy_sprites]
+    sheets = [
+        ('characters/sprite_sheets/player.png', 96, 16, 16, grid),
+        ('characters/sprite_sheets/enemies.png', 96, 16, 16, grid),
+        ('effects/blood - left 1.png', 16, 512, 512, (256, 256)),
+    ]
+    return images, sheets
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+def _pixel_format(surface):
+    return 'RGBA' if surface.get_flags() & pygame.SRCALPHA else 'RGBX'
+
+
+def slice_sheet(sheet, frame_count, frame_width, frame_height, size):
+    # Same slicing as load_sprite_sheet in the game, followed by the final scale
+    frames = []
+    frames_per_row = sheet.get_width() // frame_width
+    for i in range(frame_count):
+        x = (i % frames_per_row) * frame_width
+        y = (i // frames_per_row) * frame_height
+        frame = pygame.Surface((frame_width, frame_height), pygame.SRCALPHA)
+        frame.blit(sheet, (0, 0), (x, y, frame_width, frame_height))
+        if size and tuple(size) != (frame_width, frame_height):
+            frame = pygame.transform.scale(frame, size)
+        frames.append(frame)
+    return frames
+
+
+def bake(pack_path=PACK_PATH, manifest=None):
+    """Decode and scale every manifest entry and write the pack file."""
+    images, sheets = manifest or default_manifest()
+    blobs = []
+    data_size = 0
+
+    def add_blob(surface):
+        nonlocal data_size
+        pixel_format = _pixel_format(surface)
+        raw = pygame.image.tobytes(surface, pixel_format)
+        offset = data_size
+        blobs.append(raw)
+        data_size += len(raw)
+        padding = -data_size % ALIGNMENT
+        if padding:
+            blobs.append(b'\x00' * padding)
+            data_size += padding
+        return {'offset': offset, 'length': len(raw), 'format': pixel_format}
+
+    index = {'images': {}, 'sheets': {}}
+    for path, size in images:
+        if not os.path.exists(path):
+            print(f"Skipping missing image {path}")
+            continue
+        surface = pygame.transform.scale(pygame.image.load(path), size)
+        entry = add_blob(surface)
+        entry['size'] = list(size)
+        entry['source'] = _source_stamp(path)
+        index['images'][image_key(path, size)] = entry
+
+    for path, frame_count, frame_width, frame_height, size in sheets:
+        if not os.path.exists(path):
+            print(f"Skipping missing sprite sheet {path}")
+            continue
+        sheet = pygame.image.load(path)
+        frames = slice_sheet(sheet, frame_count, frame_width, frame_height, size)
+        index['sheets'][sheet_key(path, frame_count, frame_width, frame_height, size)] = {
+            'size': list(size),
+            'frames': [add_blob(frame) for frame in frames],
+            'source': _source_stamp(path),
+        }
+
+    index_bytes = json.dumps(index, separators=(',', ':')).encode('utf-8')
+    data_start = HEADER.size + len(index_bytes)
+    data_start += -data_start % ALIGNMENT
+    with open(pack_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, PACK_VERSION, len(index_bytes)))
+        f.write(index_bytes)
+        f.write(b'\x00' * (data_start - f.tell()))
+        for blob in blobs:
+            f.write(blob)
+    return len(index['images']), len(index['sheets']), data_start + data_size
+
+
+class AssetPack:
+    def __init__(self, path=PACK_PATH):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != PACK_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {PACK_VERSION} asset pack")
+        index_end = HEADER.size + index_length
+        self.index = json.loads(self._mmap[HEADER.size:index_end].decode('utf-8'))
+        self._data_start = index_end + (-index_end % ALIGNMENT)
+        self._view = memoryview(self._mmap)
+        self._fresh = {}
+
+    def close(self):
+        self._view = None
+        self._mmap.close()
+        self._file.close()
+
+    def _is_fresh(self, path, entry):
+        # One stat per source file so an edited asset is never shadowed by a stale bake
+        if path not in self._fresh:
+            try:
+                self._fresh[path] = _source_stamp(path) == entry['source']
+            except OSError:
+                self._fresh[path] = False
+        return self._fresh[path]
+
+    def _surface(self, blob, size):
+        start = self._data_start + blob['offset']
+        pixels = self._view[start:start + blob['length']]
+        return pygame.image.frombuffer(pixels, tuple(size), blob['format'])
+
+    def image(self, path, size):
+        entry = self.index['images'].get(image_key(path, size))
+        if entry is None or not self._is_fresh(path, entry):
+            return None
+        return self._surface(entry, entry['size'])
+
+    def sprite_sheet(self, path, frame_count, frame_width, frame_height, size):
+        entry = self.index['sheets'].get(sheet_key(path, frame_count, frame_width, frame_height, size))
+        if entry is None or not self._is_fresh(path, entry):
+            return None
+        return [self._surface(blob, entry['size']) for blob in entry['frames']]
+
+
+def open_pack(path=PACK_PATH):
+    """Map the baked pack if one exists, otherwise return None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return AssetPack(path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Ignoring asset pack {path}: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bake game images into a pre-scaled asset pack.")
+    parser.add_argument('--output', default=PACK_PATH, help="pack file to write")
+    parser.add_argument('--width', type=int, default=1200)
+    parser.add_argument('--height', type=int, default=800)
+    parser.add_argument('--grid-size', type=int, default=20)
+    parser.add_argument('--combat-sprite-size', type=int, default=100)
+    args = parser.parse_args()
+
+    manifest = default_manifest(args.width, args.height, args.grid_size, args.combat_sprite_size)
+    image_count, sheet_count, total_bytes = bake(args.output, manifest)
+    print(f"Baked {image_count} images and {sheet_count} sprite sheets "
+          f"into {args.output} ({total_bytes / (1024 * 1024):.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Memory cost of one dungeon level: sprite-per-entity layout vs. compact records.
+
+Generates real levels with the game's generate_dungeon, then rebuilds the
+same walls, chests, stairs and enemies two ways and measures the Python heap
+each one retains with tracemalloc:
+
+  sprites  - the old layout: a pygame Sprite (dict + rect + group entries)
+             for every wall, chest, stairs tile and enemy
+  records  - the current layout: OccupancyGrid cells, slotted Item/Stairs
+             records in a TileHash, and EnemyStore columns
+
+Pixel memory for the pre-rendered level surface lives in SDL, outside the
+Python heap, and is reported separately.
+
+    python bench_memory.py --levels 1 2 3 4 5
+"""
+import argparse
+import contextlib
+import gc
+import importlib.util
+import io
+import os
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from enemy_store import EnemyStore
+from entities import Item, Stairs
+from spatial import OccupancyGrid, TileHash
+
+GAME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dungeon-crawler-game.py')
+
+
+def load_game():
+    spec = importlib.util.spec_from_file_location('dungeon_crawler_game', GAME_PATH)
+    game = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(game)
+    return game
+
+
+class LegacySprite(pygame.sprite.Sprite):
+    # Mirrors the old Wall/Item/Stairs sprites: shared image, own rect
+    def __init__(self, image, x, y, grid_size, **attributes):
+        super().__init__()
+        self.image = image
+        self.rect = self.image.get_rect()
+        self.rect.x = x * grid_size
+        self.rect.y = y * grid_size
+        self.__dict__.update(attributes)
+
+
+def build_sprite_level(game, layout):
+    walls, items, stairs, enemies = layout
+    all_sprites = pygame.sprite.Group()
+    wall_group = pygame.sprite.Group()
+    item_group = pygame.sprite.Group()
+    enemy_group = pygame.sprite.Group()
+    for x, y in walls:
+        sprite = LegacySprite(game.rock_tile, x, y, game.GRID_SIZE)
+        wall_group.add(sprite)
+        all_sprites.add(sprite)
+    for x, y, item_type in items:
+        sprite = LegacySprite(game.chest_tile, x, y, game.GRID_SIZE, type=item_type)
+        item_group.add(sprite)
+        all_sprites.add(sprite)
+    all_sprites.add(LegacySprite(game.stairs_tile, stairs[0], stairs[1], game.GRID_SIZE))
+    for x, y, level in enemies:
+        # Old Enemy sprites held their own direction -> frames dict and stats
+        sprite = LegacySprite(
+            game.enemy_frames['down'][0], x, y, game.GRID_SIZE,
+            sprites={direction: list(frames) for direction, frames in game.enemy_frames.items()},
+            direction='down', current_frame=0, level=level, health=30 + level * 10,
+            attack=5 + level * 2, speed=1.0, vision_range=8, move_cooldown=0, move_delay=30, is_alive=True)
+        enemy_group.add(sprite)
+        all_sprites.add(sprite)
+    return all_sprites, wall_group, item_group, enemy_group
+
+
+def build_record_level(game, layout):
+    walls, items, stairs, enemies = layout
+    wall_grid = OccupancyGrid(game.COLS, game.ROWS)
+    for x, y in walls:
+        wall_grid.set_blocked(x, y)
+    level_items = TileHash()
+    for x, y, item_type in items:
+        item = Item(x, y, item_type)
+        level_items.add(item, item.tile)
+    store = EnemyStore(game.COLS, game.ROWS)
+    for x, y, level in enemies:
+        store.add(x, y, level)
+    return wall_grid, level_items, Stairs(*stairs), store
+
+
+def retained_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def capture_layout(game):
+    walls = [(x, y) for y in range(game.ROWS) for x in range(game.COLS) if game.wall_grid.is_blocked(x, y)]
+    items = [(item.x, item.y, item.type) for item in game.level_items.in_area(0, 0, game.COLS - 1, game.ROWS - 1)]
+    store = game.enemy_store
+    enemies = [(int(store.x[i]), int(store.y[i]), int(store.level[i])) for i in range(store.count) if store.alive[i]]
+    return walls, items, game.stairs.tile, enemies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report Python heap bytes per dungeon level.")
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 3, 4, 5])
+    args = parser.parse_args()
+
+    game = load_game()
+    surface_bytes = game.level_surface.get_bytesize() * game.WIDTH * game.HEIGHT
+    print(f"{'level':>5} {'walls':>6} {'items':>5} {'enemies':>7} {'sprites':>10} {'records':>10} {'saved':>6}")
+    for level in args.levels:
+        with contextlib.redirect_stdout(io.StringIO()):
+            game.generate_dungeon(level)
+        layout = capture_layout(game)
+        sprite_bytes = retained_bytes(lambda: build_sprite_level(game, layout))
+        record_bytes = retained_bytes(lambda: build_record_level(game, layout))
+        walls, items, _, enemies = layout
+        print(f"{level:>5} {len(walls):>6} {len(items):>5} {len(enemies):>7} "
+              f"{sprite_bytes:>10,} {record_bytes:>10,} {1 - record_bytes / sprite_bytes:>6.0%}")
+    print(f"Pre-rendered level surface: {surface_bytes:,} bytes of SDL pixel memory (one per level)")
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
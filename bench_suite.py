@@ -0,0 +1,277 @@
+"""Timing benchmarks for the game's hot paths, checked against a stored baseline.
+
+Each benchmark runs the game's own code headless (SDL dummy drivers) with
+seeded randomness, so every run times the same levels and fights:
+
+  generate_dungeon[<type>]  one level of each of the five level_mod types
+                            (the mean over VARIANTS seeded levels)
+  create_corridor           A* corridor from one corner of the map to the other
+  player_move               MOVES Player.move calls against the wall grid
+  enemy_step                one pursuit step for every enemy on a level: the
+                            player_moved refresh, then step() with all of them due
+  exploration_frame         draw_exploration and a display flip
+  combat_turn               one party attack at instant speed, through to the
+                            next party turn (enemy turns included), plus a draw
+                            (the mean over VARIANTS seeded fights)
+  reference                 a fixed pure-Python workload that isn't game code,
+                            always run, to measure how fast the machine is
+
+Each benchmark first runs WARMUP untimed calls. Its timed samples are then
+taken in ROUNDS rounds that go through all the benchmarks in turn, so a
+stretch of seconds where the machine is busy slows a few samples of each
+rather than every sample of one. Results are milliseconds per call, and the
+gate uses the minimum: the code being timed is deterministic, so noise only
+ever adds time. The median is shown for reference. --save writes the results
+as the baseline JSON. Without it, each result is compared to the baseline,
+scaled by how much the reference benchmark's time changed (a shared machine
+can run a whole invocation slower), and any minimum more than --threshold
+slower is flagged as a regression, with exit status 1. Baselines are specific to a machine, so save one before
+making a change and compare against it after.
+
+    python bench_suite.py --save
+    python bench_suite.py --threshold 0.2 enemy_step combat_turn
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+from dungeon_generator import LEVEL_TYPES, create_corridor
+from rng_streams import RngStreams
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+GAME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dungeon-crawler-game.py')
+BASELINE_PATH = 'bench_baseline.json'
+SEED = 2024
+THRESHOLD = 0.25  # Slowdown (as a fraction of the baseline) flagged as a regression
+MOVES = 1000  # Player.move calls per player_move sample
+REFERENCE_ITEMS = 20000  # Size of the reference benchmark's workload
+VARIANTS = 5  # Seeded levels (or fights) averaged in each generate_dungeon (or combat_turn) sample
+WARMUP = 2  # Untimed calls before each benchmark's samples
+ROUNDS = 5  # Passes over the benchmarks that the samples are spread across
+
+
+def load_game():
+    spec = importlib.util.spec_from_file_location('dungeon_crawler_game', GAME_PATH)
+    game = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(game)
+    return game
+
+
+def new_level(game, level):
+    # A seeded level with the player's field, sight and fog set up as the game loop leaves them
+    game.rng_streams = RngStreams(SEED + level)
+    with contextlib.redirect_stdout(io.StringIO()):
+        game.generate_dungeon(level)
+    tile = player_tile(game)
+    game.player_field.update(game.wall_grid, tile)
+    game.player_fov.update(game.wall_grid, tile)
+    game.update_fog_surface()
+    return tile
+
+
+def player_tile(game):
+    return game.player.rect.x // game.GRID_SIZE, game.player.rect.y // game.GRID_SIZE
+
+
+def timed(call):
+    started = time.perf_counter()
+    call()
+    return (time.perf_counter() - started) * 1000
+
+
+def bench_generate_dungeon(game, repeat, level):
+    samples = []
+    for _ in range(repeat):
+        total = 0
+        for i in range(VARIANTS):
+            game.rng_streams = RngStreams(SEED + i)
+            total += timed(lambda: game.generate_dungeon(level))
+        samples.append(total / VARIANTS)
+    return samples
+
+
+def bench_create_corridor(game, repeat):
+    start, end = (1, 1), (game.COLS - 2, game.ROWS - 2)
+    return [timed(lambda: create_corridor(start, end, game.COLS, game.ROWS)) for _ in range(repeat)]
+
+
+def bench_player_move(game, repeat):
+    start = new_level(game, 1)
+    rng = random.Random(SEED)
+    steps = [rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1))) for _ in range(MOVES)]
+    samples = []
+    for _ in range(repeat):
+        game.player.rect.topleft = (start[0] * game.GRID_SIZE, start[1] * game.GRID_SIZE)
+        samples.append(timed(lambda: [game.player.move(dx, dy) for dx, dy in steps]))
+    return samples
+
+
+def bench_enemy_step(game, repeat):
+    new_level(game, 5)
+    store = game.enemy_store
+    # Every enemy awake and in sight, so each one takes part in the step
+    floor = [(x, y) for y in range(game.ROWS) for x in range(game.COLS) if not game.wall_grid.is_blocked(x, y)]
+    columns = ('x', 'y', 'direction', 'frame', 'awake', 'pending', 'occupancy')
+    saved = {name: getattr(store, name).copy() for name in columns}
+    everyone = [i for i in range(store.count) if store.alive[i]]
+
+    def pursue():
+        store.player_moved(player_tile(game), game.player_field.distances, floor, max(game.COLS, game.ROWS))
+        store.step(everyone)
+
+    samples = []
+    for _ in range(repeat):
+        for name in columns:
+            getattr(store, name)[:] = saved[name]
+        game.game_timers.clear()
+        samples.append(timed(pursue))
+    return samples
+
+
+def bench_exploration_frame(game, repeat):
+    new_level(game, 3)
+
+    def frame():
+        game.draw_exploration(game.screen)
+        game.pygame.display.flip()
+    return [timed(frame) for _ in range(repeat)]
+
+
+def bench_combat_turn(game, repeat):
+    new_level(game, 1)
+    game.combat_speed = game.COMBAT_SPEEDS[-1]
+    samples = []
+    for _ in range(repeat):
+        total = 0
+        for i in range(VARIANTS):
+            for member in game.party_members + [game.player]:
+                member.health, member.mana, member.is_alive = member.max_health, member.max_mana, True
+            combat = game.CombatSystem(game.player, game.party_members, 3, seed=SEED + i)
+            while combat.encounter.current_is_enemy and not combat.combat_over:
+                combat.update()  # Enemies that won initiative act first; not part of the timed turn
+            encounter = combat.encounter
+            slot = encounter.party.index(encounter.current)
+            target = len(encounter.party) + encounter.enemies.index(encounter.living_enemies()[0])
+
+            def turn():
+                combat.run_script(combat.choose_turn((slot, game.ATTACK, target, None)))
+                while combat.script is not None or (encounter.current_is_enemy and not combat.combat_over):
+                    combat.update()
+                combat.draw(game.screen)
+            total += timed(turn)
+        samples.append(total / VARIANTS)
+    return samples
+
+
+def bench_reference(game, repeat):
+    rng = random.Random(SEED)
+    values = [rng.random() for _ in range(REFERENCE_ITEMS)]
+    return [timed(lambda: {i: value for i, value in enumerate(sorted(values))}) for _ in range(repeat)]
+
+
+def benchmarks():
+    """(name, function, extra arguments, repeats) for every benchmark, in report order."""
+    # Levels 1 to 5 cover every level type once
+    cases = [(f'generate_dungeon[{LEVEL_TYPES[level % 5]}]', bench_generate_dungeon, (level,), 15)
+             for level in range(1, 6)]
+    return cases + [
+        ('create_corridor', bench_create_corridor, (), 50),
+        ('player_move', bench_player_move, (), 50),
+        ('enemy_step', bench_enemy_step, (), 300),
+        ('exploration_frame', bench_exploration_frame, (), 300),
+        ('combat_turn', bench_combat_turn, (), 15),
+        ('reference', bench_reference, (), 50),
+    ]
+
+
+def run(names=None, repeat_scale=1.0):
+    """Milliseconds per call for the named benchmarks (all of them by default)."""
+    game = load_game()
+    results = {}
+    try:
+        chosen = [(name, bench, args, max(1, round(repeat * repeat_scale / ROUNDS)))
+                  for name, bench, args, repeat in benchmarks()
+                  if not names or name in names or name.split('[')[0] in names or name == 'reference']
+        samples = {name: [] for name, _, _, _ in chosen}
+        for name, bench, args, _ in chosen:
+            bench(game, WARMUP, *args)
+        for _ in range(ROUNDS):
+            for name, bench, args, per_round in chosen:
+                samples[name] += bench(game, per_round, *args)
+        for name, times in samples.items():
+            results[name] = {'min_ms': round(min(times), 4), 'median_ms': round(statistics.median(times), 4),
+                             'samples': len(times)}
+    finally:
+        game.party_ai.close()
+        game.pygame.quit()
+    return results
+
+
+def machine_speed(results, baseline):
+    """How much slower this run's machine is than the baseline's (1.0 = the same), from the reference."""
+    if 'reference' not in results or 'reference' not in baseline:
+        return 1.0
+    return results['reference']['min_ms'] / baseline['reference']['min_ms']
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Regressed benchmark names mapped to (baseline ms, current ms), by minimum, allowing for machine speed."""
+    speed = machine_speed(results, baseline)
+    return {name: (baseline[name]['min_ms'], result['min_ms'])
+            for name, result in results.items()
+            if name != 'reference' and name in baseline
+            and result['min_ms'] > baseline[name]['min_ms'] * speed * (1 + threshold)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the game's hot paths and flag regressions against a baseline.")
+    parser.add_argument('names', nargs='*', help="benchmarks to run (default: all); generate_dungeon runs every type")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help="write these results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="slowdown flagged as a regression, as a fraction (0.25 = 25%% slower)")
+    parser.add_argument('--quick', action='store_true', help="a fifth of the usual repeats")
+    args = parser.parse_args()
+
+    results = run(args.names, 0.2 if args.quick else 1.0)
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold)
+    speed = machine_speed(results, baseline)
+
+    print(f"{'benchmark':<30} {'min ms':>10} {'median ms':>10} {'baseline':>10} {'change':>8}")
+    for name, result in results.items():
+        line = f"{name:<30} {result['min_ms']:>10.3f} {result['median_ms']:>10.3f}"
+        if name in baseline:
+            before = baseline[name]['min_ms']
+            flag = '  REGRESSION' if name in regressions else ''
+            line += f" {before:>10.3f} {result['min_ms'] / (before * speed) - 1:>+8.0%}{flag}"
+        print(line)
+    if baseline:
+        print(f"Machine speed vs baseline (reference): {speed:.2f}x the time; changes are scaled by it")
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'seed': SEED, 'python': sys.version.split()[0], 'results': results}, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif not baseline:
+        print(f"No baseline at {args.baseline}; run with --save to create one")
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""Auto-battle: lookahead search that chooses the party's actions.
+
+search() runs Monte Carlo tree search at the root of the decision. Each
+candidate action (attack or single-target skill on one of the weakest
+targets, each area skill, defend, run) is an arm of a UCB1 bandit. Every
+pull copies the encounter, plays the candidate, and then plays the fight on
+with the greedy party policy against the usual random-target enemies, for up
+to ROLLOUT_TURNS turns. The end state is scored. Pulls continue until the
+time budget runs out, and the most-pulled action wins. Each rollout draws from
+its own seeded rng, so searching never touches the real fight's rng and a
+recorded fight still replays exactly.
+
+The encounter crosses to the search as a snapshot of plain tuples, and the
+answer comes back in the combat log's action encoding (actor slot, kind,
+target slot, skill index), where slots number the party first, then the enemies.
+
+AutoBattle runs the search on a single worker process, so the game's frame
+loop only ever submits a snapshot and polls for the answer.
+"""
+import math
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from combat_engine import (
+    ATTACK, DEFEND, RUN, SKILL, Action, Encounter, Fighter, greedy_policy, random_target_policy,
+)
+
+BUDGET_MS = 150  # Search time per decision
+ROLLOUT_TURNS = 40  # Turns played out after the candidate action before scoring
+MAX_TARGETS = 4  # Weakest enemies (and most hurt allies) considered as single targets
+EXPLORATION = 1.4  # UCB1 exploration constant
+
+
+def snapshot(encounter):
+    """The encounter's state as picklable tuples, for restore() in another process."""
+    combatants = encounter.party + encounter.enemies
+    slots = {combatant: slot for slot, combatant in enumerate(combatants)}
+    fighters = tuple(
+        (c.name, getattr(c, 'role', None), c.health, c.max_health, c.attack, getattr(c, 'mana', 0),
+         getattr(c, 'max_mana', 0), c.defense_bonus, tuple(getattr(c, 'skills', ())), c.is_alive)
+        for c in combatants)
+    order = tuple((slots[entry['combatant']], entry['initiative'], entry['is_enemy']) for entry in encounter.order)
+    return fighters, len(encounter.party), order, encounter.index, encounter.turns
+
+
+def restore(state, rng):
+    """A fresh Encounter of Fighters in the snapshot's state."""
+    fighters, party_size, order, index, turns = state
+    combatants = []
+    for name, role, health, max_health, attack, mana, max_mana, defense_bonus, skills, is_alive in fighters:
+        fighter = Fighter(name, max_health, attack, skills, max_mana, role)
+        fighter.health = health
+        fighter.mana = mana
+        fighter.defense_bonus = defense_bonus
+        fighter.is_alive = is_alive
+        combatants.append(fighter)
+    order = [(combatants[slot], initiative, is_enemy) for slot, initiative, is_enemy in order]
+    return Encounter.resume(combatants[:party_size], combatants[party_size:], order, index, turns, rng)
+
+
+def candidates(encounter):
+    """Actions worth searching for the current actor, as (kind, target slot, skill index)."""
+    actor = encounter.current
+    slots = {combatant: slot for slot, combatant in enumerate(encounter.party + encounter.enemies)}
+    enemies = sorted(encounter.living_enemies(), key=lambda enemy: enemy.health)[:MAX_TARGETS]
+    hurt = sorted((member for member in encounter.living_party() if member.health < member.max_health),
+                  key=lambda member: member.health / member.max_health)[:MAX_TARGETS]
+    actions = [(ATTACK, slots[enemy], None) for enemy in enemies]
+    for index, skill in enumerate(actor.skills):
+        if not encounter.can_use(actor, skill):
+            continue
+        if skill.target_type == 'all':
+            actions.append((SKILL, None, index))
+        else:
+            targets = hurt if skill.effect_type == 'heal' else enemies
+            actions += [(SKILL, slots[target], index) for target in targets]
+    actions += [(DEFEND, None, None), (RUN, None, None)]
+    return actions
+
+
+def score(encounter):
+    """How good an end state is for the party, from 0 (wiped out) to 1."""
+    party_health = sum(member.health for member in encounter.party) / sum(m.max_health for m in encounter.party)
+    if encounter.lost:
+        return 0.0
+    if encounter.won:
+        return 0.5 + 0.5 * party_health
+    if encounter.fled:
+        return 0.4 * party_health
+    enemy_health = (sum(enemy.health for enemy in encounter.enemies)
+                    / sum(enemy.max_health for enemy in encounter.enemies))
+    return 0.25 + 0.25 * (party_health - enemy_health)
+
+
+def rollout(state, candidate, rng):
+    encounter = restore(state, rng)
+    kind, target, skill_index = candidate
+    actor = encounter.current
+    combatants = encounter.party + encounter.enemies
+    encounter.perform(actor, Action(kind, None if target is None else combatants[target],
+                                    None if skill_index is None else actor.skills[skill_index]))
+    if not encounter.over:
+        encounter.next_turn()
+        encounter.play(greedy_policy, random_target_policy, encounter.turns + ROLLOUT_TURNS)
+    return score(encounter)
+
+
+def search(state, budget=BUDGET_MS / 1000, seed=0, max_rollouts=None):
+    """Choose an action for the actor whose turn it is in the snapshot.
+
+    Searches for budget seconds (or max_rollouts rollouts, whichever comes
+    first) and returns (actor slot, kind, target slot or None, skill index or None).
+    """
+    deadline = time.perf_counter() + budget
+    arms = candidates(restore(state, random.Random(seed)))
+    pulls = [0] * len(arms)
+    totals = [0.0] * len(arms)
+    rng = random.Random(seed)
+    count = 0
+    while count < len(arms) or (time.perf_counter() < deadline and count != max_rollouts):
+        if count < len(arms):
+            arm = count  # Try everything once, even if that overruns a tiny budget
+        else:
+            log_count = math.log(count)
+            arm = max(range(len(arms)), key=lambda i: totals[i] / pulls[i]
+                      + EXPLORATION * math.sqrt(log_count / pulls[i]))
+        totals[arm] += rollout(state, arms[arm], random.Random(rng.getrandbits(32)))
+        pulls[arm] += 1
+        count += 1
+    best = max(range(len(arms)), key=lambda i: (pulls[i], totals[i]))
+    fighters, party_size, order, index, turns = state
+    return (order[index][0],) + arms[best]
+
+
+def _executor():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork'))
+    # A spawned worker would re-run the game script on import, so search on a thread instead
+    return ThreadPoolExecutor(max_workers=1)
+
+
+class AutoBattle:
+    """Searches for the party's moves in a worker without blocking the caller.
+
+    Call request() with the encounter whenever a party member is up, and
+    poll() every frame until it returns that turn's decision.
+    """
+
+    def __init__(self, budget_ms=BUDGET_MS):
+        self.budget = budget_ms / 1000
+        self.executor = None
+        self.pending = None  # (encounter, turn, future)
+        self.decisions = 0
+
+    def start(self):
+        """Start the worker now, ideally before the game starts any threads of its own."""
+        if self.executor is None:
+            self.executor = _executor()
+            self.executor.submit(int).result()
+
+    def request(self, encounter):
+        """Start searching for the current turn unless a search for it is already running."""
+        if self.pending is not None and self.pending[0] is encounter and self.pending[1] == encounter.turns:
+            return
+        self.start()
+        future = self.executor.submit(search, snapshot(encounter), self.budget, self.decisions)
+        self.pending = (encounter, encounter.turns, future)
+        self.decisions += 1
+
+    def poll(self, encounter):
+        """The decision for encounter's current turn if it's ready, else None."""
+        if self.pending is None:
+            return None
+        pending_encounter, turn, future = self.pending
+        if pending_encounter is not encounter or turn != encounter.turns:
+            self.pending = None  # A different fight or turn; drop the stale search
+            return None
+        if not future.done():
+            return None
+        self.pending = None
+        return future.result()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.pending = None
@@ -0,0 +1,346 @@
+"""Combat rules with no pygame in them.
+
+An Encounter holds the initiative order and applies attacks, skills, defend
+and run attempts to its combatants. It only reads and writes plain attributes
+(name, health, max_health, attack, mana, defense_bonus, skills, is_alive), so
+the game hands it its own Player, PartyMember and CombatEnemy objects, while
+simulations use lightweight Fighter records.
+
+Every random draw goes through the rng the encounter is given, so a seeded
+random.Random replays the same fight. An optional log (combat_log.CombatLog)
+is told about initiative, actions, damage, heals and deaths as they happen. Encounter.play() runs a whole fight
+with policies choosing each combatant's action; CombatSystem in the game
+instead lets the player choose and plays each step out on screen.
+"""
+import random
+
+# Skills, party roles and enemy scaling come from the compiled data/ tables
+from content import CONTENT, Skill
+
+# Starting stats for each member of the party
+PARTY_ORDER = CONTENT.roles
+PARTY_ROLES = {
+    role: {'health': CONTENT.role_health[i], 'attack': CONTENT.role_attack[i], 'mana': CONTENT.role_mana[i],
+           'skills': tuple(CONTENT.role_skill_list(role))}
+    for i, role in enumerate(PARTY_ORDER)
+}
+
+# Added to the d20 initiative roll; enemies get no bonus
+INITIATIVE_BONUS = dict(zip(PARTY_ORDER, CONTENT.role_initiative))
+
+ENEMY_NAMES = CONTENT.enemy_names
+MAX_ENEMIES = CONTENT.max_group
+enemy_stats = CONTENT.enemy_stats  # (health, attack) for an enemy on a dungeon level
+DEFEND_BONUS = 2  # Incoming damage is divided by this until the defender's next turn
+RUN_CHANCE = 0.5  # Chance that a run attempt fails
+
+ATTACK, SKILL, DEFEND, RUN = 'attack', 'skill', 'defend', 'run'
+
+
+def roll_enemies(rng, groups=1):
+    """Names of the enemies in a new encounter: 1 to MAX_ENEMIES per group."""
+    names = []
+    for _ in range(groups):
+        count = rng.randint(1, MAX_ENEMIES)
+        names += [rng.choice(ENEMY_NAMES) for _ in range(count)]
+    return names
+
+
+class Fighter:
+    __slots__ = ('name', 'role', 'health', 'max_health', 'attack', 'mana', 'max_mana',
+                 'defense_bonus', 'skills', 'is_alive')
+
+    def __init__(self, name, health, attack, skills=(), mana=0, role=None):
+        self.name = name
+        self.role = role
+        self.health = health
+        self.max_health = health
+        self.attack = attack
+        self.mana = mana
+        self.max_mana = mana
+        self.defense_bonus = 1
+        self.skills = list(skills)
+        self.is_alive = True
+
+
+def new_party():
+    return [Fighter(role, stats['health'], stats['attack'], stats['skills'], stats['mana'], role)
+            for role, stats in ((role, PARTY_ROLES[role]) for role in PARTY_ORDER)]
+
+
+def new_enemies(level, rng, groups=1):
+    health, attack = enemy_stats(level)
+    return [Fighter(name, health, attack) for name in roll_enemies(rng, groups)]
+
+
+class Action:
+    __slots__ = ('kind', 'target', 'skill')
+
+    def __init__(self, kind, target=None, skill=None):
+        self.kind = kind
+        self.target = target
+        self.skill = skill
+
+
+class Encounter:
+    """One fight, sized anywhere from a single goblin to a horde of hundreds.
+
+    The initiative order only holds living combatants: the fallen are taken
+    out of it as they die (once per batch for area attacks), so next_turn()
+    never steps over corpses. Living party and enemy lists are cached and only
+    rebuilt after a death.
+    """
+
+    def __init__(self, party, enemies, rng=random, log=None):
+        self._track(party, enemies, rng, log)
+        # Nobody starts a fight still defending from the last one
+        for combatant in self.party + self.enemies:
+            combatant.defense_bonus = 1
+        if log is not None:
+            log.add_enemies(self.enemies)
+
+        # Initiative order, highest roll first; ties keep party-then-enemy order
+        order = [{'combatant': member, 'initiative': self.roll_initiative(member), 'is_enemy': False}
+                 for member in self.party]
+        order += [{'combatant': enemy, 'initiative': self.roll_initiative(enemy, is_enemy=True), 'is_enemy': True}
+                  for enemy in self.enemies]
+        order.sort(key=lambda entry: entry['initiative'], reverse=True)
+        self.order = order
+        if log is not None:
+            for entry in order:
+                log.initiative(entry['combatant'], entry['initiative'])
+        # Party members who fell in an earlier fight roll, but never take a turn
+        self.retire([entry['combatant'] for entry in order if not entry['combatant'].is_alive])
+
+    @classmethod
+    def resume(cls, party, enemies, order, index=0, turns=1, rng=random):
+        """A fight already under way, as used for lookahead search.
+
+        order is the initiative order as (combatant, initiative, is_enemy) for
+        the living combatants, and index is whose turn it is. Nothing is
+        rolled or reset.
+        """
+        encounter = cls.__new__(cls)
+        encounter._track(party, enemies, rng, None)
+        encounter.order = [{'combatant': combatant, 'initiative': initiative, 'is_enemy': is_enemy}
+                           for combatant, initiative, is_enemy in order]
+        encounter.index = index
+        encounter.turns = turns
+        return encounter
+
+    def _track(self, party, enemies, rng, log):
+        self.party = list(party)
+        self.enemies = list(enemies)
+        self.rng = rng
+        self.log = log
+        self.is_enemy = {member: False for member in self.party}
+        self.is_enemy.update((enemy, True) for enemy in self.enemies)
+        self.party_left = sum(member.is_alive for member in self.party)
+        self.enemies_left = sum(enemy.is_alive for enemy in self.enemies)
+        self._living_party = None
+        self._living_enemies = None
+        self.index = 0
+        self.turns = 1
+        self.fled = False
+        self.damage_dealt = 0
+        self.damage_taken = 0
+
+    def roll_initiative(self, combatant, is_enemy=False):
+        bonus = 0 if is_enemy else INITIATIVE_BONUS.get(getattr(combatant, 'role', None), 0)
+        return self.rng.randint(1, 20) + bonus
+
+    @property
+    def current(self):
+        return self.order[self.index]['combatant']
+
+    @property
+    def current_is_enemy(self):
+        return self.order[self.index]['is_enemy']
+
+    def living_party(self):
+        # Shared until the next death; callers mustn't modify it
+        if self._living_party is None:
+            self._living_party = [member for member in self.party if member.is_alive]
+        return self._living_party
+
+    def living_enemies(self):
+        if self._living_enemies is None:
+            self._living_enemies = [enemy for enemy in self.enemies if enemy.is_alive]
+        return self._living_enemies
+
+    @property
+    def won(self):
+        return not self.fled and self.enemies_left == 0
+
+    @property
+    def lost(self):
+        return self.party_left == 0
+
+    @property
+    def over(self):
+        return self.fled or self.won or self.lost
+
+    def next_turn(self):
+        """Move to the next living combatant, whose defend bonus wears off."""
+        self.index = (self.index + 1) % len(self.order)
+        self.current.defense_bonus = 1
+        self.turns += 1
+
+    def retire(self, fallen):
+        """Take fallen combatants out of the initiative order in one pass."""
+        if not fallen:
+            return
+        fallen = set(fallen)
+        order = self.order
+        self.index -= sum(entry['combatant'] in fallen for entry in order[:self.index])
+        order[:] = [entry for entry in order if entry['combatant'] not in fallen]
+        if order:
+            self.index %= len(order)
+        self._living_party = None
+        self._living_enemies = None
+
+    def hurt(self, target, amount):
+        self.hurt_all([target], amount)
+
+    def hurt_all(self, targets, amount):
+        """Deal amount to every target, then retire the fallen together."""
+        log = self.log
+        fallen = []
+        for target in targets:
+            # Damage totals count only the health actually lost, not overkill
+            lost = min(target.health, amount)
+            target.health -= lost
+            is_enemy = self.is_enemy[target]
+            if is_enemy:
+                self.damage_dealt += lost
+            else:
+                self.damage_taken += lost
+            if log is not None:
+                log.damage(target, lost)
+            if target.health <= 0 and target.is_alive:
+                target.is_alive = False
+                fallen.append(target)
+                if is_enemy:
+                    self.enemies_left -= 1
+                else:
+                    self.party_left -= 1
+                if log is not None:
+                    log.death(target)
+        self.retire(fallen)
+
+    def attack(self, attacker, target):
+        """Hit target with a basic attack. Returns the damage dealt."""
+        damage = attacker.attack // target.defense_bonus
+        if self.log is not None:
+            self.log.action(attacker, ATTACK, target)
+        self.hurt(target, damage)
+        return damage
+
+    def defend(self, defender):
+        if self.log is not None:
+            self.log.action(defender, DEFEND)
+        defender.defense_bonus = DEFEND_BONUS
+
+    def try_run(self, runner):
+        if self.log is not None:
+            self.log.action(runner, RUN)
+        self.fled = self.rng.random() > RUN_CHANCE
+        return self.fled
+
+    def can_use(self, caster, skill):
+        return caster.mana >= skill.cost
+
+    def skill_targets(self, skill, target=None):
+        if skill.target_type == 'all':
+            return self.living_party() if skill.effect_type == 'heal' else self.living_enemies()
+        return [] if target is None else [target]
+
+    def use_skill(self, caster, skill, target=None):
+        """Spend the mana for skill and apply it. Returns [(target, amount)]."""
+        if self.log is not None:
+            self.log.action(caster, SKILL, target, caster.skills.index(skill))
+        caster.mana -= skill.cost
+        targets = self.skill_targets(skill, target)
+        if skill.effect_type != 'heal':
+            self.hurt_all(targets, skill.damage)
+            return [(affected, skill.damage) for affected in targets]
+        results = []
+        for affected in targets:
+            amount = min(affected.max_health, affected.health + skill.damage) - affected.health
+            affected.health += amount
+            if self.log is not None:
+                self.log.heal(affected, amount)
+            results.append((affected, amount))
+        return results
+
+    def perform(self, actor, action):
+        if action.kind == ATTACK:
+            self.attack(actor, action.target)
+        elif action.kind == SKILL:
+            self.use_skill(actor, action.skill, action.target)
+        elif action.kind == DEFEND:
+            self.defend(actor)
+        elif action.kind == RUN:
+            self.try_run(actor)
+
+    def play(self, party_policy, enemy_policy, max_turns=1000):
+        """Fight until one side is down, the party flees or max_turns pass."""
+        while not self.over and self.turns <= max_turns:
+            actor = self.current
+            policy = enemy_policy if self.current_is_enemy else party_policy
+            self.perform(actor, policy(self, actor))
+            if not self.over:
+                self.next_turn()
+        return self.result()
+
+    def result(self):
+        return {
+            'won': self.won,
+            'fled': self.fled,
+            'turns': self.turns,
+            'damage_dealt': self.damage_dealt,
+            'damage_taken': self.damage_taken,
+            'party_deaths': sum(not member.is_alive for member in self.party),
+        }
+
+
+# Policies pick an Action for the combatant whose turn it is
+
+def random_target_policy(encounter, actor):
+    """How enemies fight: attack a random living party member."""
+    return Action(ATTACK, encounter.rng.choice(encounter.living_party()))
+
+
+def attack_first_policy(encounter, actor):
+    """Always attack the first living enemy (the default menu choice)."""
+    return Action(ATTACK, encounter.living_enemies()[0])
+
+
+def greedy_policy(encounter, actor):
+    """Heal the badly hurt, use area skills on groups, otherwise focus the weakest enemy."""
+    affordable = [skill for skill in actor.skills if encounter.can_use(actor, skill)]
+    party = encounter.living_party()
+    enemies = encounter.living_enemies()
+    hurt = min(party, key=lambda member: member.health / member.max_health)
+    if hurt.health * 2 < hurt.max_health:
+        heals = [skill for skill in affordable if skill.effect_type == 'heal']
+        if heals:
+            group = sum(member.health * 2 < member.max_health for member in party) > 1
+            heal = max(heals, key=lambda skill: (skill.target_type == 'all') == group)
+            return Action(SKILL, hurt, heal)
+    damaging = [skill for skill in affordable if skill.effect_type == 'damage']
+    weakest = min(enemies, key=lambda enemy: enemy.health)
+    if len(enemies) > 1:
+        area = [skill for skill in damaging if skill.target_type == 'all']
+        if area:
+            return Action(SKILL, None, max(area, key=lambda skill: skill.damage))
+    single = [skill for skill in damaging if skill.target_type == 'single' and skill.damage > actor.attack]
+    if single and weakest.health > actor.attack:
+        return Action(SKILL, weakest, max(single, key=lambda skill: skill.damage))
+    return Action(ATTACK, weakest)
+
+
+PARTY_POLICIES = {
+    'attack': attack_first_policy,
+    'greedy': greedy_policy,
+}
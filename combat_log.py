@@ -0,0 +1,283 @@
+"""Compact binary log of combat encounters, with deterministic replay.
+
+Every event is one fixed 8-byte record (kind, three small fields and an
+unsigned 32-bit value) packed into a preallocated ring buffer, so logging
+costs a struct.pack_into per event and the log never grows past its
+capacity; the oldest encounters are overwritten first.
+
+An encounter is recorded as:
+
+    BEGIN      a=level, b=party size, c=enemy groups, value=rng seed
+    LEVEL      value=level                          (only for levels above 255)
+    MEMBER     a=slot, b=role, value=health         (one per party member)
+    STATS      a=slot, value=attack << 16 | mana    (one per party member)
+    INITIATIVE a=slot, value=roll                   (in turn order)
+    ACTION     a=actor slot, b=kind, c=target slot, value=skill index
+    DAMAGE / HEAL / DEATH  a=target slot, value=amount
+    END        value=outcome
+
+Slots number the party first, then the enemies. A recording can stop
+partway through (the window closed mid-fight); replaying it stops where the
+recording did and checks the part that was recorded. Because the encounter's rng
+is seeded from BEGIN, replaying the party's ACTION records reproduces the
+enemies, initiative, enemy targets and run rolls exactly; replay() re-runs
+an encounter headless and checks that it produces the same bytes.
+
+    python combat_log.py combat_log.bin             # list and verify
+    python combat_log.py combat_log.bin --render 3  # watch encounter 3
+"""
+import argparse
+import random
+import struct
+
+from combat_engine import (
+    ATTACK, DEFEND, MAX_ENEMIES, PARTY_ORDER, PARTY_ROLES, RUN, SKILL, Action, Encounter, Fighter,
+    new_enemies, random_target_policy,
+)
+
+LOG_PATH = 'combat_log.bin'
+RECORD = struct.Struct('<BBBBI')
+
+BEGIN, MEMBER, STATS, INITIATIVE, ACTION, DAMAGE, HEAL, DEATH, END, LEVEL = range(10)
+EVENT_NAMES = ('BEGIN', 'MEMBER', 'STATS', 'INITIATIVE', 'ACTION', 'DAMAGE', 'HEAL', 'DEATH', 'END', 'LEVEL')
+ACTION_KINDS = (ATTACK, SKILL, DEFEND, RUN)
+LOST, WON, FLED = range(3)
+OUTCOMES = ('lost', 'won', 'fled')
+NONE = 255  # No target or skill
+MAX_GROUPS = (NONE - len(PARTY_ORDER)) // MAX_ENEMIES  # Most enemy groups whose slots fit in a byte
+
+
+class CombatLog:
+    def __init__(self, capacity=8192):
+        self.capacity = capacity  # Records kept before the oldest are overwritten
+        self.buffer = bytearray(capacity * RECORD.size)
+        self.written = 0
+        self.slots = {}
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def record(self, kind, a=0, b=0, c=0, value=0):
+        RECORD.pack_into(self.buffer, (self.written % self.capacity) * RECORD.size, kind, a, b, c, value)
+        self.written += 1
+
+    # Encounter hooks; the engine calls these with combatants, the log stores slots
+
+    def begin(self, seed, level, party, groups=1):
+        self.slots = {member: slot for slot, member in enumerate(party)}
+        self.record(BEGIN, min(level, 255), len(party), groups, seed)
+        if level > 255:
+            self.record(LEVEL, value=level)  # Too deep for BEGIN's byte
+        for slot, member in enumerate(party):
+            self.record(MEMBER, slot, PARTY_ORDER.index(member.role), 0, member.health)
+            self.record(STATS, slot, 0, 0, (member.attack << 16) | member.mana)
+
+    def add_enemies(self, enemies):
+        for enemy in enemies:
+            self.slots[enemy] = len(self.slots)
+
+    def initiative(self, combatant, roll):
+        self.record(INITIATIVE, self.slots[combatant], 0, 0, roll)
+
+    def action(self, actor, kind, target=None, skill_index=None):
+        self.record(ACTION, self.slots[actor], ACTION_KINDS.index(kind),
+                    NONE if target is None else self.slots[target], NONE if skill_index is None else skill_index)
+
+    def damage(self, target, amount):
+        self.record(DAMAGE, self.slots[target], 0, 0, amount)
+
+    def heal(self, target, amount):
+        self.record(HEAL, self.slots[target], 0, 0, amount)
+
+    def death(self, target):
+        self.record(DEATH, self.slots[target])
+
+    def end(self, encounter):
+        self.record(END, 0, 0, 0, FLED if encounter.fled else WON if encounter.won else LOST)
+
+    def records(self):
+        """Records oldest first, as (kind, a, b, c, value) tuples."""
+        count = len(self)
+        start = self.written - count
+        size = RECORD.size
+        for i in range(start, self.written):
+            yield RECORD.unpack_from(self.buffer, (i % self.capacity) * size)
+
+    def encounters(self):
+        """Each encounter still fully in the buffer, as bytes (the last may be unfinished)."""
+        blobs = []
+        current = None
+        for record in self.records():
+            if record[0] == BEGIN:
+                current = bytearray()
+                blobs.append(current)
+            if current is not None:
+                current += RECORD.pack(*record)
+        return [bytes(blob) for blob in blobs]
+
+    def save(self, path=LOG_PATH):
+        with open(path, 'wb') as f:
+            for record in self.records():
+                f.write(RECORD.pack(*record))
+
+    @classmethod
+    def load(cls, path=LOG_PATH):
+        with open(path, 'rb') as f:
+            data = f.read()
+        log = cls(capacity=max(1, len(data) // RECORD.size))
+        for record in RECORD.iter_unpack(data):
+            log.record(*record)
+        return log
+
+
+def read_encounter(blob):
+    """Split a recorded encounter into (seed, level, groups, party states, party actions, outcome).
+
+    Party states are (role, health, attack, mana) and actions are
+    (actor slot, kind, target slot or None, skill index or None).
+    """
+    records = list(RECORD.iter_unpack(blob))
+    _, level, party_size, groups, seed = records[0]
+    party = {}
+    actions = []
+    outcome = None
+    for kind, a, b, c, value in records[1:]:
+        if kind == MEMBER:
+            party[a] = [PARTY_ORDER[b], value]
+        elif kind == STATS:
+            party[a] += [value >> 16, value & 0xFFFF]
+        elif kind == ACTION and a < party_size:
+            actions.append((a, ACTION_KINDS[b], None if c == NONE else c, None if value == NONE else value))
+        elif kind == END:
+            outcome = OUTCOMES[value]
+        elif kind == LEVEL:
+            level = value
+    return seed, level, groups, [tuple(party[slot]) for slot in range(party_size)], actions, outcome
+
+
+def new_member(role, health, attack, mana):
+    stats = PARTY_ROLES[role]
+    member = Fighter(role, stats['health'], attack, stats['skills'], mana, role)
+    member.health = health
+    member.is_alive = health > 0
+    return member
+
+
+def to_action(encounter, actor, recorded):
+    _, kind, target, skill_index = recorded
+    combatants = encounter.party + encounter.enemies
+    return Action(kind, None if target is None else combatants[target],
+                  None if skill_index is None else actor.skills[skill_index])
+
+
+def replay_log(blob):
+    """A log big enough to replay blob into.
+
+    Besides the recorded events it has room for the rest of the turn under way
+    when the recording stopped: a single action logs at most an action, a hit
+    or heal and a death per combatant.
+    """
+    _, _, party_size, groups, _ = RECORD.unpack_from(blob)
+    return CombatLog(capacity=len(blob) // RECORD.size + 2 * (party_size + groups * MAX_ENEMIES) + 2)
+
+
+def matches(log, blob):
+    # A finished recording must come out exactly; an unfinished one, as far as it went
+    replayed = log.encounters()[-1]
+    return replayed == blob if read_encounter(blob)[5] is not None else replayed[:len(blob)] == blob
+
+
+def replay(blob):
+    """Re-run a recorded encounter headless at full speed.
+
+    Returns (encounter, identical): identical is True when the replay
+    produced exactly the recorded event stream (or, for an unfinished
+    recording, started with all of it).
+    """
+    seed, level, groups, states, actions, outcome = read_encounter(blob)
+    party = [new_member(*state) for state in states]
+    rng = random.Random(seed)
+    events = len(blob) // RECORD.size
+    log = replay_log(blob)
+    log.begin(seed, level, party, groups)
+    encounter = Encounter(party, new_enemies(level, rng, groups), rng, log=log)
+    party_actions = iter(actions)
+    while not encounter.over and log.written < events:
+        actor = encounter.current
+        if encounter.current_is_enemy:
+            action = random_target_policy(encounter, actor)
+        else:
+            recorded = next(party_actions, None)
+            if recorded is None:
+                break  # The recording stopped mid-fight
+            action = to_action(encounter, actor, recorded)
+        encounter.perform(actor, action)
+        if not encounter.over:
+            encounter.next_turn()
+    if outcome is not None:
+        log.end(encounter)
+    return encounter, matches(log, blob)
+
+
+def describe(blob):
+    seed, level, groups, states, actions, outcome = read_encounter(blob)
+    return (f"level {level}, seed {seed}, {groups} enemy groups, {len(blob) // RECORD.size} events, "
+            f"{len(actions)} party actions, {outcome or 'unfinished'}")
+
+
+def render(blob):
+    """Play a recorded encounter back in the game window at normal speed."""
+    import importlib.util
+    import os
+
+    import pygame
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dungeon-crawler-game.py')
+    spec = importlib.util.spec_from_file_location('dungeon_crawler_game', path)
+    game = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(game)
+
+    seed, level, groups, states, actions, outcome = read_encounter(blob)
+    player = game.Player(0, 0)
+    party = [player] + [game.PartyMember(role) for role, *_ in states[1:]]
+    for member, (_, health, attack, mana) in zip(party, states):
+        member.health, member.attack, member.mana = health, attack, mana
+        member.is_alive = health > 0
+    # Record the rendered fight too, to confirm it played out the same way
+    events = len(blob) // RECORD.size
+    log = replay_log(blob)
+    combat = game.CombatSystem(player, party[1:], level, groups=groups, seed=seed, log=log, replay=actions)
+    while not combat.combat_over and combat.replaying() and log.written < events:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+            combat.handle_input(event)
+        combat.update()
+        combat.draw(game.screen)
+        pygame.display.flip()
+        game.clock.tick(game.FRAME_RATE)
+    if outcome is not None:
+        log.end(combat.encounter)
+    print(f"Rendered replay {'matches' if matches(log, blob) else 'DIVERGES from'} the recording")
+    pygame.time.wait(1500)
+    pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List, verify and replay recorded combat encounters.")
+    parser.add_argument('path', nargs='?', default=LOG_PATH)
+    parser.add_argument('--render', type=int, metavar='N', help="play encounter N back in the game window")
+    args = parser.parse_args()
+
+    encounters = CombatLog.load(args.path).encounters()
+    if args.render is not None:
+        render(encounters[args.render])
+        return
+    for i, blob in enumerate(encounters):
+        _, identical = replay(blob)
+        print(f"{i:>4}: {describe(blob)} - replay {'matches' if identical else 'DIVERGES'}")
+
+
+if __name__ == '__main__':
+    main()
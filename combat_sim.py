@@ -0,0 +1,114 @@
+"""Monte Carlo balance simulator for combat.
+
+Runs seeded encounters from combat_engine across a process pool and reports,
+per dungeon level, how often the party wins, how long fights last and how
+much damage the party takes. Each encounter starts from a fresh, full-health
+party against a new group of enemies of that level, and encounter i on level
+L with seed S is always the same fight, whatever the worker count.
+
+    python combat_sim.py --levels 1 2 3 4 5 --encounters 1000000 --policy greedy
+"""
+import argparse
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from combat_engine import PARTY_ORDER, PARTY_POLICIES, Encounter, new_enemies, new_party, random_target_policy
+
+CHUNK_SIZE = 5000  # Encounters per worker task
+
+
+def encounter_seed(seed, level, index):
+    return f'{seed}:{level}:{index}'
+
+
+def run_encounter(level, seed, index, policy='greedy', max_turns=1000, groups=1):
+    rng = random.Random(encounter_seed(seed, level, index))
+    encounter = Encounter(new_party(), new_enemies(level, rng, groups), rng)
+    return encounter.play(PARTY_POLICIES[policy], random_target_policy, max_turns)
+
+
+def simulate_chunk(level, seed, start, count, policy, max_turns, groups=1):
+    """Run encounters [start, start + count) and return their tallies."""
+    tally = {'won': 0, 'fled': 0, 'turns': Counter(), 'damage_taken': Counter(),
+             'damage_dealt': 0, 'party_deaths': Counter()}
+    for index in range(start, start + count):
+        result = run_encounter(level, seed, index, policy, max_turns, groups)
+        tally['won'] += result['won']
+        tally['fled'] += result['fled']
+        tally['turns'][result['turns']] += 1
+        tally['damage_taken'][result['damage_taken']] += 1
+        tally['damage_dealt'] += result['damage_dealt']
+        tally['party_deaths'][result['party_deaths']] += 1
+    return level, tally
+
+
+def merge(total, tally):
+    for key, value in tally.items():
+        if isinstance(value, Counter):
+            total.setdefault(key, Counter()).update(value)
+        else:
+            total[key] = total.get(key, 0) + value
+
+
+def percentile(histogram, fraction):
+    """Value at the given fraction of a {value: count} histogram."""
+    target = fraction * sum(histogram.values())
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if seen >= target:
+            return value
+    return 0
+
+
+def simulate(levels, encounters, seed=0, policy='greedy', max_turns=1000, workers=None, groups=1):
+    """Run encounters per level on a process pool. Returns {level: tally}."""
+    tasks = [(level, seed, start, min(CHUNK_SIZE, encounters - start), policy, max_turns, groups)
+             for level in levels for start in range(0, encounters, CHUNK_SIZE)]
+    totals = {level: {} for level in levels}
+    if workers == 0:
+        for task in tasks:
+            level, tally = simulate_chunk(*task)
+            merge(totals[level], tally)
+        return totals
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for level, tally in pool.map(simulate_chunk, *zip(*tasks)):
+            merge(totals[level], tally)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate seeded combat encounters per dungeon level.")
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 3, 4, 5])
+    parser.add_argument('--encounters', type=int, default=100000, help="encounters per level")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policy', choices=sorted(PARTY_POLICIES), default='greedy')
+    parser.add_argument('--max-turns', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None, help="processes (0 runs in this process)")
+    parser.add_argument('--groups', type=int, default=1, help="enemy groups per encounter (hordes)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    totals = simulate(args.levels, args.encounters, args.seed, args.policy, args.max_turns, args.workers, args.groups)
+    elapsed = time.perf_counter() - started
+
+    print(f"{'level':>5} {'win':>6} {'fled':>6} {'turns p50/p90':>14} "
+          f"{'dmg taken p10/p50/p90':>22} {'dealt avg':>9} {'wipes':>6}")
+    for level in args.levels:
+        total = totals[level]
+        runs = args.encounters
+        turns = f"{percentile(total['turns'], 0.5)}/{percentile(total['turns'], 0.9)}"
+        taken = '/'.join(str(percentile(total['damage_taken'], fraction)) for fraction in (0.1, 0.5, 0.9))
+        wipes = total['party_deaths'][len(PARTY_ORDER)]
+        print(f"{level:>5} {total['won'] / runs:>6.1%} {total['fled'] / runs:>6.1%} {turns:>14} "
+              f"{taken:>22} {total['damage_dealt'] / runs:>9.1f} {wipes / runs:>6.1%}")
+    count = args.encounters * len(args.levels)
+    print(f"{count:,} encounters in {elapsed:.1f} s ({count / elapsed:,.0f}/s, "
+          f"{args.workers if args.workers is not None else os.cpu_count()} workers, policy {args.policy})")
+
+
+if __name__ == '__main__':
+    main()
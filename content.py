@@ -0,0 +1,284 @@
+"""Game content: skills, party roles, enemies and treasures.
+
+The content is written as JSON under data/ and compiled into flat lookup
+tables. Each skill has an integer id that indexes one shared tuple, and roles
+list their skills by id. Enemy health and attack are arrays indexed by
+dungeon level. Treasure and item-weight tables are keyed by item id. Nothing
+is resolved by name or searched once the tables are built.
+
+Compiling validates every file first, so a typo in a skill name or an
+unknown item type fails at load time with the file it came from. The
+compiled tables are pickled to content.cache, together with the size and
+modification time of each data file and of this module. Later launches load
+the cache with a single read and only recompile when one of them changes.
+
+    python content.py    # validate data/ and rebuild the cache
+"""
+import argparse
+import json
+import os
+import pickle
+import struct
+import time
+from array import array
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content.cache')
+CACHE_VERSION = 1
+MAGIC = b'ELDDATA\x00'
+HEADER = struct.Struct('<8sI')  # magic, version
+SOURCES = ('skills.json', 'roles.json', 'enemies.json', 'treasures.json')
+
+TARGET_TYPES = ('single', 'all')
+EFFECT_TYPES = ('damage', 'heal', 'buff')
+
+
+class Skill:
+    __slots__ = ('name', 'damage', 'cost', 'target_type', 'effect_type')
+
+    def __init__(self, name, damage, cost, target_type='single', effect_type='damage'):
+        self.name = name
+        self.damage = damage
+        self.cost = cost
+        self.target_type = target_type  # 'single', 'all'
+        self.effect_type = effect_type  # 'damage', 'heal', 'buff'
+
+
+class Content:
+    """Compiled content tables. Build with compile_content() or load()."""
+
+    def __init__(self):
+        self.skills = ()  # Skill by skill id
+        self.skill_ids = {}  # Skill name -> id
+        self.roles = ()  # Role names in party order; a role's index is its id
+        self.role_ids = {}
+        self.role_health = array('i')  # Indexed by role id
+        self.role_attack = array('i')
+        self.role_mana = array('i')
+        self.role_initiative = array('i')
+        self.role_skills = ()  # Tuple of skill ids per role
+        self.role_sprites = ()
+        self.enemy_names = ()
+        self.enemy_ids = {}
+        self.enemy_sprites = ()
+        self.max_group = 0
+        self.max_level = 0
+        self.enemy_health = array('i')  # Indexed by dungeon level
+        self.enemy_attack = array('i')
+        self.item_types = ()  # Item type names; an item's index is its id
+        self.item_ids = {}
+        self.item_effects = ()  # (stat, amount, limiting stat or None) per item id
+        self.room_weights = ()  # Item weights per dungeon level, aligned with item_types
+        self.entrance_weights = ()
+        self.treasures = ()  # (name, description, image path, item id)
+        self.treasures_by_item = ()  # Treasure indices per item id
+
+    def role_skill_list(self, role):
+        """Fresh list of a role's Skill objects, for a new party member."""
+        return [self.skills[skill_id] for skill_id in self.role_skills[self.role_ids[role]]]
+
+    def enemy_stats(self, level):
+        """(health, attack) for an enemy on the given dungeon level."""
+        level = min(level, self.max_level)
+        return self.enemy_health[level], self.enemy_attack[level]
+
+    def item_weights(self, level):
+        return self.room_weights[min(level, self.max_level)]
+
+
+def _read(data_dir, name):
+    path = os.path.join(data_dir, name)
+    with open(path, encoding='utf-8') as f:
+        try:
+            return path, json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}: {e}") from None
+
+
+def _field(path, entry, key, kind, default=None):
+    value = entry.get(key, default)
+    if value is None or not isinstance(value, kind) or isinstance(value, bool):
+        label = entry.get('name', entry.get('type', '?')) if isinstance(entry, dict) else '?'
+        raise ValueError(f"{path}: {label!r} needs {key!r} as {getattr(kind, '__name__', 'a number')}")
+    return value
+
+
+def _unique(path, names, what):
+    seen = set()
+    for name in names:
+        if name in seen:
+            raise ValueError(f"{path}: duplicate {what} {name!r}")
+        seen.add(name)
+
+
+def _weights(path, item_ids, weights):
+    if not isinstance(weights, dict):
+        raise ValueError(f"{path}: item weights must map item types to numbers")
+    unknown = set(weights) - set(item_ids)
+    if unknown:
+        raise ValueError(f"{path}: unknown item types {sorted(unknown)}")
+    row = tuple(float(_field(path, weights, item, (int, float), 0)) for item in item_ids)
+    if min(row) < 0 or not sum(row):
+        raise ValueError(f"{path}: item weights must be non-negative and not all zero")
+    return row
+
+
+def compile_content(data_dir=DATA_DIR):
+    """Validate the JSON data files and build the lookup tables."""
+    content = Content()
+
+    path, skills = _read(data_dir, 'skills.json')
+    _unique(path, [skill.get('name') for skill in skills], 'skill')
+    compiled = []
+    for skill in skills:
+        target = skill.get('target', 'single')
+        effect = skill.get('effect', 'damage')
+        if target not in TARGET_TYPES or effect not in EFFECT_TYPES:
+            raise ValueError(f"{path}: {skill.get('name')!r} has target {target!r} and effect {effect!r}; "
+                             f"expected one of {TARGET_TYPES} and {EFFECT_TYPES}")
+        compiled.append(Skill(_field(path, skill, 'name', str), _field(path, skill, 'damage', int),
+                              _field(path, skill, 'cost', int), target, effect))
+    content.skills = tuple(compiled)
+    content.skill_ids = {skill.name: i for i, skill in enumerate(content.skills)}
+
+    path, roles = _read(data_dir, 'roles.json')
+    if not roles:
+        raise ValueError(f"{path}: the party needs at least one role")
+    _unique(path, [role.get('name') for role in roles], 'role')
+    content.roles = tuple(_field(path, role, 'name', str) for role in roles)
+    content.role_ids = {role: i for i, role in enumerate(content.roles)}
+    for key in ('health', 'attack', 'mana', 'initiative'):
+        setattr(content, f'role_{key}', array('i', (_field(path, role, key, int) for role in roles)))
+    role_skills = []
+    for role in roles:
+        names = _field(path, role, 'skills', list)
+        missing = [name for name in names if name not in content.skill_ids]
+        if missing:
+            raise ValueError(f"{path}: {role['name']!r} has unknown skills {missing}")
+        role_skills.append(tuple(content.skill_ids[name] for name in names))
+    content.role_skills = tuple(role_skills)
+    content.role_sprites = tuple(_field(path, role, 'sprite', str) for role in roles)
+
+    path, enemies = _read(data_dir, 'enemies.json')
+    if not enemies.get('enemies'):
+        raise ValueError(f"{path}: needs at least one enemy")
+    _unique(path, [enemy.get('name') for enemy in enemies['enemies']], 'enemy')
+    content.enemy_names = tuple(_field(path, enemy, 'name', str) for enemy in enemies['enemies'])
+    content.enemy_ids = {enemy: i for i, enemy in enumerate(content.enemy_names)}
+    content.enemy_sprites = tuple(_field(path, enemy, 'sprite', str) for enemy in enemies['enemies'])
+    content.max_group = _field(path, enemies, 'max_group', int)
+    content.max_level = _field(path, enemies, 'max_level', int)
+    if content.max_group < 1 or content.max_level < 1:
+        raise ValueError(f"{path}: max_group and max_level must be at least 1")
+    for key in ('health', 'attack'):
+        scaling = _field(path, enemies, key, dict)
+        base = _field(path, scaling, 'base', int)
+        per_level = _field(path, scaling, 'per_level', int)
+        setattr(content, f'enemy_{key}',
+                array('i', (base + per_level * level for level in range(content.max_level + 1))))
+
+    path, treasures = _read(data_dir, 'treasures.json')
+    items = _field(path, treasures, 'items', list)
+    _unique(path, [item.get('type') for item in items], 'item type')
+    content.item_types = tuple(_field(path, item, 'type', str) for item in items)
+    content.item_ids = {item: i for i, item in enumerate(content.item_types)}
+    content.item_effects = tuple((_field(path, item, 'stat', str), _field(path, item, 'amount', (int, float)),
+                                  item.get('limit')) for item in items)
+
+    # Level brackets in order; the last one has no max_level and covers every deeper level
+    brackets = _field(path, treasures, 'room_weights', list)
+    if not brackets or 'max_level' in brackets[-1]:
+        raise ValueError(f"{path}: the last room_weights entry must have no max_level")
+    room_weights = []
+    for bracket in brackets:
+        row = _weights(path, content.item_types, bracket.get('weights'))
+        last = bracket.get('max_level', content.max_level)
+        room_weights += [row] * (last + 1 - len(room_weights))
+    content.room_weights = tuple(room_weights[:content.max_level + 1])
+    content.entrance_weights = _weights(path, content.item_types, treasures.get('entrance_weights'))
+
+    compiled = []
+    for treasure in _field(path, treasures, 'treasures', list):
+        item = _field(path, treasure, 'type', str)
+        if item not in content.item_ids:
+            raise ValueError(f"{path}: {treasure.get('name')!r} has unknown item type {item!r}")
+        compiled.append((_field(path, treasure, 'name', str), _field(path, treasure, 'description', str),
+                         _field(path, treasure, 'image', str), content.item_ids[item]))
+    content.treasures = tuple(compiled)
+    content.treasures_by_item = tuple(
+        tuple(i for i, treasure in enumerate(content.treasures) if treasure[3] == item)
+        for item in range(len(content.item_types)))
+    return content
+
+
+def _stamps(data_dir):
+    # This file is stamped too, so changing the compiler invalidates old caches
+    stamps = []
+    for path in [os.path.join(data_dir, name) for name in SOURCES] + [os.path.abspath(__file__)]:
+        stat = os.stat(path)
+        stamps.append((os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+    return stamps
+
+
+def write_cache(content, data_dir=DATA_DIR, cache_path=CACHE_PATH):
+    with open(cache_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, CACHE_VERSION))
+        pickle.dump((_stamps(data_dir), content), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_cache(data_dir=DATA_DIR, cache_path=CACHE_PATH):
+    """The cached tables, or None if there is no cache or a data file changed since."""
+    try:
+        with open(cache_path, 'rb') as f:
+            magic, version = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != CACHE_VERSION:
+                return None
+            stamps, content = pickle.load(f)
+    except (OSError, EOFError, struct.error, pickle.UnpicklingError, AttributeError):
+        return None
+    return content if stamps == _stamps(data_dir) else None
+
+
+def load(data_dir=DATA_DIR, cache_path=CACHE_PATH):
+    """Compiled content, from the cache when it's fresh."""
+    content = read_cache(data_dir, cache_path)
+    if content is None:
+        content = compile_content(data_dir)
+        try:
+            write_cache(content, data_dir, cache_path)
+        except OSError as e:
+            print(f"Could not write content cache {cache_path}: {e}")
+    return content
+
+
+# The game's content, loaded once and shared by every module that needs it. Not
+# when this file runs as a script, whose classes would be pickled as __main__.*
+if __name__ != '__main__':
+    CONTENT = load()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate the game content and rebuild its cache.")
+    parser.add_argument('--data', default=DATA_DIR, help="directory holding the JSON data files")
+    parser.add_argument('--output', default=CACHE_PATH, help="cache file to write")
+    args = parser.parse_args()
+
+    # Build through the imported module, so the cache holds content.Skill and
+    # content.Content: importers can't unpickle __main__.Skill, and would recompile
+    import content as module
+
+    started = time.perf_counter()
+    content = module.compile_content(args.data)
+    compiled = time.perf_counter()
+    module.write_cache(content, args.data, args.output)
+    reloaded = time.perf_counter()
+    module.read_cache(args.data, args.output)
+    cached = time.perf_counter()
+    print(f"{len(content.skills)} skills, {len(content.roles)} roles, {len(content.enemy_names)} enemies, "
+          f"{len(content.item_types)} item types, {len(content.treasures)} treasures; "
+          f"compiled in {(compiled - started) * 1000:.1f} ms, cache loads in {(cached - reloaded) * 1000:.1f} ms "
+          f"({args.output})")
+
+
+if __name__ == '__main__':
+    main()
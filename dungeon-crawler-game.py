@@ -1,7 +1,54 @@
+import argparse
 import pygame
 import random
-import math
 import os
+from collections import deque
+from asset_loader import AssetLoader, queue_game_assets
+from asset_pack import open_pack
+from combat_ai import AutoBattle
+from combat_engine import (
+    ATTACK, DEFEND, PARTY_ORDER, PARTY_ROLES, SKILL, Encounter, enemy_stats, random_target_policy,
+    roll_enemies,
+)
+from combat_log import LOG_PATH, MAX_GROUPS, CombatLog
+from content import CONTENT
+from dungeon_generator import generate_level
+from enemy_store import ENEMY_MOVE, EnemyStore
+from flow_field import DistanceField
+from fov import FieldOfView
+from hitch_watchdog import BUDGET_MS, HITCH_PATH, HitchWatchdog
+from leak_tracker import LeakTracker
+from rng_streams import RngStreams
+from sampling_profiler import SamplingProfiler
+from session_record import Session, SessionRecorder, state_hash
+from spatial import OccupancyGrid, TileHash
+from timer_wheel import TimerWheel
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Dungeons of Eldoria")
+    parser.add_argument('--seed', type=int, help="run seed, for a repeatable dungeon and fights")
+    parser.add_argument('--track-leaks', action='store_true',
+                        help="trace allocations and warn when memory keeps growing across levels or fights")
+    parser.add_argument('--profile', choices=('game', 'combat'),
+                        help="sample a profile of the whole game, or of each fight (F9 toggles one any time)")
+    parser.add_argument('--profile-format', choices=('speedscope', 'collapsed'), default='speedscope',
+                        help="speedscope JSON, or collapsed stacks for flamegraph.pl")
+    parser.add_argument('--watch-hitches', action='store_true',
+                        help=f"log the worst frames over budget, with stack snapshots, to {HITCH_PATH}")
+    parser.add_argument('--hitch-budget', type=float, default=BUDGET_MS, metavar='MS',
+                        help="frame time that counts as a hitch (default: two 60 fps frames)")
+    parser.add_argument('--record', metavar='PATH',
+                        help="save the session (seed and input) for replay.py to play back")
+    return parser.parse_args()
+
+
+# Options are read before anything loads, so the watchdog below sees the startup frames
+args = parse_args() if __name__ == '__main__' else None
+
+# Auto-battle searches run in a worker process, started before pygame spins up any threads
+party_ai = AutoBattle()
+party_ai.start()
 
 # Initialize Pygame
 pygame.init()
@@ -13,6 +60,64 @@ HEIGHT = 800
 # Create the clock and set frame rate
 clock = pygame.time.Clock()
 FRAME_RATE = 60
+frame_cap = FRAME_RATE  # Frames per second the loops are held to; 0 runs uncapped (soak.py)
+
+# Events come from the keyboard unless a scripted source is installed, like
+# soak.py's bot. It's called with what the game is waiting on: 'menu',
+# 'explore', 'combat', 'popup' or 'game_over'.
+input_source = None
+
+
+# Set to a leak_tracker.LeakTracker (--track-leaks, soak.py) to check retained
+# memory at every level start and combat end
+leak_tracker = None
+
+# F9 starts and stops a sampling profile (sampling_profiler) while exploring or
+# fighting; --profile captures the whole game or each fight. No sampler thread
+# runs until a capture starts.
+profiler = SamplingProfiler()
+profile_scope = None  # 'game' or 'combat', from --profile
+profile_format = 'speedscope'  # Or 'collapsed'
+profile_count = 0
+
+# Set to a hitch_watchdog.HitchWatchdog (--watch-hitches) to log the frames that
+# run over budget; the worst are saved to HITCH_PATH on exit. It starts here,
+# so the asset preload and the first level (the longest frames of all) count.
+hitch_watchdog = None
+if args is not None and args.watch_hitches:
+    hitch_watchdog = HitchWatchdog(args.hitch_budget)
+    hitch_watchdog.start()
+
+
+def get_events(mode):
+    if hitch_watchdog is not None:
+        hitch_watchdog.frame(mode)
+    if input_source is None:
+        return pygame.event.get()
+    pygame.event.pump()
+    return input_source(mode)
+
+
+def toggle_profile():
+    if profiler.running:
+        save_profile()
+    else:
+        profiler.start()
+        print("Profiling (F9 to stop)")
+
+def save_profile():
+    global profile_count
+    profiler.stop()
+    profile_count += 1
+    path = f"profile_{profile_count}.{'json' if profile_format == 'speedscope' else 'folded'}"
+    profiler.write(path, name=f"Dungeons of Eldoria capture {profile_count}")
+    print(f"Profile saved to {path}: {profiler.summary()}")
+
+
+def ms_to_frames(ms, speed=1):
+    # Timelines run on frame ticks, so delays are converted once up front
+    return round(ms * FRAME_RATE / (1000 * speed))
+
 
 # Colors
 WHITE = (255, 255, 255)
@@ -32,8 +137,38 @@ GRID_SIZE = 20
 COLS = WIDTH // GRID_SIZE
 ROWS = HEIGHT // GRID_SIZE
 
+# Enemy AI settings
+ENEMY_VISION_RANGE = 8  # Tiles of line of sight
+ENEMY_MOVE_DELAY = 30  # Frames between enemy steps
+AI_BUDGET_MS = 2.0  # Max time per frame spent moving awake enemies
+FOG_RADIUS = 5  # Tiles the player can see through the fog of war
+
+# Combat animation settings
+HIT_FRAME_MS = 60  # Time each blood splatter frame stays on screen
+# Combat animation speeds, cycled with F in combat; the last resolves turns instantly
+COMBAT_SPEEDS = (1, 2, 4, float('inf'))
+combat_speed = COMBAT_SPEEDS[0]  # Kept between fights
+auto_battle = False  # Party turns chosen by combat_ai, toggled with A in combat; kept between fights
+MAX_VISIBLE_ENEMIES = 4  # Bigger fights scroll the enemy row with the selection
+TURN_LIST_ROWS = 12  # Turn order entries shown around the current turn
+PACK_RADIUS = 1  # Awake enemies this many tiles from a fight join it
+# Every encounter is recorded here; the buffer is written to LOG_PATH on exit
+combat_log = CombatLog()
+
+# Pre-scaled images baked by asset_pack.py (None when no pack has been baked)
+asset_pack = open_pack()
+# Everything decoded behind the loading screen; the load_* helpers check it first
+asset_loader = AssetLoader(pack=asset_pack)
+
 # Add this at the start of the file, after imports
 def load_image(path, size=None):
+    image = asset_loader.image(path, size)
+    if image is not None:
+        return image
+    if asset_pack and size:
+        image = asset_pack.image(path, size)
+        if image is not None:
+            return image
     try:
         if not os.path.exists(path):
             raise FileNotFoundError(f"Image file not found: {path}")
@@ -59,6 +194,9 @@ def play_music(path, loops=-1):
         print(f"Error playing music {path}: {e}")
 
 def load_sound(path):
+    sound = asset_loader.sound(path)
+    if sound is not None:
+        return sound
     try:
         if not os.path.exists(path):
             raise FileNotFoundError(f"Sound file not found: {path}")
@@ -69,7 +207,14 @@ def load_sound(path):
         print(f"Error loading sound {path}: {e}")
         return None
 
-def load_sprite_sheet(path, frame_count, frame_width, frame_height):
+def load_sprite_sheet(path, frame_count, frame_width, frame_height, size=None):
+    frames = asset_loader.sprite_sheet(path, frame_count, frame_width, frame_height, size)
+    if frames is not None:
+        return frames
+    if asset_pack and size:
+        frames = asset_pack.sprite_sheet(path, frame_count, frame_width, frame_height, size)
+        if frames is not None:
+            return frames
     try:
         if not os.path.exists(path):
             raise FileNotFoundError(f"Sprite sheet not found: {path}")
@@ -97,12 +242,57 @@ def load_sprite_sheet(path, frame_count, frame_width, frame_height):
             
             # Copy the correct area from the sprite sheet
             frame.blit(sheet, (0, 0), (x, y, frame_width, frame_height))
+            if size:
+                frame = pygame.transform.scale(frame, size)
             frames.append(frame)
         return frames
     except (pygame.error, FileNotFoundError) as e:
         print(f"Error loading sprite sheet {path}: {e}")
         return None
 
+# Create the screen
+screen = pygame.display.set_mode((WIDTH, HEIGHT))
+pygame.display.set_caption("Dungeons of Eldoria")
+
+COMBAT_SPRITE_SIZE = 100  # 40 * 2.5 = 100 pixels
+
+# Sound effects decoded up front so combat and treasure popups never wait on the disk
+PRELOAD_SOUNDS = [
+    'sounds/Sword Slash (Rpg).wav',
+    'sounds/Monster Growl 2.wav',
+    'sounds/Rage up.wav',
+    'sounds/Monster death (Rpg).wav',
+    'sounds/Gladiator Buff.wav',
+    'sounds/Armor break.wav',
+    'sounds/Magical Sting 2.wav',
+    'sounds/Level up Pickup (Rpg).wav',
+]
+
+def draw_loading_screen(loaded, total):
+    if hitch_watchdog is not None:
+        hitch_watchdog.frame('loading')
+    pygame.event.pump()  # Keep the window responsive while assets decode
+    screen.fill(BLACK)
+    font = pygame.font.Font(None, 48)
+    text_surface = font.render("Loading...", True, WHITE)
+    screen.blit(text_surface, text_surface.get_rect(center=(WIDTH/2, HEIGHT/2 - 40)))
+    
+    bar_rect = pygame.Rect(WIDTH/4, HEIGHT/2, WIDTH/2, 24)
+    fill_width = bar_rect.width * (loaded / total) if total else bar_rect.width
+    pygame.draw.rect(screen, LIGHT_BLUE, (bar_rect.x, bar_rect.y, fill_width, bar_rect.height))
+    pygame.draw.rect(screen, WHITE, bar_rect, 2)
+    pygame.display.flip()
+
+def preload_assets():
+    if hitch_watchdog is not None:
+        hitch_watchdog.frame('loading')
+    queue_game_assets(asset_loader, WIDTH, HEIGHT, GRID_SIZE, COMBAT_SPRITE_SIZE, PRELOAD_SOUNDS)
+    stats = asset_loader.load(on_progress=draw_loading_screen)
+    print(f"Loaded {stats['assets']} assets in {stats['wall_ms']:.0f} ms with {stats['workers']} threads "
+          f"(serial decode time {stats['decode_ms']:.0f} ms)")
+
+preload_assets()
+
 # Modify the asset loading code to use the new functions
 rock_tile = load_image('tiles/rock_tile.png', (GRID_SIZE, GRID_SIZE))
 dungeon_tile1 = load_image('tiles/dungeon_tile1.png', (GRID_SIZE, GRID_SIZE))
@@ -110,80 +300,48 @@ dungeon_tile2 = load_image('tiles/dungeon_tile2.png', (GRID_SIZE, GRID_SIZE))
 chest_tile = load_image('tiles/chest_tile.png', (GRID_SIZE, GRID_SIZE))
 stairs_tile = load_image('tiles/stairs_tile.png', (GRID_SIZE, GRID_SIZE))
 
-# Load treasure images for the popup
-treasure_potion_image = load_image('treasures/potion.png', (64, 64))
-treasure_gold_image = load_image('treasures/gold.png', (64, 64))
-treasure_weapon_image = load_image('treasures/weapon.png', (64, 64))
-treasure_armor_image = load_image('treasures/armor.png', (64, 64))
-treasure_gem_image = load_image('treasures/gem.png', (64, 64))
-
-# Treasure descriptions 
-TREASURES = [
-    {"name": "Healing Elixir", "description": "Restores 20 health points", "image": treasure_potion_image, "type": "health_potion"},
-    {"name": "Strength Tonic", "description": "Increases attack by 5", "image": treasure_potion_image, "type": "strength_potion"},
-    {"name": "Swift Boots", "description": "Increases speed by 0.2", "image": treasure_armor_image, "type": "speed_potion"},
-    {"name": "Gold Coins", "description": "A small fortune", "image": treasure_gold_image, "type": "health_potion"},
-    {"name": "Ancient Blade", "description": "A powerful weapon", "image": treasure_weapon_image, "type": "strength_potion"},
-    {"name": "Dragon Scale Armor", "description": "Protective gear", "image": treasure_armor_image, "type": "health_potion"},
-    {"name": "Ruby Gem", "description": "A precious stone", "image": treasure_gem_image, "type": "strength_potion"},
-    {"name": "Magic Amulet", "description": "Glows with arcane energy", "image": treasure_gem_image, "type": "speed_potion"},
-]
-
-# Create the screen
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Dungeons of Eldoria")
-
-COMBAT_SPRITE_SIZE = 100  # 40 * 2.5 = 100 pixels
+# Treasure images for the popup, by path (treasures themselves are in data/treasures.json)
+treasure_images = {path: load_image(path, (64, 64)) for _, _, path, _ in CONTENT.treasures}
 
 # Add this before the Player class
-player_sprites = load_sprite_sheet('characters/sprite_sheets/player.png', 96, 16, 16)  # Total frames in sheet
+player_sprites = load_sprite_sheet('characters/sprite_sheets/player.png', 96, 16, 16, (GRID_SIZE, GRID_SIZE))  # Total frames in sheet
 
 # Add fallback for player sprites if loading fails
 if player_sprites is None:
     # Create basic colored sprites as fallback
     player_sprites = []
     for _ in range(96):  # Create 48 frames
-        surface = pygame.Surface((16, 16), pygame.SRCALPHA)
+        surface = pygame.Surface((GRID_SIZE, GRID_SIZE), pygame.SRCALPHA)
         surface.fill(BLUE)  # Use blue as fallback color
         player_sprites.append(surface)
     print("Using fallback blue sprites - could not load player sprite sheet")
 
 # Add after player sprite loading
-enemy_sprites = load_sprite_sheet('characters/sprite_sheets/enemies.png', 96, 16, 16)  # Total frames in sheet
+enemy_sprites = load_sprite_sheet('characters/sprite_sheets/enemies.png', 96, 16, 16, (GRID_SIZE, GRID_SIZE))  # Total frames in sheet
 
 # Add fallback for enemy sprites if loading fails
 if enemy_sprites is None:
     enemy_sprites = []
     for _ in range(96):
-        surface = pygame.Surface((16, 16), pygame.SRCALPHA)
+        surface = pygame.Surface((GRID_SIZE, GRID_SIZE), pygame.SRCALPHA)
         surface.fill(RED)
         enemy_sprites.append(surface)
     print("Using fallback red sprites - could not load enemy sprite sheet")
 
-# Add before Player class
-class Skill:
-    def __init__(self, name, damage, cost, target_type='single', effect_type='damage'):
-        self.name = name
-        self.damage = damage
-        self.cost = cost
-        self.target_type = target_type  # 'single', 'all'
-        self.effect_type = effect_type  # 'damage', 'heal', 'buff'
-
-# Player class (now after Skill class)
 class Player(pygame.sprite.Sprite):
     def __init__(self, x, y):
         super().__init__()
-        # Load the directional sprites with animation frames and scale them to fill the grid
+        # Load the directional sprites with animation frames (already scaled to fill the grid)
         # With 12 frames per row, 3 frames per direction:
         # Row 0 (frames 0-11): Down = frames 0,1,2
         # Row 1 (frames 12-23): Left = frames 12,13,14
         # Row 2 (frames 24-35): Right = frames 24,25,26
         # Row 3 (frames 36-47): Up = frames 36,37,38
         self.sprites = {
-            'down': [pygame.transform.scale(player_sprites[i], (GRID_SIZE, GRID_SIZE)) for i in [0, 1, 2]],
-            'left': [pygame.transform.scale(player_sprites[i], (GRID_SIZE, GRID_SIZE)) for i in [12, 13, 14]],
-            'right': [pygame.transform.scale(player_sprites[i], (GRID_SIZE, GRID_SIZE)) for i in [24, 25, 26]],
-            'up': [pygame.transform.scale(player_sprites[i], (GRID_SIZE, GRID_SIZE)) for i in [36, 37, 38]]
+            'down': [player_sprites[i] for i in [0, 1, 2]],
+            'left': [player_sprites[i] for i in [12, 13, 14]],
+            'right': [player_sprites[i] for i in [24, 25, 26]],
+            'up': [player_sprites[i] for i in [36, 37, 38]]
         }
         
         # Print sprite information for debugging
@@ -201,23 +359,22 @@ class Player(pygame.sprite.Sprite):
         self.rect.x = x * GRID_SIZE
         self.rect.y = y * GRID_SIZE
         
-        # Rest of the initialization
-        self.health = 100
-        self.max_health = 100
-        self.attack = 10
+        # Rest of the initialization (combat stats come from combat_engine)
+        stats = PARTY_ROLES['Player']
+        self.role = 'Player'
+        self.health = stats['health']
+        self.max_health = stats['health']
+        self.attack = stats['attack']
         self.level = 1
         self.is_alive = True
         self.name = "Player"
-        self.mana = 100
-        self.max_mana = 100
+        self.mana = stats['mana']
+        self.max_mana = stats['mana']
         self.defense_bonus = 1
         self.speed = 1.0
-        self.skills = [
-            Skill("Power Attack", 15, 20),
-            Skill("Multi Strike", 10, 25, target_type='all')
-        ]
-        self.combat_sprite = pygame.image.load('characters/hero.png')
-        self.combat_sprite = pygame.transform.scale(self.combat_sprite, (COMBAT_SPRITE_SIZE, COMBAT_SPRITE_SIZE))
+        self.skills = list(stats['skills'])
+        self.combat_sprite = load_image(CONTENT.role_sprites[CONTENT.role_ids['Player']],
+                                        (COMBAT_SPRITE_SIZE, COMBAT_SPRITE_SIZE))
 
     def move(self, dx, dy):
         if dx == 0 and dy == 0:
@@ -237,11 +394,8 @@ class Player(pygame.sprite.Sprite):
         new_x = self.rect.x + dx * GRID_SIZE
         new_y = self.rect.y + dy * GRID_SIZE
         
-        # Create a slightly smaller rect for collision testing with walls
-        test_rect = pygame.Rect(new_x + 2, new_y + 2, GRID_SIZE - 4, GRID_SIZE - 4)
-        
-        # Only update position if there's no wall collision
-        colliding = any(wall.rect.colliderect(test_rect) for wall in walls)
+        # Only update position if the destination tile isn't a wall
+        colliding = wall_grid.is_blocked(new_x // GRID_SIZE, new_y // GRID_SIZE)
         if not colliding:
             self.rect.x = new_x
             self.rect.y = new_y
@@ -249,190 +403,73 @@ class Player(pygame.sprite.Sprite):
             self.current_frame = (self.current_frame + 1) % 3
             self.image = self.sprites[self.direction][self.current_frame]
 
-# Updated Enemy class
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self, x, y, level):
-        super().__init__()
-        # Load the directional sprites with animation frames
-        self.sprites = {
-            'down': [pygame.transform.scale(enemy_sprites[i], (GRID_SIZE, GRID_SIZE)) for i in range(54, 57)],
-            'left': [pygame.transform.scale(enemy_sprites[i], (GRID_SIZE, GRID_SIZE)) for i in range(66, 69)],
-            'right': [pygame.transform.scale(enemy_sprites[i], (GRID_SIZE, GRID_SIZE)) for i in range(78, 81)],
-            'up': [pygame.transform.scale(enemy_sprites[i], (GRID_SIZE, GRID_SIZE)) for i in range(90, 93)]
-        }
-        self.direction = 'down'  # Default direction
-        self.current_frame = 0  # Current frame index (0-2)
-        
-        # Set initial sprite
-        self.image = self.sprites[self.direction][0]
-        self.rect = self.image.get_rect()
-        self.rect.x = x * GRID_SIZE
-        self.rect.y = y * GRID_SIZE
-        
-        self.level = level
-        self.health = 30 + (level * 10)
-        self.attack = 5 + (level * 2)
-        self.speed = 1.0
-        self.vision_range = 8 * GRID_SIZE
-        self.move_cooldown = 0
-        self.move_delay = 30
-        self.is_alive = True
-
-    def move_towards_player(self, player, walls):
-        if self.move_cooldown > 0:
-            self.move_cooldown -= 1
-            return
-
-        # Calculate direction to player
-        dx = player.rect.x - self.rect.x
-        dy = player.rect.y - self.rect.y
-        
-        # Only move if within vision range
-        dist = math.hypot(dx, dy)
-        if dist > self.vision_range:
-            return
-        
-        # Determine primary direction (horizontal or vertical)
-        if abs(dx) > abs(dy):
-            # Move horizontally
-            dx = 1 if dx > 0 else -1
-            dy = 0
-        else:
-            # Move vertically
-            dx = 0
-            dy = 1 if dy > 0 else -1
-
-        # Update direction based on movement
-        if dx > 0:
-            self.direction = 'right'
-        elif dx < 0:
-            self.direction = 'left'
-        elif dy > 0:
-            self.direction = 'down'
-        elif dy < 0:
-            self.direction = 'up'
-
-        # Calculate new position
-        new_x = self.rect.x + dx * GRID_SIZE
-        new_y = self.rect.y + dy * GRID_SIZE
-
-        # Create collision rect for testing
-        test_rect = pygame.Rect(new_x + 2, new_y + 2, GRID_SIZE - 4, GRID_SIZE - 4)
-
-        # Check collisions with walls and other enemies
-        wall_collision = any(wall.rect.colliderect(test_rect) for wall in walls)
-        enemy_collision = any(enemy.rect.colliderect(test_rect) for enemy in enemies if enemy != self)
-
-        # Only move if there are no collisions with walls or other enemies
-        # Note: We don't check player collision here to allow battle initiation
-        if not (wall_collision or enemy_collision):
-            self.rect.x = new_x
-            self.rect.y = new_y
-            # Update animation frame only when actually moving
-            self.current_frame = (self.current_frame + 1) % 3
-            self.image = self.sprites[self.direction][self.current_frame]
-            self.move_cooldown = self.move_delay
-
-# Item class
-class Item(pygame.sprite.Sprite):
-    def __init__(self, x, y, item_type):
-        super().__init__()
-        self.image = chest_tile  # Use chest_tile instead of yellow surface
-        self.rect = self.image.get_rect()
-        self.rect.x = x * GRID_SIZE + 1
-        self.rect.y = y * GRID_SIZE + 1
-        self.type = item_type
-
-# Wall class
-class Wall(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        self.image = rock_tile  # Use rock_tile instead of a grey surface
-        self.rect = self.image.get_rect()
-        self.rect.x = x * GRID_SIZE
-        self.rect.y = y * GRID_SIZE
-
-# Stairs class
-class Stairs(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        self.image = stairs_tile  # Use stairs_tile instead of green surface
-        self.rect = self.image.get_rect()
-        self.rect.x = x * GRID_SIZE + 1
-        self.rect.y = y * GRID_SIZE + 1
-
-# Create sprite groups
-all_sprites = pygame.sprite.Group()
-enemies = pygame.sprite.Group()
-items = pygame.sprite.Group()
-walls = pygame.sprite.Group()
+# Enemy animation frames by facing; enemies themselves live in enemy_store
+enemy_frames = {
+    'down': enemy_sprites[54:57],
+    'left': enemy_sprites[66:69],
+    'right': enemy_sprites[78:81],
+    'up': enemy_sprites[90:93]
+}
+
+# Tile lookups used for movement collision (rebuilt by generate_dungeon)
+wall_grid = OccupancyGrid(COLS, ROWS)
+# Treasure chests by tile (entities.Item records)
+level_items = TileHash()
+# Floor and walls pre-rendered once per level
+level_surface = pygame.Surface((WIDTH, HEIGHT))
+# Timed events for the current level (enemy moves, and later status effects
+# or regeneration), advanced one tick per exploration frame
+game_timers = TimerWheel()
+# Every dungeon enemy, stored as columns; only enemies whose move is due act
+enemy_store = EnemyStore(COLS, ROWS, move_delay=ENEMY_MOVE_DELAY, timers=game_timers, budget_ms=AI_BUDGET_MS)
+# Walking distance to the player's tile, shared by every enemy's pursuit
+player_field = DistanceField()
+# Tiles in line of sight of the player, read by enemy vision and the fog of war
+player_fov = FieldOfView(max(ENEMY_VISION_RANGE, FOG_RADIUS))
+fog_surface = pygame.Surface((WIDTH, HEIGHT))
+
+# Every random draw comes from a named stream of the run seed (--seed to fix it)
+rng_streams = RngStreams()
+game_number = 0  # Counts new games and restarts, so each one gets new levels
 
 # Create player, party members, and stairs
 player = None
 party_members = []  # Initialize as empty list
 stairs = None
-floor_pattern = None
 
-# Define the PartyMember class before using it
+# Party members; stats, skills and sprites come from the role tables in data/roles.json
 class PartyMember(pygame.sprite.Sprite):
     def __init__(self, role):
         super().__init__()
+        # Combat stats come from combat_engine so the simulator and the game agree
+        stats = PARTY_ROLES[role]
         self.role = role
-        self.mana = 100
-        self.max_mana = 100
+        self.mana = stats['mana']
+        self.max_mana = stats['mana']
         self.defense_bonus = 1
         self.speed = 1.0  # Add speed attribute
-        self.skills = []
-        
-        if role == 'Warrior':
-            self.health = 120
-            self.max_health = 120
-            self.attack = 12
-            self.color = RED
-            self.skills = [
-                Skill("Slash All", 8, 20, target_type='all'),
-                Skill("Power Strike", 20, 15)
-            ]
-        elif role == 'Mage':
-            self.health = 80
-            self.max_health = 80
-            self.attack = 15
-            self.color = LIGHT_BLUE
-            self.skills = [
-                Skill("Fireball", 25, 20),
-                Skill("Lightning Storm", 15, 30, target_type='all')
-            ]
-        elif role == 'Healer':
-            self.health = 90
-            self.max_health = 90
-            self.attack = 8
-            self.color = GREEN
-            self.skills = [
-                Skill("Heal", 30, 20, effect_type='heal'),
-                Skill("Group Heal", 15, 35, target_type='all', effect_type='heal')
-            ]
+        self.health = stats['health']
+        self.max_health = stats['health']
+        self.attack = stats['attack']
+        self.color = {'Warrior': RED, 'Mage': LIGHT_BLUE, 'Healer': GREEN}.get(role, WHITE)
+        self.skills = list(stats['skills'])
         self.is_alive = True
         self.name = role
         # Load combat sprite
-        self.combat_sprite = pygame.image.load(f'characters/{role.lower()}.png')
-        self.combat_sprite = pygame.transform.scale(self.combat_sprite, (COMBAT_SPRITE_SIZE, COMBAT_SPRITE_SIZE))
+        self.combat_sprite = load_image(CONTENT.role_sprites[CONTENT.role_ids[role]],
+                                        (COMBAT_SPRITE_SIZE, COMBAT_SPRITE_SIZE))
 
 # Ensure the PartyMember class is defined before this function
 def generate_dungeon(level):
-    global player, party_members, stairs, floor_pattern
-    all_sprites.empty()
-    enemies.empty()
-    items.empty()
-    walls.empty()
+    global player, party_members, stairs, wall_grid
+    level_items.clear()
+    enemy_store.clear()
+    game_timers.clear()
     
     # Initialize player and party members if they don't exist
     if player is None:
         player = Player(0, 0)
-        party_members = [
-            PartyMember('Warrior'),
-            PartyMember('Mage'),
-            PartyMember('Healer')
-        ]
+        party_members = [PartyMember(role) for role in PARTY_ORDER[1:]]
     
     # Reset defense bonus and regenerate some mana for all characters
     player.defense_bonus = 1
@@ -441,471 +478,48 @@ def generate_dungeon(level):
         member.defense_bonus = 1
         member.mana = min(member.max_mana, member.mana + 50)  # Regenerate 50 mana between levels
     
-    # Create grid
-    grid = [[1 for _ in range(COLS)] for _ in range(ROWS)]
-    
-    # Create floor tile pattern - varies by level
-    # Every 3 levels, we change the floor tiles for more variety
-    level_theme = (level - 1) // 3
-    if level_theme == 0:  # Levels 1-3: Standard dungeon
-        floor_tiles = [dungeon_tile1, dungeon_tile2]
-        # More dungeon_tile1 for lower levels
-        weights = [0.7, 0.3]
-    elif level_theme == 1:  # Levels 4-6: More dungeon_tile2
-        floor_tiles = [dungeon_tile1, dungeon_tile2]
-        # More dungeon_tile2 for middle levels
-        weights = [0.3, 0.7]
-    else:  # Levels 7+: Even mix but with patterns
-        floor_tiles = [dungeon_tile1, dungeon_tile2]
-        weights = [0.5, 0.5]
-    
-    # Generate floor pattern based on level theme
-    floor_pattern = []
-    for y in range(ROWS):
-        row = []
-        for x in range(COLS):
-            # Add some patterns based on level
-            if level_theme >= 2 and (x + y) % 2 == 0:  # Checkerboard for higher levels
-                tile = floor_tiles[0]
-            elif level_theme >= 2 and (x + y) % 2 == 1:
-                tile = floor_tiles[1]
-            else:
-                # Random selection with weights
-                tile = random.choices(floor_tiles, weights=weights, k=1)[0]
-            row.append(tile)
-        floor_pattern.append(row)
-
-    # Dungeon generation strategy varies by level
-    # Determine room parameters based on level
-    rooms = []
-    level_mod = level % 5  # Cycle through 5 different dungeon types
-    
-    if level_mod == 0:  # Cavernous levels - fewer, larger rooms
-        max_attempts = 40
-        target_rooms = 3 + level // 2
-        min_room_size = 8
-        max_room_size = 15
-        sectors_h = 2
-        sectors_v = 2
-    elif level_mod == 1:  # Cramped levels - many small rooms
-        max_attempts = 60
-        target_rooms = 8 + level // 2
-        min_room_size = 4
-        max_room_size = 7
-        sectors_h = 4
-        sectors_v = 4
-    elif level_mod == 2:  # Long horizontal rooms
-        max_attempts = 50
-        target_rooms = 5 + level // 2
-        min_room_width = 8
-        max_room_width = 14
-        min_room_height = 4
-        max_room_height = 7
-        sectors_h = 3
-        sectors_v = 3
-    elif level_mod == 3:  # Long vertical rooms
-        max_attempts = 50
-        target_rooms = 5 + level // 2
-        min_room_width = 4
-        max_room_width = 7
-        min_room_height = 8
-        max_room_height = 14
-        sectors_h = 3
-        sectors_v = 3
-    else:  # Balanced medium rooms
-        max_attempts = 50
-        target_rooms = 6 + level // 2
-        min_room_size = 5
-        max_room_size = 10
-        sectors_h = 3
-        sectors_v = 3
-
-    # Calculate sector dimensions
-    sector_w = (COLS - 2) // sectors_h
-    sector_h = (ROWS - 2) // sectors_v
-
-    # Try to place rooms in each sector
-    for sy in range(sectors_v):
-        for sx in range(sectors_h):
-            attempts = 0
-            while attempts < max_attempts and len(rooms) < target_rooms:
-                # Room size depends on level type
-                if level_mod == 2:  # Horizontal rooms
-                    room_width = random.randint(min_room_width, max_room_width)
-                    room_height = random.randint(min_room_height, max_room_height)
-                elif level_mod == 3:  # Vertical rooms
-                    room_width = random.randint(min_room_width, max_room_width)
-                    room_height = random.randint(min_room_height, max_room_height)
-                else:
-                    room_width = random.randint(min_room_size, max_room_size)
-                    room_height = random.randint(min_room_size, max_room_size)
-                
-                # Calculate bounds for this sector
-                min_x = 1 + sx * sector_w
-                max_x = min_x + sector_w - room_width - 1
-                min_y = 1 + sy * sector_h
-                max_y = min_y + sector_h - room_height - 1
-                
-                # Ensure we stay within grid bounds
-                max_x = min(max_x, COLS - room_width - 1)
-                max_y = min(max_y, ROWS - room_height - 1)
-                
-                # Add some variability to room placement
-                if max_x <= min_x:
-                    max_x = min_x + 1
-                if max_y <= min_y:
-                    max_y = min_y + 1
-                
-                x = random.randint(min_x, max_x)
-                y = random.randint(min_y, max_y)
-
-                # Add padding around rooms (varies by level)
-                padding = 1 if level_mod in [1, 2, 3] else 2  # Tighter packing for some level types
-                overlaps = any(
-                    x - padding < r[0] + r[2] + padding and x + room_width + padding > r[0] and
-                    y - padding < r[1] + r[3] + padding and y + room_height + padding > r[1]
-                    for r in rooms
-                )
-
-                if not overlaps:
-                    # Carve out room
-                    # Add randomness to room shape in higher levels
-                    if level > 3 and random.random() < 0.3:  # 30% chance for non-rectangular rooms in higher levels
-                        # Create an irregular room by carving a slightly smaller core
-                        core_w = max(room_width - 2, 3)
-                        core_h = max(room_height - 2, 3)
-                        core_x = x + random.randint(0, room_width - core_w)
-                        core_y = y + random.randint(0, room_height - core_h)
-                        
-                        # Carve the core first
-                        for i in range(core_y, core_y + core_h):
-                            for j in range(core_x, core_x + core_w):
-                                grid[i][j] = 0
-                        
-                        # Add random extensions
-                        extensions = random.randint(2, 4)
-                        for _ in range(extensions):
-                            ext_x = random.randint(x, x + room_width - 1)
-                            ext_y = random.randint(y, y + room_height - 1)
-                            ext_w = random.randint(2, 4)
-                            ext_h = random.randint(2, 4)
-                            for i in range(max(y, ext_y), min(y + room_height, ext_y + ext_h)):
-                                for j in range(max(x, ext_x), min(x + room_width, ext_x + ext_w)):
-                                    grid[i][j] = 0
-                    else:
-                        # Regular rectangular room
-                        for i in range(y, y + room_height):
-                            for j in range(x, x + room_width):
-                                grid[i][j] = 0
-                    
-                    rooms.append((x, y, room_width, room_height))
-                    break
-                attempts += 1
-
-    # Connect rooms using A* pathfinding
-    def manhattan_distance(p1, p2):
-        return abs(p1[0] - p2[0]) + abs(p1[1] - p2[1])
-
-    def get_neighbors(pos):
-        x, y = pos
-        neighbors = []
-        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-            new_x, new_y = x + dx, y + dy
-            if 0 < new_x < COLS-1 and 0 < new_y < ROWS-1:
-                neighbors.append((new_x, new_y))
-        return neighbors
-
-    def create_corridor(start, end):
-        open_set = [(0, start)]
-        came_from = {start: None}
-        g_score = {start: 0}
-        f_score = {start: manhattan_distance(start, end)}
-        
-        while open_set:
-            current = min(open_set, key=lambda x: x[0])[1]
-            if current == end:
-                # Reconstruct path
-                path = []
-                while current in came_from:
-                    path.append(current)
-                    current = came_from[current]
-                return path[::-1]
-            
-            open_set = [(f, pos) for f, pos in open_set if pos != current]
-            
-            for neighbor in get_neighbors(current):
-                tentative_g = g_score[current] + 1
-                
-                if neighbor not in g_score or tentative_g < g_score[neighbor]:
-                    came_from[neighbor] = current
-                    g_score[neighbor] = tentative_g
-                    f_score[neighbor] = tentative_g + manhattan_distance(neighbor, end)
-                    open_set.append((f_score[neighbor], neighbor))
-        
-        return None
-
-    # Connect rooms based on level type
-    if level_mod == 0:  # Cavernous: connect with wider corridors
-        corridor_width = 2
-    elif level_mod == 1:  # Cramped: connect with more direct, narrow paths
-        corridor_width = 1
-    else:
-        corridor_width = 1 + level // 5  # Wider corridors in deeper levels
-    
-    # Decide on connection pattern
-    if level_mod == 4 or random.random() < 0.3:  # Circular connection for some levels
-        # Connect rooms in a circle
-        for i in range(len(rooms)):
-            room1 = rooms[i]
-            room2 = rooms[(i + 1) % len(rooms)]
-            
-            # Get center points of rooms
-            start_x = room1[0] + room1[2] // 2
-            start_y = room1[1] + room1[3] // 2
-            end_x = room2[0] + room2[2] // 2
-            end_y = room2[1] + room2[3] // 2
-            
-            # Create corridor between rooms
-            path = create_corridor((start_x, start_y), (end_x, end_y))
-            if path:
-                for x, y in path:
-                    grid[y][x] = 0
-                    # Add width to corridors
-                    for w in range(corridor_width):
-                        for dx, dy in [(w, 0), (0, w), (-w, 0), (0, -w)]:
-                            nx, ny = x + dx, y + dy
-                            if 0 < nx < COLS-1 and 0 < ny < ROWS-1:
-                                grid[ny][nx] = 0
-    else:
-        # Connect rooms in sequence for most levels
-        for i in range(len(rooms) - 1):
-            room1 = rooms[i]
-            room2 = rooms[i + 1]
-            
-            # Get center points of rooms
-            start_x = room1[0] + room1[2] // 2
-            start_y = room1[1] + room1[3] // 2
-            end_x = room2[0] + room2[2] // 2
-            end_y = room2[1] + room2[3] // 2
-            
-            # Create corridor between rooms
-            path = create_corridor((start_x, start_y), (end_x, end_y))
-            if path:
-                for x, y in path:
-                    grid[y][x] = 0
-                    # Add width to corridors
-                    for w in range(corridor_width):
-                        for dx, dy in [(w, 0), (0, w), (-w, 0), (0, -w)]:
-                            nx, ny = x + dx, y + dy
-                            if 0 < nx < COLS-1 and 0 < ny < ROWS-1:
-                                grid[ny][nx] = 0
-        
-    # Add some extra connections for deeper levels (with safety checks)
-    if level > 2 and len(rooms) >= 4:  # Only if we have enough rooms
-        extra_connections = min(3, level // 2)  # More connections in deeper levels
-        max_attempts = extra_connections * 2  # Allow multiple attempts to find valid connections
-        
-        connections_made = 0
-        attempts = 0
-        
-        while connections_made < extra_connections and attempts < max_attempts:
-            # Make sure we have enough rooms ahead to make a connection
-            if len(rooms) <= 3:
-                break
-                
-            # Pick two rooms that aren't adjacent
-            i = random.randint(0, len(rooms) - 3)
-            if i + 2 >= len(rooms):
-                attempts += 1
-                continue
-                
-            max_j = min(i + 4, len(rooms) - 1)
-            if i + 2 > max_j:  # Can't make a valid connection
-                attempts += 1
-                continue
-                
-            j = random.randint(i + 2, max_j)
-            
-            room1 = rooms[i]
-            room2 = rooms[j]
-            
-            # Get center points of rooms
-            start_x = room1[0] + room1[2] // 2
-            start_y = room1[1] + room1[3] // 2
-            end_x = room2[0] + room2[2] // 2
-            end_y = room2[1] + room2[3] // 2
-            
-            # Create corridor between rooms
-            path = create_corridor((start_x, start_y), (end_x, end_y))
-            if path:
-                for x, y in path:
-                    grid[y][x] = 0
-                    # Add some width to corridors
-                    for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-                        nx, ny = x + dx, y + dy
-                        if 0 < nx < COLS-1 and 0 < ny < ROWS-1:
-                            grid[ny][nx] = 0
-                connections_made += 1
-            
-            attempts += 1
-
-    # Create wall sprites
+    # Lay the level out, then build the game's lookups and surface from it
+    layout = generate_level(level, COLS, ROWS, **rng_streams.level(game_number, level))
+    wall_grid = layout.walls
+    for item in layout.items:
+        level_items.add(item, item.tile)
+    for enemy_x, enemy_y in layout.enemies:
+        enemy_store.add(enemy_x, enemy_y, level)
+    stairs = layout.stairs
+    player_x, player_y = layout.entrance
+    player.rect.x = player_x * GRID_SIZE + 1
+    player.rect.y = player_y * GRID_SIZE + 1
+
+    # Pre-render the floor pattern and walls so a frame draws the level with one blit
+    floor_tiles = (dungeon_tile1, dungeon_tile2)
     for y in range(ROWS):
         for x in range(COLS):
-            if grid[y][x] == 1:
-                wall = Wall(x, y)
-                walls.add(wall)
-                all_sprites.add(wall)
-
-    # Randomize room order for player and stairs placement
-    # This prevents always starting in the top-left and ending in the bottom-right
-    available_rooms = rooms.copy()
-    random.shuffle(available_rooms)
-    
-    # Select entrance and exit rooms that are far apart
-    # We want to ensure a good distance between start and end
-    entrance_room = None
-    exit_room = None
-    
-    # Try to maximize Manhattan distance between entrance and exit
-    max_distance = 0
-    for i, room1 in enumerate(available_rooms):
-        for j, room2 in enumerate(available_rooms):
-            if i != j:
-                # Calculate centers of rooms
-                center1_x = room1[0] + room1[2] // 2
-                center1_y = room1[1] + room1[3] // 2
-                center2_x = room2[0] + room2[2] // 2
-                center2_y = room2[1] + room2[3] // 2
-                
-                # Calculate Manhattan distance between room centers
-                distance = abs(center1_x - center2_x) + abs(center1_y - center2_y)
-                
-                if distance > max_distance:
-                    max_distance = distance
-                    entrance_room = room1
-                    exit_room = room2
-    
-    # If we couldn't find rooms far apart, just use first and last
-    if entrance_room is None or exit_room is None:
-        entrance_room = available_rooms[0]
-        exit_room = available_rooms[-1]
-
-    # Place player in entrance room
-    # Find a clear spot near the center of the entrance room
-    room_center_x = entrance_room[0] + entrance_room[2] // 2
-    room_center_y = entrance_room[1] + entrance_room[3] // 2
-    
-    # Look for a good spot near the center
-    player_x, player_y = room_center_x, room_center_y
-    
-    # Make sure it's a valid spot (not too close to walls)
-    player_x = max(entrance_room[0] + 1, min(player_x, entrance_room[0] + entrance_room[2] - 2))
-    player_y = max(entrance_room[1] + 1, min(player_y, entrance_room[1] + entrance_room[3] - 2))
-    
-    if player is None:  # Only create new player if one doesn't exist
-        player = Player(player_x, player_y)
-        party_members = [
-            PartyMember('Warrior'),
-            PartyMember('Mage'),
-            PartyMember('Healer')
-        ]
-    else:  # Otherwise just update position
-        player.rect.x = player_x * GRID_SIZE + 1
-        player.rect.y = player_y * GRID_SIZE + 1
-    all_sprites.add(player)
-
-    # Place stairs in exit room
-    # Find a clear spot near the center of the exit room
-    exit_center_x = exit_room[0] + exit_room[2] // 2
-    exit_center_y = exit_room[1] + exit_room[3] // 2
-    
-    # Look for a good spot near the center
-    stairs_x, stairs_y = exit_center_x, exit_center_y
-    
-    # Make sure it's a valid spot (not too close to walls)
-    stairs_x = max(exit_room[0] + 1, min(stairs_x, exit_room[0] + exit_room[2] - 2))
-    stairs_y = max(exit_room[1] + 1, min(stairs_y, exit_room[1] + exit_room[3] - 2))
-    
-    stairs = Stairs(stairs_x, stairs_y)
-    all_sprites.add(stairs)
-
-    # Avoid placing enemies in entrance and exit rooms
-    enemy_rooms = [room for room in available_rooms if room != entrance_room and room != exit_room]
-
-    # Add enemies and items to rooms - vary by level
-    enemy_chance = 0.7 + (level * 0.05)  # Higher level = more enemies
-    item_chance = 0.7 - (level * 0.03)  # Higher level = slightly fewer items
-    
-    for room in enemy_rooms:
-        x, y, w, h = room
-        
-        # Enemy count based on room size and level
-        room_area = w * h
-        max_enemies = max(1, min(room_area // 15, 3 + level // 2))
-        enemy_count = random.randint(1, max_enemies)
-        
-        for _ in range(enemy_count):
-            if random.random() < enemy_chance:
-                enemy_x, enemy_y = random.randint(x+1, x+w-2), random.randint(y+1, y+h-2)
-                enemy = Enemy(enemy_x, enemy_y, level)
-                enemies.add(enemy)
-                all_sprites.add(enemy)
-
-        # Item placement
-        if random.random() < item_chance:
-            item_x, item_y = random.randint(x+1, x+w-2), random.randint(y+1, y+h-2)
-            
-            # Item type varies by level
-            if level <= 3:
-                item_weights = [0.7, 0.2, 0.1]  # More health potions in early levels
-            elif level <= 6:
-                item_weights = [0.5, 0.3, 0.2]  # More balanced in mid levels
-            else:
-                item_weights = [0.4, 0.3, 0.3]  # More attribute potions in later levels
-                
-            item_type = random.choices(
-                ['health_potion', 'strength_potion', 'speed_potion'],
-                weights=item_weights, k=1)[0]
-                
-            item = Item(item_x, item_y, item_type)
-            items.add(item)
-            all_sprites.add(item)
-    
-    # Add items to entrance room (but no enemies)
-    if random.random() < item_chance * 1.5:  # Higher chance for item in starting room
-        x, y, w, h = entrance_room
-        item_x, item_y = random.randint(x+1, x+w-2), random.randint(y+1, y+h-2)
-        
-        # More likely to be health potion in entrance room
-        item_weights = [0.8, 0.1, 0.1]
-        item_type = random.choices(
-            ['health_potion', 'strength_potion', 'speed_potion'],
-            weights=item_weights, k=1)[0]
-            
-        item = Item(item_x, item_y, item_type)
-        items.add(item)
-        all_sprites.add(item)
-    
-    # Add obstacles in corridors based on level
-    if level_mod == 0:  # Cavernous level - fewer obstacles
-        obstacle_count = 5 + level
-    elif level_mod == 1:  # Cramped level - more obstacles
-        obstacle_count = 15 + level * 2
-    else:
-        obstacle_count = 10 + level * 2
-        
-    for _ in range(obstacle_count):
-        x, y = random.randint(1, COLS-2), random.randint(1, ROWS-2)
-        if grid[y][x] == 0 and not any(sprite.rect.collidepoint(x*GRID_SIZE, y*GRID_SIZE) for sprite in all_sprites):
-            # Don't block critical paths
-            neighbors_open = sum(1 for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)] 
-                               if 0 < x+dx < COLS-1 and 0 < y+dy < ROWS-1 and grid[y+dy][x+dx] == 0)
-            
-            if neighbors_open >= 3:  # Only add obstacle if it won't block a path
-                wall = Wall(x, y)
-                walls.add(wall)
-                all_sprites.add(wall)
+            tile = rock_tile if wall_grid.is_blocked(x, y) else floor_tiles[layout.floor[y * COLS + x]]
+            level_surface.blit(tile, (x * GRID_SIZE, y * GRID_SIZE))
+
+def new_game():
+    """Start over on level 1 with a new player and party; nothing carries over from the last game."""
+    global player, party_members, game_number
+    player = None  # generate_dungeon creates them
+    party_members = []
+    game_number += 1
+    generate_dungeon(1)
+    # Checked here rather than in generate_dungeon, so timing generation (soak.py) leaves it out
+    if leak_tracker is not None:
+        leak_tracker.checkpoint('level start')
+
+def game_state_hash():
+    """Digest of the state a replayed session has to end in (see session_record)."""
+    enemies = enemy_store.count
+    return state_hash(
+        rng_streams.seed, rng_streams.state(), game_number, combat_speed, auto_battle,
+        [(member.role, member.level if member is player else None, member.health, member.max_health,
+          member.attack, member.mana) for member in [player] + party_members],
+        (player.rect.x, player.rect.y), stairs.tile,
+        sorted((item.tile, item.type) for item in level_items.in_area(0, 0, COLS - 1, ROWS - 1)),
+        enemy_store.x[:enemies].tobytes(), enemy_store.y[:enemies].tobytes(),
+        enemy_store.alive[:enemies].tobytes(), combat_log.written, bytes(combat_log.buffer),
+    )
 
 # Generate initial dungeon
 generate_dungeon(1)
@@ -962,7 +576,7 @@ def show_launch_menu():
         
         pygame.display.flip()
         
-        for event in pygame.event.get():
+        for event in get_events('menu'):
             if event.type == pygame.QUIT:
                 pygame.mixer.music.stop()
                 return "quit"
@@ -978,7 +592,7 @@ def show_launch_menu():
                     else:
                         return "quit"
             if event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
+                mouse_pos = event.pos  # Where the click was, which is also what a replay knows
                 for i, rect in enumerate(button_rects):
                     if rect.collidepoint(mouse_pos):
                         pygame.mixer.music.stop()
@@ -1003,7 +617,7 @@ def show_game_over_menu():
         
         pygame.display.flip()
         
-        for event in pygame.event.get():
+        for event in get_events('game_over'):
             if event.type == pygame.QUIT:
                 return "quit"
             if event.type == pygame.KEYDOWN:
@@ -1017,7 +631,7 @@ def show_game_over_menu():
                     else:
                         return "quit"
             if event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
+                mouse_pos = event.pos  # Where the click was, which is also what a replay knows
                 for i, rect in enumerate(button_rects):
                     if rect.collidepoint(mouse_pos):
                         if i == 0:
@@ -1029,13 +643,14 @@ def show_treasure_popup(screen, treasure_type):
     """
     Show an exciting popup when a treasure chest is collected
     """
-    # Find treasures that match the type
-    matching_treasures = [t for t in TREASURES if t["type"] == treasure_type]
+    # Treasures that match the type
+    matching_treasures = CONTENT.treasures_by_item[CONTENT.item_ids[treasure_type]]
     if not matching_treasures:
-        matching_treasures = TREASURES  # Fallback to all treasures
+        matching_treasures = range(len(CONTENT.treasures))  # Fallback to all treasures
     
     # Choose a random treasure from matching ones
-    treasure = random.choice(matching_treasures)
+    name, description, image_path, _ = CONTENT.treasures[rng_streams.stream('loot').choice(matching_treasures)]
+    treasure_image = treasure_images[image_path]
     
     # Play the discovery sound
     discovery_sound = load_sound('sounds/Magical Sting 2.wav')
@@ -1050,20 +665,20 @@ def show_treasure_popup(screen, treasure_type):
     pygame.draw.rect(popup, YELLOW, (0, 0, popup_width, popup_height), 4)  # Gold border
     
     # Draw treasure image
-    image_rect = treasure["image"].get_rect(center=(popup_width//4, popup_height//2))
-    popup.blit(treasure["image"], image_rect)
+    image_rect = treasure_image.get_rect(center=(popup_width//4, popup_height//2))
+    popup.blit(treasure_image, image_rect)
     
     # Draw text
     font_large = pygame.font.Font(None, 36)
     font_small = pygame.font.Font(None, 24)
     
     # Treasure name
-    name_text = font_large.render(f"You found: {treasure['name']}!", True, YELLOW)
+    name_text = font_large.render(f"You found: {name}!", True, YELLOW)
     name_rect = name_text.get_rect(midtop=(popup_width//2 + 50, 30))
     popup.blit(name_text, name_rect)
     
     # Treasure description
-    desc_text = font_small.render(treasure['description'], True, WHITE)
+    desc_text = font_small.render(description, True, WHITE)
     desc_rect = desc_text.get_rect(midtop=(popup_width//2 + 50, 80))
     popup.blit(desc_text, desc_rect)
     
@@ -1085,7 +700,7 @@ def show_treasure_popup(screen, treasure_type):
     # Animation loop
     waiting_for_key = True
     while waiting_for_key:
-        for event in pygame.event.get():
+        for event in get_events('popup'):
             if event.type == pygame.QUIT:
                 pygame.quit()
                 return
@@ -1108,7 +723,7 @@ def show_treasure_popup(screen, treasure_type):
             # Draw the scaled popup
             screen.blit(scaled_popup, popup_rect)
             pygame.display.flip()
-            clock.tick(FRAME_RATE)
+            clock.tick(frame_cap)
     
     # Play a sound when closing the popup
     close_sound = load_sound('sounds/Level up Pickup (Rpg).wav')
@@ -1117,63 +732,23 @@ def show_treasure_popup(screen, treasure_type):
 
 # Add new classes for combat
 class CombatEnemy:
-    def __init__(self, level):
-        self.health = 30 + (level * 10)
-        self.max_health = self.health
-        self.attack = 5 + (level * 2)
-        # Randomly choose enemy type and set corresponding sprite
-        self.name = random.choice(['Goblin', 'Skeleton', 'Orc', 'Troll'])
-        self.sprite = pygame.image.load(f'enemies/{self.name.lower()}.png')
-        self.sprite = pygame.transform.scale(self.sprite, (COMBAT_SPRITE_SIZE, COMBAT_SPRITE_SIZE))  # Scale to desired size
-        self.is_alive = True
+    __slots__ = ('health', 'max_health', 'attack', 'defense_bonus', 'name', 'sprite', 'is_alive')
 
-# Add this new class after the Player class
-class PartyMember(pygame.sprite.Sprite):
-    def __init__(self, role):
-        super().__init__()
-        self.role = role
-        self.mana = 100
-        self.max_mana = 100
+    def __init__(self, level, name):
+        self.health, self.attack = enemy_stats(level)
+        self.max_health = self.health
         self.defense_bonus = 1
-        self.speed = 1.0  # Add speed attribute
-        self.skills = []
-        
-        if role == 'Warrior':
-            self.health = 120
-            self.max_health = 120
-            self.attack = 12
-            self.color = RED
-            self.skills = [
-                Skill("Slash All", 8, 20, target_type='all'),
-                Skill("Power Strike", 20, 15)
-            ]
-        elif role == 'Mage':
-            self.health = 80
-            self.max_health = 80
-            self.attack = 15
-            self.color = LIGHT_BLUE
-            self.skills = [
-                Skill("Fireball", 25, 20),
-                Skill("Lightning Storm", 15, 30, target_type='all')
-            ]
-        elif role == 'Healer':
-            self.health = 90
-            self.max_health = 90
-            self.attack = 8
-            self.color = GREEN
-            self.skills = [
-                Skill("Heal", 30, 20, effect_type='heal'),
-                Skill("Group Heal", 15, 35, target_type='all', effect_type='heal')
-            ]
+        # The enemy type picks the corresponding sprite
+        self.name = name
+        self.sprite = load_image(CONTENT.enemy_sprites[CONTENT.enemy_ids[name]], (COMBAT_SPRITE_SIZE, COMBAT_SPRITE_SIZE))
         self.is_alive = True
-        self.name = role
-        # Load combat sprite
-        self.combat_sprite = pygame.image.load(f'characters/{role.lower()}.png')
-        self.combat_sprite = pygame.transform.scale(self.combat_sprite, (COMBAT_SPRITE_SIZE, COMBAT_SPRITE_SIZE))
 
 # Modify CombatSystem class
 class CombatSystem:
-    def __init__(self, player, party_members, dungeon_enemy):
+    def __init__(self, player, party_members, enemy_level, groups=1, seed=None, log=None, replay=None):
+        # groups is how many dungeon enemies joined the fight (each brings 1-4 combatants);
+        # seed drives every roll in the fight; replay is a recorded list of party
+        # actions (see combat_log.read_encounter) to play instead of reading input
         # Load and play battle music
         play_music('music/Eternal Quest.mp3')
         
@@ -1191,11 +766,17 @@ class CombatSystem:
         self.player = player
         self.party_members = party_members
         self.party = [player] + self.party_members
-        self.enemy_count = random.randint(1, 4)
-        self.enemies = [CombatEnemy(dungeon_enemy.level) for _ in range(self.enemy_count)]
-        
+        self.seed = rng_streams.stream('combat').getrandbits(32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        if log is not None:
+            log.begin(self.seed, enemy_level, self.party, groups)
+        self.enemies = [CombatEnemy(enemy_level, name) for name in roll_enemies(self.rng, groups)]
+        self.enemy_count = len(self.enemies)
+        # The rules (initiative, damage, skills, running away) live in the encounter
+        self.encounter = Encounter(self.party, self.enemies, self.rng, log=log)
+        self.replay_actions = deque(replay or ())
+
         # Initialize turn tracking variables
-        self.current_turn_index = 0
         self.selected_enemy = 0
         self.selected_action = 0
         self.selected_party_member = 0
@@ -1218,102 +799,180 @@ class CombatSystem:
         self.targeting_mode = False
         
         # Load blood splatter animation
-        self.blood_frames = load_sprite_sheet('effects/blood - left 1.png', 16, 512, 512)
+        # Frames come pre-scaled to the on-screen animation size
+        self.blood_frames = load_sprite_sheet('effects/blood - left 1.png', 16, 512, 512, (256, 256))
         self.current_frame = 0
         self.animation_speed = 2  # Frames to skip before showing next animation frame
         self.frame_counter = 0
-        
+        # Blood splatters currently playing, as (start tick, target rect)
+        self.hit_effects = []
+
+        # Turn scripts wait on this timeline instead of sleeping; update()
+        # advances it one tick per frame
+        self.timeline = TimerWheel()
+        self.script = None  # The script currently playing out, if any
+        self.ready = deque()  # Scripts due to run this frame
+        self.running_scripts = False
+        self.skipping = False  # Space pressed: finish the current script without waiting
+
         # Initialize combat after all variables are set
-        self.combatants = []
+        self.combatants = self.encounter.order
         self.init_combat()
 
-    def roll_initiative(self, combatant):
-        # Base initiative on a d20 roll (1-20)
-        base_roll = random.randint(1, 20)
-        
-        # Add modifiers based on character type
-        if isinstance(combatant, Player):
-            modifier = 2  # Player gets a small bonus
-        elif isinstance(combatant, PartyMember):
-            if combatant.role == 'Mage':
-                modifier = 3  # Mages are quick
-            elif combatant.role == 'Warrior':
-                modifier = 1  # Warriors are average
-            elif combatant.role == 'Healer':
-                modifier = 2  # Healers are moderately quick
-        else:  # Enemy
-            modifier = 0  # Enemies get no bonus
-            
-        return base_roll + modifier
+    @property
+    def current_turn_index(self):
+        return self.encounter.index
 
     def init_combat(self):
-        # Create list of all combatants with their initiative rolls
-        all_combatants = []
-        
-        # Add party members
-        for member in self.party:
-            all_combatants.append({
-                'combatant': member,
-                'initiative': self.roll_initiative(member),
-                'is_enemy': False
-            })
-        
-        # Add enemies
-        for enemy in self.enemies:
-            all_combatants.append({
-                'combatant': enemy,
-                'initiative': self.roll_initiative(enemy),
-                'is_enemy': True
-            })
-        
-        # Sort by initiative (highest first)
-        all_combatants.sort(key=lambda x: x['initiative'], reverse=True)
-        self.combatants = all_combatants
-        
-        # If first turn is enemy's, process it immediately
+        # If first turn is enemy's, start it once the player has seen the initiative order
         if self.combatants[0]['is_enemy']:
-            pygame.time.wait(1000)  # Give player time to see initiative order
-            self.process_enemy_turn(self.combatants[0]['combatant'])
+            self.run_script(self.process_enemy_turn(self.combatants[0]['combatant']), delay=1000)
+
+    def run_script(self, script, delay=0):
+        """Play a turn out on the combat timeline.
+
+        script is a generator that yields how many milliseconds to wait
+        before its next step (scaled by combat_speed). It runs up to its
+        first wait now (or after delay), and update() resumes it when each
+        wait is over. Scripts started from inside another script are queued
+        rather than nested, so a chain of instant enemy turns doesn't recurse.
+        """
+        self.script = script
+        self.skipping = False
+        ticks = self.wait_ticks(delay)
+        if ticks:
+            self.timeline.schedule(ticks, script)
+        else:
+            self.ready.append(script)
+        self.run_ready()
+
+    def wait_ticks(self, ms):
+        if self.skipping:
+            return 0
+        return ms_to_frames(ms, combat_speed)
+
+    def run_ready(self):
+        if self.running_scripts:
+            return
+        self.running_scripts = True
+        while self.ready:
+            self.resume(self.ready.popleft())
+        self.running_scripts = False
+
+    def resume(self, script):
+        # Run the script until it has to wait or finishes
+        while True:
+            try:
+                delay = next(script)
+            except StopIteration:
+                if self.script is script:
+                    self.script = None
+                return
+            ticks = self.wait_ticks(delay)
+            if ticks:
+                self.timeline.schedule(ticks, script)
+                return
+
+    def skip(self):
+        """Finish the script that's playing without waiting for its pauses or animations."""
+        if self.script is None:
+            return
+        self.timeline.clear()
+        self.hit_effects.clear()
+        self.skipping = True
+        self.ready.append(self.script)
+        self.run_ready()
+
+    def update(self):
+        """Advance the combat timeline by one frame."""
+        party_up = self.script is None and not self.combat_over and not self.encounter.current_is_enemy
+        if party_up and self.replay_actions:
+            self.run_script(self.choose_turn(self.replay_actions.popleft()))
+        elif party_up and auto_battle:
+            # The search runs in the worker; check back each frame until it has an answer
+            choice = party_ai.poll(self.encounter)
+            if choice is None:
+                party_ai.request(self.encounter)
+            else:
+                self.in_skills_menu = self.targeting_mode = False
+                self.run_script(self.choose_turn(choice))
+        self.ready.extend(self.timeline.advance())
+        self.run_ready()
+        now = self.timeline.now
+        self.hit_effects = [effect for effect in self.hit_effects
+                            if self.hit_frame(now - effect[0], effect[2]) < len(self.blood_frames)]
+
+    def hit_frame(self, elapsed_ticks, speed):
+        return int(elapsed_ticks * 1000 * speed / FRAME_RATE // HIT_FRAME_MS)
+
+    def replaying(self):
+        """True while a recorded fight still has turns to play."""
+        return bool(self.replay_actions) or self.script is not None or self.encounter.current_is_enemy
+
+    def choose_turn(self, choice):
+        # Make a recorded or auto-battle choice, (actor slot, kind, target slot,
+        # skill index), through the menus as if it had been entered
+        _, kind, target, skill_index = choice
+        yield 500
+        combatants = self.encounter.party + self.encounter.enemies
+        target = None if target is None else combatants[target]
+        alive_enemies = self.encounter.living_enemies()
+        self.selected_enemy = alive_enemies.index(target) if target in alive_enemies else len(alive_enemies)
+        if kind == ATTACK:
+            self.selected_action = -1
+            self.execute_attack()
+        elif kind == SKILL:
+            self.selected_skill = skill_index
+            if target in self.party:
+                self.selected_target = self.party.index(target)
+            self.execute_skill()
+        else:
+            self.selected_action = self.actions.index('Defend' if kind == DEFEND else 'Run')
+            self.execute_action()
+
+    def visible_enemies(self):
+        """(index, enemy, center) for each living enemy on screen.
+
+        Up to MAX_VISIBLE_ENEMIES stand side by side; a bigger horde shows a
+        window of them that scrolls to keep the selected enemy in view.
+        """
+        alive = self.encounter.living_enemies()
+        count = min(len(alive), MAX_VISIBLE_ENEMIES)
+        first = max(0, min(self.selected_enemy - count // 2, len(alive) - count))
+        return [(first + i, alive[first + i], (WIDTH // 2 + (i - count/2) * 150, HEIGHT // 3))
+                for i in range(count)]
+
+    def enemy_center(self, index):
+        for i, _, center in self.visible_enemies():
+            if i == index:
+                return center
+        return (WIDTH // 2, HEIGHT // 3)
 
     def next_turn(self):
-        # Reset defense bonus of current character before moving to next turn
-        current_character = self.combatants[self.current_turn_index]['combatant']
-        current_character.defense_bonus = 1
-        
-        self.current_turn_index = (self.current_turn_index + 1) % len(self.combatants)
+        self.encounter.next_turn()
         self.selected_action = 0
         self.selected_enemy = 0
         
-        # Skip dead combatants
-        while not self.combatants[self.current_turn_index]['combatant'].is_alive:
-            self.current_turn_index = (self.current_turn_index + 1) % len(self.combatants)
-        
-        # Process enemy turn immediately if it's an enemy
+        # Enemy turns play out on their own
         if self.combatants[self.current_turn_index]['is_enemy']:
-            self.process_enemy_turn(self.combatants[self.current_turn_index]['combatant'])
+            self.run_script(self.process_enemy_turn(self.combatants[self.current_turn_index]['combatant']))
 
     def process_enemy_turn(self, enemy):
         if enemy.is_alive:
-            living_party = [member for member in self.party if member.is_alive]
-            if not living_party:
+            if self.encounter.lost:
                 self.combat_over = True
                 return
             
-            target = random.choice(living_party)
-            damage = enemy.attack // (target.defense_bonus if hasattr(target, 'defense_bonus') else 1)
+            target = random_target_policy(self.encounter, enemy).target
             
             # Show enemy's intent to attack
             self.message = f'{enemy.name} is targeting {target.name}...'
-            self.draw(screen)
-            pygame.display.flip()
-            pygame.time.wait(1000)
+            yield 1000
             
             # Play attack sound
             self.play_sound('attack')
             self.message = f'{enemy.name} attacks {target.name}!'
-            self.draw(screen)
-            pygame.display.flip()
-            pygame.time.wait(250)  # Shorter wait before animation
+            yield 250  # Shorter wait before animation
             
             # Get target's sprite rect for animation
             target_rect = None
@@ -1326,31 +985,38 @@ class CombatSystem:
             
             # Play hit animation
             if target_rect:
-                self.play_hit_animation(target_rect)
+                yield self.play_hit_animation(target_rect)
             
             # Play damage sound and show damage message
             self.play_sound('character_damaged')
-            target.health = max(0, target.health - damage)
+            damage = self.encounter.attack(enemy, target)
             self.message = f'{enemy.name} deals {damage} damage to {target.name}!'
-            self.draw(screen)
-            pygame.display.flip()
-            pygame.time.wait(1000)
+            yield 1000
             
-            if target.health <= 0:
+            if not target.is_alive:
                 self.play_sound('character_died')
-                target.is_alive = False
                 self.message = f'{target.name} was defeated!'
-                self.draw(screen)
-                pygame.display.flip()
-                pygame.time.wait(1000)
+                yield 1000
                 
-                if not any(member.is_alive for member in self.party):
+                if self.encounter.lost:
                     self.combat_over = True
                     return
         
         self.next_turn()
 
     def handle_input(self, event):
+        global combat_speed, auto_battle
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+            combat_speed = COMBAT_SPEEDS[(COMBAT_SPEEDS.index(combat_speed) + 1) % len(COMBAT_SPEEDS)]
+            return
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_a:
+            auto_battle = not auto_battle
+            return
+        # Space skips the rest of a turn that's playing out; nothing else gets through
+        if self.script is not None or self.replay_actions or auto_battle:
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                self.skip()
+            return
         current_combatant = self.combatants[self.current_turn_index]
         if current_combatant['is_enemy'] or not current_combatant['combatant'].is_alive:
             return
@@ -1366,12 +1032,12 @@ class CombatSystem:
             if self.selected_action >= 0:
                 self.selected_action = (self.selected_action - 1) % len(self.actions)
             else:
-                self.selected_enemy = (self.selected_enemy - 1) % len([e for e in self.enemies if e.is_alive])
+                self.selected_enemy = (self.selected_enemy - 1) % len(self.encounter.living_enemies())
         elif event.key == pygame.K_DOWN:
             if self.selected_action >= 0:
                 self.selected_action = (self.selected_action + 1) % len(self.actions)
             else:
-                self.selected_enemy = (self.selected_enemy + 1) % len([e for e in self.enemies if e.is_alive])
+                self.selected_enemy = (self.selected_enemy + 1) % len(self.encounter.living_enemies())
         elif event.key == pygame.K_RETURN:
             if self.selected_action >= 0:
                 self.execute_action()
@@ -1386,9 +1052,9 @@ class CombatSystem:
         
         if self.targeting_mode:
             if event.key == pygame.K_UP:
-                self.selected_enemy = (self.selected_enemy - 1) % len([e for e in self.enemies if e.is_alive])
+                self.selected_enemy = (self.selected_enemy - 1) % len(self.encounter.living_enemies())
             elif event.key == pygame.K_DOWN:
-                self.selected_enemy = (self.selected_enemy + 1) % len([e for e in self.enemies if e.is_alive])
+                self.selected_enemy = (self.selected_enemy + 1) % len(self.encounter.living_enemies())
             elif event.key == pygame.K_RETURN:
                 self.execute_skill()
             elif event.key == pygame.K_ESCAPE:
@@ -1419,12 +1085,11 @@ class CombatSystem:
             self.selected_skill = 0
         elif action == 'Defend':
             self.play_sound('defend')
-            current_character.defense_bonus = 2
+            self.encounter.defend(current_character)
             self.message = f'{current_character.name} is defending!'
             self.next_turn()
         elif action == 'Run':
-            run_chance = random.random()
-            if run_chance > 0.5:
+            if self.encounter.try_run(current_character):
                 self.combat_over = True
                 self.message = 'Successfully fled!'
             else:
@@ -1432,39 +1097,36 @@ class CombatSystem:
                 self.next_turn()
 
     def execute_attack(self):
+        self.run_script(self.attack_script())
+
+    def attack_script(self):
         current_character = self.combatants[self.current_turn_index]['combatant']
-        alive_enemies = [e for e in self.enemies if e.is_alive]
+        alive_enemies = self.encounter.living_enemies()
         if self.selected_enemy < len(alive_enemies):
             target = alive_enemies[self.selected_enemy]
             
             # Play attack sound
             self.play_sound('attack')
-            damage = current_character.attack
-            self.draw(screen)
-            pygame.display.flip()
-            pygame.time.wait(250)  # Shorter wait before animation
+            yield 250  # Shorter wait before animation
             
             # Get target's sprite rect for animation
-            enemy_x = WIDTH // 2 + (self.selected_enemy - len(alive_enemies)/2) * 150
-            enemy_y = HEIGHT // 3
-            target_rect = target.sprite.get_rect(center=(enemy_x, enemy_y))
+            target_rect = target.sprite.get_rect(center=self.enemy_center(self.selected_enemy))
             
             # Play hit animation
-            self.play_hit_animation(target_rect)
+            yield self.play_hit_animation(target_rect)
             
             # Play enemy damaged sound and apply damage
             self.play_sound('enemy_damaged')
-            target.health -= damage
+            damage = self.encounter.attack(current_character, target)
             self.message = f'{current_character.name} deals {damage} damage!'
             
             # Check if enemy died
-            if target.health <= 0:
+            if not target.is_alive:
                 self.play_sound('enemy_died')
-                target.is_alive = False
                 self.message = f'{target.name} was defeated!'
             
             # Check if all enemies are defeated
-            if not any(e.is_alive for e in self.enemies):
+            if self.encounter.won:
                 self.combat_over = True
                 self.player_won = True
                 pygame.mixer.music.stop()  # Stop battle music when combat ends
@@ -1473,75 +1135,66 @@ class CombatSystem:
             self.next_turn()
 
     def execute_skill(self):
+        self.run_script(self.skill_script())
+
+    def skill_script(self):
         current_character = self.combatants[self.current_turn_index]['combatant']
         selected_skill = current_character.skills[self.selected_skill]
         
-        if current_character.mana < selected_skill.cost:
+        if not self.encounter.can_use(current_character, selected_skill):
             self.message = "Not enough mana!"
             return
 
         # Play skill sound
         self.play_sound('skill')
-        current_character.mana -= selected_skill.cost
 
         if selected_skill.effect_type == 'damage':
+            alive_enemies = self.encounter.living_enemies()
             if selected_skill.target_type == 'all':
-                total_damage = 0
-                alive_enemies = [e for e in self.enemies if e.is_alive]
-                
                 # Play skill sound first
                 self.play_sound('skill')
-                pygame.time.wait(250)  # Wait before animations
+                yield 250  # Wait before animations
                 
-                # Animate and damage each enemy
-                for i, enemy in enumerate(alive_enemies):
-                    enemy_x = WIDTH // 2 + (i - len(alive_enemies)/2) * 150
-                    enemy_y = HEIGHT // 3
-                    target_rect = enemy.sprite.get_rect(center=(enemy_x, enemy_y))
-                    
-                    self.play_hit_animation(target_rect)
-                    self.play_sound('enemy_damaged')
-                    
-                    enemy.health -= selected_skill.damage
-                    total_damage += selected_skill.damage
-                    if enemy.health <= 0:
-                        self.play_sound('enemy_died')
-                        enemy.is_alive = False
+                # Animate the enemies on screen at once (one splatter each, however
+                # big the horde), then apply the damage to all of them in one batch
+                duration = 0
+                for _, enemy, center in self.visible_enemies():
+                    duration = self.play_hit_animation(enemy.sprite.get_rect(center=center))
+                yield duration
+                self.play_sound('enemy_damaged')
                 
+                results = self.encounter.use_skill(current_character, selected_skill)
+                fallen = sum(not enemy.is_alive for enemy, _ in results)
+                if fallen:
+                    self.play_sound('enemy_died')
+                total_damage = sum(amount for _, amount in results)
                 self.message = f'{current_character.name} deals {total_damage} total damage!'
-                
-                if not any(e.is_alive for e in self.enemies):
-                    self.combat_over = True
-                    self.player_won = True
-                    pygame.mixer.music.stop()
-                    return
+                if len(results) > MAX_VISIBLE_ENEMIES:
+                    self.message = f'{current_character.name} hits {len(results)} enemies, {fallen} fall!'
+            elif self.selected_enemy < len(alive_enemies):
+                target = alive_enemies[self.selected_enemy]
+                self.play_sound('enemy_damaged')
+                self.encounter.use_skill(current_character, selected_skill, target)
+                self.message = f'{current_character.name} deals {selected_skill.damage} damage!'
+                if not target.is_alive:
+                    self.play_sound('enemy_died')
+                    self.message = f'{target.name} was defeated!'
             else:
-                alive_enemies = [e for e in self.enemies if e.is_alive]
-                if self.selected_enemy < len(alive_enemies):
-                    target = alive_enemies[self.selected_enemy]
-                    self.play_sound('enemy_damaged')
-                    target.health -= selected_skill.damage
-                    self.message = f'{current_character.name} deals {selected_skill.damage} damage!'
-                    if target.health <= 0:
-                        self.play_sound('enemy_died')
-                        target.is_alive = False
-                        self.message = f'{target.name} was defeated!'
-                    
-                    if not any(e.is_alive for e in self.enemies):
-                        self.combat_over = True
-                        self.player_won = True
-                        pygame.mixer.music.stop()
-                        return
+                self.encounter.use_skill(current_character, selected_skill)
+
+            if self.encounter.won:
+                self.combat_over = True
+                self.player_won = True
+                pygame.mixer.music.stop()
+                return
 
         elif selected_skill.effect_type == 'heal':
             if selected_skill.target_type == 'all':
-                for member in self.party:
-                    if member.is_alive:
-                        member.health = min(member.max_health, member.health + selected_skill.damage)
+                self.encounter.use_skill(current_character, selected_skill)
                 self.message = f'{current_character.name} heals the party!'
             else:
                 target = self.party[self.selected_target]
-                target.health = min(target.max_health, target.health + selected_skill.damage)
+                self.encounter.use_skill(current_character, selected_skill, target)
                 self.message = f'{current_character.name} heals {target.name}!'
 
         self.in_skills_menu = False
@@ -1550,7 +1203,6 @@ class CombatSystem:
     def play_sound(self, sound_key):
         if sound_key in self.sounds and self.sounds[sound_key]:
             self.sounds[sound_key].play()
-            pygame.time.wait(100)  # Small delay to ensure sound starts playing
 
     def draw(self, screen):
         # Draw battle background instead of solid color
@@ -1563,7 +1215,10 @@ class CombatSystem:
         
         # Draw turn order background with some transparency
         turn_list_width = 200
-        turn_list_height = len(self.combatants) * turn_spacing + 20
+        # Long initiative orders show a window starting just before the current turn
+        first_turn = max(0, min(self.current_turn_index - 2, len(self.combatants) - TURN_LIST_ROWS))
+        shown_turns = self.combatants[first_turn:first_turn + TURN_LIST_ROWS]
+        turn_list_height = len(shown_turns) * turn_spacing + 20
         turn_order_surface = pygame.Surface((turn_list_width, turn_list_height))
         turn_order_surface.fill(MENU_BG[:3])  # Use RGB values from MENU_BG
         turn_order_surface.set_alpha(200)  # Make it slightly transparent
@@ -1572,15 +1227,12 @@ class CombatSystem:
         
         # Draw each combatant in turn order
         font = pygame.font.Font(None, 28)
-        for i, combatant_data in enumerate(self.combatants):
+        for row, combatant_data in enumerate(shown_turns):
             combatant = combatant_data['combatant']
-            if not combatant.is_alive:
-                continue
-            
-            text_y = turn_list_y + 20 + (i * turn_spacing)
+            text_y = turn_list_y + 20 + (row * turn_spacing)
             
             # Highlight current turn
-            if i == self.current_turn_index:
+            if first_turn + row == self.current_turn_index:
                 pygame.draw.rect(screen, (100, 100, 100), 
                                (turn_list_x + 5, text_y - 15, turn_list_width - 10, turn_spacing),
                                border_radius=5)
@@ -1595,10 +1247,8 @@ class CombatSystem:
             screen.blit(text_surface, text_rect)
         
         # Draw enemies
-        alive_enemies = [e for e in self.enemies if e.is_alive]
-        for i, enemy in enumerate(alive_enemies):
-            enemy_x = WIDTH // 2 + (i - len(alive_enemies)/2) * 150  # Increased spacing
-            enemy_y = HEIGHT // 3
+        shown_enemies = self.visible_enemies()
+        for i, enemy, (enemy_x, enemy_y) in shown_enemies:
             
             # Draw enemy sprite
             sprite_rect = enemy.sprite.get_rect()
@@ -1614,6 +1264,18 @@ class CombatSystem:
                 pygame.draw.rect(screen, YELLOW, (sprite_rect.x-5, sprite_rect.y-5, 
                                                 sprite_rect.width+10, sprite_rect.height+10), 2)
 
+        # Count the horde scrolled off either side
+        if shown_enemies:
+            font = pygame.font.Font(None, 28)
+            hidden_left = shown_enemies[0][0]
+            hidden_right = len(self.encounter.living_enemies()) - shown_enemies[-1][0] - 1
+            if hidden_left:
+                text_surface = font.render(f"< {hidden_left} more", True, WHITE)
+                screen.blit(text_surface, text_surface.get_rect(topleft=(shown_enemies[0][2][0] - 50, HEIGHT // 3 + 60)))
+            if hidden_right:
+                text_surface = font.render(f"{hidden_right} more >", True, WHITE)
+                screen.blit(text_surface, text_surface.get_rect(topright=(shown_enemies[-1][2][0] + 50, HEIGHT // 3 + 60)))
+
         # Draw party members
         for i, member in enumerate(self.party):
             if member.is_alive:
@@ -1677,14 +1339,11 @@ class CombatSystem:
 
                 # Draw enemy selection indicator if in targeting mode
                 if self.targeting_mode:
-                    alive_enemies = [e for e in self.enemies if e.is_alive]
+                    alive_enemies = self.encounter.living_enemies()
                     if self.selected_enemy < len(alive_enemies):
                         target = alive_enemies[self.selected_enemy]
                         pygame.draw.rect(screen, YELLOW, 
-                                       target.sprite.get_rect(center=(
-                                           WIDTH // 2 + (self.selected_enemy - len(alive_enemies)/2) * 150,
-                                           HEIGHT // 3
-                                       )), 2)
+                                       target.sprite.get_rect(center=self.enemy_center(self.selected_enemy)), 2)
             else:
                 # Draw main action menu
                 menu_width = 200
@@ -1706,168 +1365,227 @@ class CombatSystem:
         if self.message:
             draw_text_centered(self.message, 36, HEIGHT//2, WHITE)
 
+        # Blood splatters play over everything else
+        self.draw_hit_effects(screen)
+
+        # Animation speed and skip hint
+        speed = 'instant' if combat_speed == COMBAT_SPEEDS[-1] else f'{combat_speed}x'
+        auto = 'on' if auto_battle else 'off'
+        hint = pygame.font.Font(None, 24).render(f"Speed {speed} [F]   Skip [Space]   Auto {auto} [A]", True, WHITE)
+        screen.blit(hint, hint.get_rect(bottomright=(WIDTH - 20, HEIGHT - 10)))
+
     def play_hit_animation(self, target_rect):
-        if not self.blood_frames:
-            return
-            
+        """Start a blood splatter on target_rect. Returns how long it plays, in ms."""
+        if not self.blood_frames or self.skipping or combat_speed == COMBAT_SPEEDS[-1]:
+            return 0
+        self.hit_effects.append((self.timeline.now, target_rect, combat_speed))
+        return len(self.blood_frames) * HIT_FRAME_MS
+
+    def draw_hit_effects(self, screen):
         # Calculate position to center blood splatter on target
         animation_size = (256, 256)  # Doubled from 128x128 to 256x256
-        
-        for frame in range(len(self.blood_frames)):
-            # Scale current frame
-            scaled_frame = pygame.transform.scale(self.blood_frames[frame], animation_size)
-            
+        now = self.timeline.now
+        for start, target_rect, speed in self.hit_effects:
+            frame = self.hit_frame(now - start, speed)
+            if frame >= len(self.blood_frames):
+                continue
+
             # Position frame centered on target's center, but offset to the right
             # Start 50 pixels right and move left as animation progresses
             offset_x = 50 * (1 - frame / len(self.blood_frames))  # Gradually reduces from 50 to 0
             frame_x = target_rect.centerx - animation_size[0] // 2 + offset_x
             frame_y = target_rect.centery - animation_size[1] // 2
-            
-            # Draw current game state
-            self.draw(screen)
-            
-            # Draw blood frame on top
-            screen.blit(scaled_frame, (frame_x, frame_y))
-            
-            # Update display
-            pygame.display.flip()
-            
-            # Control animation speed
-            pygame.time.wait(60)  # 60ms delay between frames for slower animation
+            screen.blit(self.blood_frames[frame], (frame_x, frame_y))
+
+def update_fog_surface():
+    # Black everywhere except the tiles the player can currently see
+    fog_surface.fill(BLACK)
+    for x, y in player_fov.tiles_within(FOG_RADIUS):
+        fog_surface.fill(WHITE, (x * GRID_SIZE, y * GRID_SIZE, GRID_SIZE, GRID_SIZE))
+    fog_surface.set_colorkey(WHITE)
+
+def draw_exploration(screen):
+    # Draw everything: the pre-rendered level, then the entities on top of it
+    screen.blit(level_surface, (0, 0))
+    screen.blit(stairs_tile, (stairs.x * GRID_SIZE, stairs.y * GRID_SIZE))
+    for item in level_items.in_area(0, 0, COLS - 1, ROWS - 1):
+        screen.blit(chest_tile, (item.x * GRID_SIZE, item.y * GRID_SIZE))
+    screen.blit(player.image, player.rect)
+    # Only enemies the player can see are drawn
+    enemy_store.draw(screen, enemy_frames, player_fov.tiles_within(FOG_RADIUS), GRID_SIZE)
+
+    # Draw the fog of war (rebuilt only when the player's visible tiles change)
+    screen.blit(fog_surface, (0, 0))
 
 # Replace the main game loop with this structure
-running = True
-while running:
-    # Show launch menu
-    menu_choice = show_launch_menu()
-    if menu_choice == "quit":
-        running = False
-        continue
-    
-    # Start new game
-    generate_dungeon(1)
-    player.health = player.max_health  # Reset health
-    player.level = 1  # Reset level
-    player.attack = 10  # Reset attack to initial value
-    game_running = True
-    
-    # Game loop
-    while game_running:
-        # Handle events
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                game_running = False
+def main():
+    running = True
+    try:
+        while running:
+            # Show launch menu
+            menu_choice = show_launch_menu()
+            if menu_choice == "quit":
                 running = False
-            elif event.type == pygame.KEYDOWN:
-                dx, dy = 0, 0
-                if event.key == pygame.K_LEFT:
-                    dx = -1
-                elif event.key == pygame.K_RIGHT:
-                    dx = 1
-                elif event.key == pygame.K_UP:
-                    dy = -1
-                elif event.key == pygame.K_DOWN:
-                    dy = 1
-
-                # Move the player
-                player.move(dx, dy)
+                continue
 
-        # Move enemies towards the player
-        for enemy in enemies:
-            enemy.move_towards_player(player, walls)
+            # Start new game
+            new_game()
+            game_running = True
+            if profile_scope == 'game':
+                profiler.start()
 
-        # Check for collisions with enemies
-        enemy_hits = pygame.sprite.spritecollide(player, enemies, False)
-        if enemy_hits:
-            combat = CombatSystem(player, party_members, enemy_hits[0])
-            in_combat = True
-            
-            while in_combat and running:
-                for event in pygame.event.get():
+            # Game loop
+            while game_running:
+                # Handle events
+                for event in get_events('explore'):
                     if event.type == pygame.QUIT:
+                        game_running = False
                         running = False
-                        in_combat = False
-                    combat.handle_input(event)
-
-                combat.draw(screen)
+                    elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                        toggle_profile()
+                    elif event.type == pygame.KEYDOWN:
+                        dx, dy = 0, 0
+                        if event.key == pygame.K_LEFT:
+                            dx = -1
+                        elif event.key == pygame.K_RIGHT:
+                            dx = 1
+                        elif event.key == pygame.K_UP:
+                            dy = -1
+                        elif event.key == pygame.K_DOWN:
+                            dy = 1
+
+                        # Move the player
+                        player.move(dx, dy)
+
+                # Move enemies towards the player (the field only rebuilds when the player changes tile)
+                player_tile = (player.rect.x // GRID_SIZE, player.rect.y // GRID_SIZE)
+                if player_field.update(wall_grid, player_tile):
+                    player_fov.update(wall_grid, player_tile)
+                    enemy_store.player_moved(player_tile, player_field.distances,
+                                             player_fov.tiles_within(ENEMY_VISION_RANGE), ENEMY_VISION_RANGE)
+                    update_fog_surface()
+                due_enemies = [payload for kind, payload in game_timers.advance() if kind == ENEMY_MOVE]
+                enemy_store.step(due_enemies)
+
+                # Check for collisions with enemies; awake enemies next to the player join in
+                enemy_hits = enemy_store.at(player_tile)
+                if enemy_hits.size:
+                    # One group per enemy, up to what the log can hold; any others fight next
+                    enemy_hits = enemy_store.pack(player_tile, PACK_RADIUS, limit=MAX_GROUPS)
+                    combat = CombatSystem(player, party_members, int(enemy_store.level[enemy_hits[0]]),
+                                          groups=len(enemy_hits), log=combat_log)
+                    in_combat = True
+                    if profile_scope == 'combat':
+                        profiler.start()
+
+                    while in_combat and running:
+                        for event in get_events('combat'):
+                            if event.type == pygame.QUIT:
+                                running = False
+                                game_running = False
+                                in_combat = False
+                            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                                toggle_profile()
+                            combat.handle_input(event)
+
+                        combat.update()
+                        combat.draw(screen)
+                        pygame.display.flip()
+                        clock.tick(frame_cap)
+
+                        if combat.combat_over:
+                            in_combat = False
+                            combat_log.end(combat.encounter)
+                            if player.health <= 0:
+                                menu_choice = show_game_over_menu()
+                                if menu_choice == "restart":
+                                    new_game()
+                                    continue
+                                else:
+                                    game_running = False
+                                    running = False
+                                    continue
+                            else:
+                                for enemy in enemy_hits:
+                                    enemy_store.kill(enemy)
+                                # Restart dungeon music after combat
+                                play_music('music/Shadows of the Abyss.mp3')
+
+                    # The fight is over (or the game restarted); let it go before measuring what's left
+                    combat = None
+                    if profile_scope == 'combat' and profiler.running:
+                        save_profile()
+                    if leak_tracker is not None:
+                        leak_tracker.checkpoint('combat end')
+                    player_tile = (player.rect.x // GRID_SIZE, player.rect.y // GRID_SIZE)
+
+                # Check for collisions with items
+                item_hits = list(level_items.at(player_tile))
+                for item in item_hits:
+                    level_items.remove(item, item.tile)
+                    # Show treasure popup before applying item effects
+                    show_treasure_popup(screen, item.type)
+
+                    # Each item raises one stat, optionally capped by another (health by max_health)
+                    stat, amount, limit = CONTENT.item_effects[CONTENT.item_ids[item.type]]
+                    value = getattr(player, stat) + amount
+                    if limit is not None:
+                        value = min(getattr(player, limit), value)
+                    setattr(player, stat, value)
+
+                # Check for collision with stairs
+                if player_tile == stairs.tile:
+                    current_level = player.level  # Store current level
+                    player.level += 1  # Explicitly increment level
+                    print(f"Level up! Now at level {player.level}")  # Debug print
+                    player.health = player.max_health  # Heal player between levels
+                    generate_dungeon(player.level)  # Generate dungeon with new level
+                    if leak_tracker is not None:
+                        leak_tracker.checkpoint('level start')
+
+                draw_exploration(screen)
                 pygame.display.flip()
-                clock.tick(FRAME_RATE)
-
-                if combat.combat_over:
-                    in_combat = False
-                    if player.health <= 0:
-                        menu_choice = show_game_over_menu()
-                        if menu_choice == "restart":
-                            generate_dungeon(1)
-                            player.health = player.max_health
-                            player.level = 1
-                            player.attack = 10
-                            continue
-                        else:
-                            game_running = False
-                            running = False
-                            continue
-                    else:
-                        for enemy in enemy_hits:
-                            enemy.kill()
-                        # Restart dungeon music after combat
-                        play_music('music/Shadows of the Abyss.mp3')
-
-        # Check for collisions with items
-        item_hits = pygame.sprite.spritecollide(player, items, True)
-        for item in item_hits:
-            # Show treasure popup before applying item effects
-            show_treasure_popup(screen, item.type)
-            
-            if item.type == 'health_potion':
-                player.health = min(player.max_health, player.health + 20)
-            elif item.type == 'strength_potion':
-                player.attack += 5
-            elif item.type == 'speed_potion':
-                player.speed += 0.2  # 20% speed boost
-
-        # Check for collision with stairs
-        if pygame.sprite.collide_rect(player, stairs):
-            current_level = player.level  # Store current level
-            player.level += 1  # Explicitly increment level
-            print(f"Level up! Now at level {player.level}")  # Debug print
-            player.health = player.max_health  # Heal player between levels
-            generate_dungeon(player.level)  # Generate dungeon with new level
-
-        # Draw everything
-        screen.fill(BLACK)
-        
-        # Draw floor tiles using the pre-generated pattern
-        for y in range(ROWS):
-            for x in range(COLS):
-                screen.blit(floor_pattern[y][x], (x * GRID_SIZE, y * GRID_SIZE))
-        
-        all_sprites.draw(screen)
-
-        # Create fog of war effect
-        fog_surface = pygame.Surface((WIDTH, HEIGHT))
-        fog_surface.fill((0, 0, 0))  # Fill with black
-        
-        # Create a circle mask
-        vision_radius = 5 * GRID_SIZE  # 10 grid points radius
-        pygame.draw.circle(fog_surface, (255, 255, 255), 
-                         (player.rect.centerx, player.rect.centery), 
-                         vision_radius)
-        
-        # Use the circle as an alpha mask
-        fog_surface.set_colorkey((255, 255, 255))
-        fog_surface.set_alpha(255)  # Adjust visibility of fog (0-255)
-        
-        # Draw the fog
-        screen.blit(fog_surface, (0, 0))
-
-        pygame.display.flip()
-        clock.tick(FRAME_RATE)
+                clock.tick(frame_cap)
 
-    # Cleanup
+            # Cleanup
+            if profiler.running:
+                save_profile()
+            try:
+                pygame.mixer.music.stop()
+            except pygame.error:
+                pass
+
+            pygame.quit()
+    finally:
+        # However the game ends: quit from the launch menu, mid-game or on an exception
+        combat_log.save(LOG_PATH)
+        party_ai.close()
+
+
+if __name__ == '__main__':
+    if args.seed is not None:
+        rng_streams = RngStreams(args.seed)
+    profile_scope = args.profile
+    profile_format = args.profile_format
+    if args.track_leaks:
+        leak_tracker = LeakTracker()
+        leak_tracker.start()
     try:
-        pygame.mixer.music.stop()
-    except pygame.error:
-        pass
-    
-    pygame.quit()
+        if args.record:
+            recorder = SessionRecorder(pygame, Session(rng_streams.seed, COMBAT_SPEEDS.index(combat_speed),
+                                                       auto_battle))
+            input_source = recorder
+            party_ai = recorder.auto_battle(party_ai)
+            try:
+                main()
+                recorder.session.state = game_state_hash()
+            finally:
+                recorder.session.save(args.record)
+        else:
+            main()
+    finally:
+        # Saved however the game ends: quit from the launch menu, mid-game or on an exception
+        if hitch_watchdog is not None:
+            hitch_watchdog.stop()
+            hitch_watchdog.save(HITCH_PATH)
+            print(f"Hitches: {hitch_watchdog.summary()} (saved to {HITCH_PATH})")
@@ -0,0 +1,236 @@
+"""Generate a large corpus of dungeon levels and measure the generator.
+
+Levels are laid out with dungeon_generator across a process pool, and each
+one's metrics are streamed to a CSV or JSON Lines file as its chunk finishes,
+so the corpus never has to fit in memory:
+
+  rooms / target_rooms   rooms placed against the number the level type asks for
+  corridors, corridor_mean, failed_corridors
+                         corridors carved, their mean length, and room
+                         connections A* couldn't make
+  dead_ends              floor tiles with exactly one open neighbour
+  repaired               rock tiles opened so the stairs could be reached
+                         (see dungeon_generator.connect_stairs)
+  stairs_distance        walking distance from the entrance to the stairs
+                         (-1 when the stairs can't be reached)
+  ms                     time to lay the level out
+
+Level i of dungeon level L with seed S gets its own named random streams
+(rng_streams), so it is always the same layout, whatever the worker count. A summary per dungeon level is printed at the end.
+--scaling instead runs the same workload at 1, 2, 4, ... workers up to the
+core count and reports levels per second for each.
+
+    python dungeon_corpus.py --levels 1 2 3 4 5 --count 100000 --output corpus.jsonl
+    python dungeon_corpus.py --count 2000 --scaling
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from dungeon_generator import LEVEL_TYPES, generate_level
+from flow_field import STEPS, DistanceField
+from rng_streams import RngStreams
+
+COLS, ROWS = 60, 40  # The game's map: 1200x800 pixels in 20-pixel tiles
+CHUNK_SIZE = 100  # Levels per worker task
+FIELDS = ('level', 'index', 'level_type', 'rooms', 'target_rooms', 'corridors', 'corridor_mean',
+          'failed_corridors', 'dead_ends', 'floor_tiles', 'obstacles', 'repaired', 'enemies', 'items',
+          'stairs_distance', 'ms')
+
+
+def dead_ends(walls):
+    count = 0
+    for y in range(1, walls.rows - 1):
+        for x in range(1, walls.cols - 1):
+            if not walls.is_blocked(x, y):
+                open_sides = sum(not walls.is_blocked(x + dx, y + dy) for dx, dy in STEPS)
+                count += open_sides == 1
+    return count
+
+
+def measure(level, seed, index, cols=COLS, rows=ROWS):
+    """Generate one level and return its metrics row."""
+    started = time.perf_counter()
+    layout = generate_level(level, cols, rows, **RngStreams(seed).level(level, index))
+    elapsed = time.perf_counter() - started
+    field = DistanceField()
+    field.update(layout.walls, layout.stairs.tile)
+    distance = field.distance(layout.entrance)
+    corridors = layout.corridors
+    return {
+        'level': level,
+        'index': index,
+        'level_type': layout.level_type,
+        'rooms': len(layout.rooms),
+        'target_rooms': layout.target_rooms,
+        'corridors': len(corridors),
+        'corridor_mean': round(sum(corridors) / len(corridors), 2) if corridors else 0,
+        'failed_corridors': layout.failed_corridors,
+        'dead_ends': dead_ends(layout.walls),
+        'floor_tiles': layout.walls.cells.count(0),
+        'obstacles': layout.obstacles,
+        'repaired': layout.repaired,
+        'enemies': len(layout.enemies),
+        'items': len(layout.items),
+        'stairs_distance': -1 if distance is None else distance,
+        'ms': round(elapsed * 1000, 3),
+    }
+
+
+def generate_chunk(level, seed, start, count, cols=COLS, rows=ROWS):
+    """Metrics rows for levels [start, start + count) of one dungeon level."""
+    return [measure(level, seed, index, cols, rows) for index in range(start, start + count)]
+
+
+class Summary:
+    """Running totals per dungeon level, so no rows are kept."""
+
+    def __init__(self):
+        self.levels = {}
+
+    def add(self, row):
+        total = self.levels.setdefault(row['level'], dict.fromkeys(
+            ('count', 'rooms', 'target_rooms', 'corridors', 'corridor_length', 'failed_corridors',
+             'dead_ends', 'repaired', 'reachable', 'stairs_distance', 'ms', 'max_ms'), 0))
+        total['count'] += 1
+        total['repaired'] += row['repaired'] > 0
+        for key in ('rooms', 'target_rooms', 'corridors', 'failed_corridors', 'dead_ends', 'ms'):
+            total[key] += row[key]
+        total['corridor_length'] += row['corridor_mean'] * row['corridors']
+        total['max_ms'] = max(total['max_ms'], row['ms'])
+        if row['stairs_distance'] >= 0:
+            total['reachable'] += 1
+            total['stairs_distance'] += row['stairs_distance']
+
+    def print(self):
+        print(f"{'level':>5} {'type':<10} {'levels':>8} {'rooms/target':>13} {'corridor':>8} "
+              f"{'failed':>6} {'dead ends':>9} {'repaired':>8} {'stairs dist':>11} {'unreachable':>11} "
+              f"{'ms avg/max':>12}")
+        for level in sorted(self.levels):
+            total = self.levels[level]
+            n = total['count']
+            corridor = total['corridor_length'] / total['corridors'] if total['corridors'] else 0
+            distance = total['stairs_distance'] / total['reachable'] if total['reachable'] else 0
+            print(f"{level:>5} {LEVEL_TYPES[level % 5]:<10} {n:>8,} "
+                  f"{total['rooms'] / n:>6.1f}/{total['target_rooms'] / n:<6.1f} {corridor:>8.1f} "
+                  f"{total['failed_corridors'] / n:>6.2f} {total['dead_ends'] / n:>9.1f} "
+                  f"{total['repaired'] / n:>8.2%} {distance:>11.1f} "
+                  f"{1 - total['reachable'] / n:>11.2%} {total['ms'] / n:>6.1f}/{total['max_ms']:<5.0f}")
+
+
+def generate_corpus(levels, count, seed=0, workers=None, on_row=None, cols=COLS, rows=ROWS):
+    """Generate count levels of each dungeon level, calling on_row with each metrics row.
+
+    Rows arrive chunk by chunk as workers finish, not in index order. Only a
+    couple of chunks per worker are in flight at once. Returns the number of
+    levels generated.
+    """
+    tasks = ((level, seed, start, min(CHUNK_SIZE, count - start), cols, rows)
+             for level in levels for start in range(0, count, CHUNK_SIZE))
+    generated = 0
+
+    def deliver(chunk):
+        nonlocal generated
+        for row in chunk:
+            if on_row is not None:
+                on_row(row)
+        generated += len(chunk)
+
+    if workers == 0:
+        for task in tasks:
+            deliver(generate_chunk(*task))
+        return generated
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for task in tasks:
+            pending.add(pool.submit(generate_chunk, *task))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    deliver(future.result())
+        for future in pending:
+            deliver(future.result())
+    return generated
+
+
+class RowWriter:
+    """Writes metrics rows to a CSV or JSON Lines file as they arrive."""
+
+    def __init__(self, f, fmt):
+        self.f = f
+        self.csv = None
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(f, fieldnames=FIELDS)
+            self.csv.writeheader()
+
+    def __call__(self, row):
+        if self.csv is not None:
+            self.csv.writerow(row)
+        else:
+            self.f.write(json.dumps(row) + '\n')
+
+
+def scaling(levels, count, seed):
+    """Levels per second at 1, 2, 4, ... workers up to the core count."""
+    cores = os.cpu_count() or 1
+    counts = sorted({1 << i for i in range(cores.bit_length()) if 1 << i <= cores} | {cores})
+    print(f"{'workers':>7} {'levels/s':>10} {'speedup':>8}")
+    base = None
+    for workers in counts:
+        started = time.perf_counter()
+        generated = generate_corpus(levels, count, seed, workers)
+        rate = generated / (time.perf_counter() - started)
+        base = base or rate
+        print(f"{workers:>7} {rate:>10,.0f} {rate / base:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate many seeded dungeon levels and report on their layouts.")
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 3, 4, 5])
+    parser.add_argument('--count', type=int, default=1000, help="levels generated per dungeon level")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help="processes (0 runs in this process)")
+    parser.add_argument('--output', help="file for per-level metrics (- for stdout)")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="output format (default: from the extension)")
+    parser.add_argument('--scaling', action='store_true', help="report levels/s at each worker count instead")
+    args = parser.parse_args()
+
+    if args.scaling:
+        scaling(args.levels, args.count, args.seed)
+        return
+
+    summary = Summary()
+    on_row = summary.add
+    output = None
+    if args.output:
+        fmt = args.format or ('csv' if args.output.endswith('.csv') else 'jsonl')
+        output = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+        writer = RowWriter(output, fmt)
+
+        def on_row(row):
+            writer(row)
+            summary.add(row)
+
+    started = time.perf_counter()
+    try:
+        generated = generate_corpus(args.levels, args.count, args.seed, args.workers, on_row)
+    finally:
+        if output not in (None, sys.stdout):
+            output.close()
+    elapsed = time.perf_counter() - started
+
+    report = sys.stderr if args.output == '-' else sys.stdout
+    with contextlib.redirect_stdout(report):
+        summary.print()
+        workers = args.workers if args.workers is not None else os.cpu_count()
+        print(f"{generated:,} levels in {elapsed:.1f} s ({generated / elapsed:,.0f}/s, {workers} workers)")
+
+
+if __name__ == '__main__':
+    main()
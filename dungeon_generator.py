@@ -0,0 +1,504 @@
+"""Dungeon level layout, generated without pygame or any game state.
+
+generate_level() lays out one level (rooms, A* corridors, obstacles,
+entrance, stairs, enemies and chests) and returns it as a Level record. The
+game turns that into its wall grid, level surface, TileHash and EnemyStore.
+Tools like dungeon_corpus.py can call it from worker processes and measure
+the layout directly. All randomness comes from the rng arguments, so a level
+generated from seeded random.Randoms is the same level in any process.
+
+Obstacles and irregular rooms can still wall the stairs off from the
+entrance, so every level ends with one flood fill from the entrance. If the
+stairs aren't in it, connect_stairs() opens the fewest rock tiles between
+them and the reachable area, instead of generating the level again.
+"""
+import random
+from collections import deque
+
+from content import CONTENT
+from entities import Item, Stairs
+from spatial import OccupancyGrid
+
+LEVEL_TYPES = ('cavernous', 'cramped', 'horizontal', 'vertical', 'balanced')  # By level % 5
+
+
+class Level:
+    """One generated level.
+
+    walls is the OccupancyGrid (rock and obstacles); floor holds the floor
+    tile variant (0 or 1) of every tile, row by row; rooms are
+    (x, y, width, height). corridors has the length of every corridor carved
+    and failed_corridors counts the room connections A* couldn't make.
+    entrance is the player's starting tile; enemies are (x, y) tiles.
+    repaired counts the tiles opened to make the stairs reachable (0 for
+    most levels).
+    """
+    __slots__ = ('level', 'walls', 'floor', 'rooms', 'target_rooms', 'corridors', 'failed_corridors',
+                 'entrance', 'stairs', 'items', 'enemies', 'obstacles', 'repaired')
+
+    def __init__(self, level, walls, floor, rooms, target_rooms):
+        self.level = level
+        self.walls = walls
+        self.floor = floor
+        self.rooms = rooms
+        self.target_rooms = target_rooms
+        self.corridors = []
+        self.failed_corridors = 0
+        self.entrance = None
+        self.stairs = None
+        self.items = []
+        self.enemies = []
+        self.obstacles = 0
+        self.repaired = 0
+
+    @property
+    def level_type(self):
+        return LEVEL_TYPES[self.level % 5]
+
+
+# Corridors between rooms are carved along A* paths
+def manhattan_distance(p1, p2):
+    return abs(p1[0] - p2[0]) + abs(p1[1] - p2[1])
+
+
+def get_neighbors(pos, cols, rows):
+    x, y = pos
+    neighbors = []
+    for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+        new_x, new_y = x + dx, y + dy
+        if 0 < new_x < cols-1 and 0 < new_y < rows-1:
+            neighbors.append((new_x, new_y))
+    return neighbors
+
+
+def create_corridor(start, end, cols, rows):
+    open_set = [(0, start)]
+    came_from = {start: None}
+    g_score = {start: 0}
+    f_score = {start: manhattan_distance(start, end)}
+
+    while open_set:
+        current = min(open_set, key=lambda x: x[0])[1]
+        if current == end:
+            # Reconstruct path
+            path = []
+            while current in came_from:
+                path.append(current)
+                current = came_from[current]
+            return path[::-1]
+
+        open_set = [(f, pos) for f, pos in open_set if pos != current]
+
+        for neighbor in get_neighbors(current, cols, rows):
+            tentative_g = g_score[current] + 1
+
+            if neighbor not in g_score or tentative_g < g_score[neighbor]:
+                came_from[neighbor] = current
+                g_score[neighbor] = tentative_g
+                f_score[neighbor] = tentative_g + manhattan_distance(neighbor, end)
+                open_set.append((f_score[neighbor], neighbor))
+
+    return None
+
+
+def reachable(walls, start):
+    """One flag per tile (row by row), set for the open tiles connected to start.
+
+    Relies on the map border being rock, as it is for every generated level,
+    so neighbours never need a bounds check.
+    """
+    cols = walls.cols
+    cells = walls.cells
+    seen = bytearray(len(cells))
+    first = start[1] * cols + start[0]
+    if cells[first]:
+        return seen
+    seen[first] = 1
+    frontier = [first]
+    for index in frontier:  # Grows as it goes: a breadth-first flood fill
+        for neighbour in (index - cols, index + cols, index - 1, index + 1):
+            if not seen[neighbour] and not cells[neighbour]:
+                seen[neighbour] = 1
+                frontier.append(neighbour)
+    return seen
+
+
+def connect_stairs(walls, entrance, stairs):
+    """Open rock until the stairs can be walked to from the entrance. Returns the tiles opened.
+
+    The stairs get the cheapest path to the area reachable from the entrance,
+    where floor costs nothing and each rock tile costs one (a 0-1 breadth-first
+    search), so the repair carves as little as possible where the two are closest.
+    """
+    cols, rows = walls.cols, walls.rows
+    opened = 0
+    for x, y in (entrance, stairs):
+        if walls.is_blocked(x, y):
+            walls.set_blocked(x, y, False)
+            opened += 1
+    seen = reachable(walls, entrance)
+    start = stairs[1] * cols + stairs[0]
+    if seen[start]:
+        return opened
+
+    cells = walls.cells
+    cost = {start: 0}
+    came_from = {start: None}
+    frontier = deque([start])
+    while frontier:
+        index = frontier.popleft()
+        if seen[index]:
+            break
+        x, y = index % cols, index // cols
+        for neighbour, inside in ((index - cols, y > 1), (index + cols, y < rows - 2),
+                                  (index - 1, x > 1), (index + 1, x < cols - 2)):
+            step = cells[neighbour]
+            if inside and cost[index] + step < cost.get(neighbour, len(cells)):
+                cost[neighbour] = cost[index] + step
+                came_from[neighbour] = index
+                if step:
+                    frontier.append(neighbour)
+                else:
+                    frontier.appendleft(neighbour)
+    while index is not None:
+        if cells[index]:
+            cells[index] = 0
+            opened += 1
+        index = came_from[index]
+    return opened
+
+
+def room_center(room):
+    return room[0] + room[2] // 2, room[1] + room[3] // 2
+
+
+def generate_level(level, cols, rows, rng=random, decor=None, spawns=None, loot=None):
+    """Lay out dungeon level `level` on a cols x rows map. Returns a Level.
+
+    rng drives the layout; floor tiles, enemies and chests draw from decor,
+    spawns and loot when given (see rng_streams), and from rng otherwise.
+    """
+    decor = rng if decor is None else decor
+    spawns = rng if spawns is None else spawns
+    loot = rng if loot is None else loot
+    # Create grid
+    grid = [[1 for _ in range(cols)] for _ in range(rows)]
+
+    # Floor tile pattern - varies by level
+    # Every 3 levels, we change the floor tiles for more variety
+    level_theme = (level - 1) // 3
+    if level_theme == 0:  # Levels 1-3: Standard dungeon
+        # More of the first tile for lower levels
+        weights = [0.7, 0.3]
+    elif level_theme == 1:  # Levels 4-6: More of the second tile
+        weights = [0.3, 0.7]
+    else:  # Levels 7+: Even mix but with patterns
+        weights = [0.5, 0.5]
+
+    # Generate floor pattern based on level theme
+    floor = bytearray(cols * rows)
+    for y in range(rows):
+        for x in range(cols):
+            # Add some patterns based on level
+            if level_theme >= 2:  # Checkerboard for higher levels
+                floor[y * cols + x] = (x + y) % 2
+            else:
+                # Random selection with weights
+                floor[y * cols + x] = decor.choices((0, 1), weights=weights, k=1)[0]
+
+    # Dungeon generation strategy varies by level
+    # Determine room parameters based on level
+    rooms = []
+    level_mod = level % 5  # Cycle through 5 different dungeon types
+
+    if level_mod == 0:  # Cavernous levels - fewer, larger rooms
+        max_attempts = 40
+        target_rooms = 3 + level // 2
+        min_room_size = 8
+        max_room_size = 15
+        sectors_h = 2
+        sectors_v = 2
+    elif level_mod == 1:  # Cramped levels - many small rooms
+        max_attempts = 60
+        target_rooms = 8 + level // 2
+        min_room_size = 4
+        max_room_size = 7
+        sectors_h = 4
+        sectors_v = 4
+    elif level_mod == 2:  # Long horizontal rooms
+        max_attempts = 50
+        target_rooms = 5 + level // 2
+        min_room_width = 8
+        max_room_width = 14
+        min_room_height = 4
+        max_room_height = 7
+        sectors_h = 3
+        sectors_v = 3
+    elif level_mod == 3:  # Long vertical rooms
+        max_attempts = 50
+        target_rooms = 5 + level // 2
+        min_room_width = 4
+        max_room_width = 7
+        min_room_height = 8
+        max_room_height = 14
+        sectors_h = 3
+        sectors_v = 3
+    else:  # Balanced medium rooms
+        max_attempts = 50
+        target_rooms = 6 + level // 2
+        min_room_size = 5
+        max_room_size = 10
+        sectors_h = 3
+        sectors_v = 3
+
+    # Calculate sector dimensions
+    sector_w = (cols - 2) // sectors_h
+    sector_h = (rows - 2) // sectors_v
+
+    # Try to place rooms in each sector
+    for sy in range(sectors_v):
+        for sx in range(sectors_h):
+            attempts = 0
+            while attempts < max_attempts and len(rooms) < target_rooms:
+                # Room size depends on level type
+                if level_mod in (2, 3):  # Horizontal or vertical rooms
+                    room_width = rng.randint(min_room_width, max_room_width)
+                    room_height = rng.randint(min_room_height, max_room_height)
+                else:
+                    room_width = rng.randint(min_room_size, max_room_size)
+                    room_height = rng.randint(min_room_size, max_room_size)
+
+                # Calculate bounds for this sector
+                min_x = 1 + sx * sector_w
+                max_x = min_x + sector_w - room_width - 1
+                min_y = 1 + sy * sector_h
+                max_y = min_y + sector_h - room_height - 1
+
+                # Ensure we stay within grid bounds
+                max_x = min(max_x, cols - room_width - 1)
+                max_y = min(max_y, rows - room_height - 1)
+
+                # Add some variability to room placement
+                if max_x <= min_x:
+                    max_x = min_x + 1
+                if max_y <= min_y:
+                    max_y = min_y + 1
+
+                x = rng.randint(min_x, max_x)
+                y = rng.randint(min_y, max_y)
+
+                # Add padding around rooms (varies by level)
+                padding = 1 if level_mod in [1, 2, 3] else 2  # Tighter packing for some level types
+                overlaps = any(
+                    x - padding < r[0] + r[2] + padding and x + room_width + padding > r[0] and
+                    y - padding < r[1] + r[3] + padding and y + room_height + padding > r[1]
+                    for r in rooms
+                )
+
+                if not overlaps:
+                    # Carve out room
+                    # Add randomness to room shape in higher levels
+                    if level > 3 and rng.random() < 0.3:  # 30% chance for non-rectangular rooms in higher levels
+                        # Create an irregular room by carving a slightly smaller core
+                        core_w = max(room_width - 2, 3)
+                        core_h = max(room_height - 2, 3)
+                        core_x = x + rng.randint(0, room_width - core_w)
+                        core_y = y + rng.randint(0, room_height - core_h)
+
+                        # Carve the core first
+                        for i in range(core_y, core_y + core_h):
+                            for j in range(core_x, core_x + core_w):
+                                grid[i][j] = 0
+
+                        # Add random extensions
+                        extensions = rng.randint(2, 4)
+                        for _ in range(extensions):
+                            ext_x = rng.randint(x, x + room_width - 1)
+                            ext_y = rng.randint(y, y + room_height - 1)
+                            ext_w = rng.randint(2, 4)
+                            ext_h = rng.randint(2, 4)
+                            for i in range(max(y, ext_y), min(y + room_height, ext_y + ext_h)):
+                                for j in range(max(x, ext_x), min(x + room_width, ext_x + ext_w)):
+                                    grid[i][j] = 0
+                    else:
+                        # Regular rectangular room
+                        for i in range(y, y + room_height):
+                            for j in range(x, x + room_width):
+                                grid[i][j] = 0
+
+                    rooms.append((x, y, room_width, room_height))
+                    break
+                attempts += 1
+
+    result = Level(level, None, floor, rooms, target_rooms)
+
+    def connect(room1, room2, corridor_width):
+        # Carve an A* corridor between the room centers, widened by corridor_width
+        path = create_corridor(room_center(room1), room_center(room2), cols, rows)
+        if not path:
+            result.failed_corridors += 1
+            return False
+        result.corridors.append(len(path))
+        for x, y in path:
+            grid[y][x] = 0
+            # Add width to corridors
+            for w in range(corridor_width):
+                for dx, dy in [(w, 0), (0, w), (-w, 0), (0, -w)]:
+                    nx, ny = x + dx, y + dy
+                    if 0 < nx < cols-1 and 0 < ny < rows-1:
+                        grid[ny][nx] = 0
+        return True
+
+    # Connect rooms based on level type
+    if level_mod == 0:  # Cavernous: connect with wider corridors
+        corridor_width = 2
+    elif level_mod == 1:  # Cramped: connect with more direct, narrow paths
+        corridor_width = 1
+    else:
+        corridor_width = 1 + level // 5  # Wider corridors in deeper levels
+
+    # Decide on connection pattern
+    if level_mod == 4 or rng.random() < 0.3:  # Circular connection for some levels
+        # Connect rooms in a circle
+        for i in range(len(rooms)):
+            connect(rooms[i], rooms[(i + 1) % len(rooms)], corridor_width)
+    else:
+        # Connect rooms in sequence for most levels
+        for i in range(len(rooms) - 1):
+            connect(rooms[i], rooms[i + 1], corridor_width)
+
+    # Add some extra connections for deeper levels (with safety checks)
+    if level > 2 and len(rooms) >= 4:  # Only if we have enough rooms
+        extra_connections = min(3, level // 2)  # More connections in deeper levels
+        max_attempts = extra_connections * 2  # Allow multiple attempts to find valid connections
+
+        connections_made = 0
+        attempts = 0
+
+        while connections_made < extra_connections and attempts < max_attempts:
+            # Make sure we have enough rooms ahead to make a connection
+            if len(rooms) <= 3:
+                break
+
+            # Pick two rooms that aren't adjacent
+            i = rng.randint(0, len(rooms) - 3)
+            if i + 2 >= len(rooms):
+                attempts += 1
+                continue
+
+            max_j = min(i + 4, len(rooms) - 1)
+            if i + 2 > max_j:  # Can't make a valid connection
+                attempts += 1
+                continue
+
+            j = rng.randint(i + 2, max_j)
+
+            # Add some width to corridors (one tile either side)
+            if connect(rooms[i], rooms[j], 2):
+                connections_made += 1
+
+            attempts += 1
+
+    # Walls are just blocked cells; the game draws them into the level surface
+    walls = result.walls = OccupancyGrid.from_rows(grid)
+
+    # Randomize room order for player and stairs placement
+    # This prevents always starting in the top-left and ending in the bottom-right
+    available_rooms = rooms.copy()
+    rng.shuffle(available_rooms)
+
+    # Select entrance and exit rooms that are far apart
+    # We want to ensure a good distance between start and end
+    entrance_room = None
+    exit_room = None
+
+    # Try to maximize Manhattan distance between entrance and exit
+    max_distance = 0
+    for i, room1 in enumerate(available_rooms):
+        for j, room2 in enumerate(available_rooms):
+            if i != j:
+                # Manhattan distance between room centers
+                distance = manhattan_distance(room_center(room1), room_center(room2))
+
+                if distance > max_distance:
+                    max_distance = distance
+                    entrance_room = room1
+                    exit_room = room2
+
+    # If we couldn't find rooms far apart, just use first and last
+    if entrance_room is None or exit_room is None:
+        entrance_room = available_rooms[0]
+        exit_room = available_rooms[-1]
+
+    # Place player in entrance room, near the center but not against its walls
+    player_x, player_y = room_center(entrance_room)
+    player_x = max(entrance_room[0] + 1, min(player_x, entrance_room[0] + entrance_room[2] - 2))
+    player_y = max(entrance_room[1] + 1, min(player_y, entrance_room[1] + entrance_room[3] - 2))
+    result.entrance = (player_x, player_y)
+
+    # Place stairs in exit room the same way
+    stairs_x, stairs_y = room_center(exit_room)
+    stairs_x = max(exit_room[0] + 1, min(stairs_x, exit_room[0] + exit_room[2] - 2))
+    stairs_y = max(exit_room[1] + 1, min(stairs_y, exit_room[1] + exit_room[3] - 2))
+    result.stairs = Stairs(stairs_x, stairs_y)
+
+    # Avoid placing enemies in entrance and exit rooms
+    enemy_rooms = [room for room in available_rooms if room != entrance_room and room != exit_room]
+
+    # Add enemies and items to rooms - vary by level
+    enemy_chance = 0.7 + (level * 0.05)  # Higher level = more enemies
+    item_chance = 0.7 - (level * 0.03)  # Higher level = slightly fewer items
+
+    for room in enemy_rooms:
+        x, y, w, h = room
+
+        # Enemy count based on room size and level
+        room_area = w * h
+        max_enemies = max(1, min(room_area // 15, 3 + level // 2))
+        enemy_count = spawns.randint(1, max_enemies)
+
+        for _ in range(enemy_count):
+            if spawns.random() < enemy_chance:
+                result.enemies.append((spawns.randint(x+1, x+w-2), spawns.randint(y+1, y+h-2)))
+
+        # Item placement
+        if loot.random() < item_chance:
+            item_x, item_y = loot.randint(x+1, x+w-2), loot.randint(y+1, y+h-2)
+
+            # Item type varies by level
+            item_type = loot.choices(CONTENT.item_types, weights=CONTENT.item_weights(level), k=1)[0]
+            result.items.append(Item(item_x, item_y, item_type))
+
+    # Add items to entrance room (but no enemies)
+    if loot.random() < item_chance * 1.5:  # Higher chance for item in starting room
+        x, y, w, h = entrance_room
+        item_x, item_y = loot.randint(x+1, x+w-2), loot.randint(y+1, y+h-2)
+
+        # More likely to be health potion in entrance room
+        item_type = loot.choices(CONTENT.item_types, weights=CONTENT.entrance_weights, k=1)[0]
+        result.items.append(Item(item_x, item_y, item_type))
+
+    # Add obstacles in corridors based on level
+    if level_mod == 0:  # Cavernous level - fewer obstacles
+        obstacle_count = 5 + level
+    elif level_mod == 1:  # Cramped level - more obstacles
+        obstacle_count = 15 + level * 2
+    else:
+        obstacle_count = 10 + level * 2
+
+    occupied = {result.stairs.tile, result.entrance}
+    occupied.update(item.tile for item in result.items)
+    occupied.update(result.enemies)
+    for _ in range(obstacle_count):
+        x, y = rng.randint(1, cols-2), rng.randint(1, rows-2)
+        if grid[y][x] == 0 and (x, y) not in occupied and not walls.is_blocked(x, y):
+            # Don't block critical paths
+            neighbors_open = sum(1 for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]
+                                 if 0 < x+dx < cols-1 and 0 < y+dy < rows-1 and grid[y+dy][x+dx] == 0)
+
+            if neighbors_open >= 3:  # Only add obstacle if it won't block a path
+                walls.set_blocked(x, y)
+                result.obstacles += 1
+
+    result.repaired = connect_stairs(walls, result.entrance, result.stairs.tile)
+    return result
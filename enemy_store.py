@@ -0,0 +1,248 @@
+"""Array-backed storage for dungeon enemies.
+
+Each enemy is a row across parallel NumPy columns (position, level, health,
+attack, facing, animation frame, alive/awake/pending flags) instead of a
+sprite object. Enemies don't count cooldowns down: each one that is ready to
+act has an ENEMY_MOVE event on the shared TimerWheel, and step() only looks
+at the enemies whose event came due this tick. Line-of-sight tests and move
+proposals for those are done in one vectorized pass. Sprites are only drawn
+for the handful of enemies the player can actually see.
+
+step() runs under a per-frame time budget. Due enemies are handled in
+batches of `batch`, and once the budget is spent the rest wait and go first
+on the next tick, so a frame never spends much more than the budget on AI
+however many enemies are awake. The first batch always runs, so a level with
+no more than `batch` enemies due at once never defers anyone and stays
+independent of timing (session replays rely on that).
+"""
+import time
+
+import numpy as np
+
+from combat_engine import enemy_stats
+from timer_wheel import TimerWheel
+
+# Facing values index the rows of the enemy sprite sheet
+DOWN, LEFT, RIGHT, UP = range(4)
+DIRECTIONS = ('down', 'left', 'right', 'up')
+
+# (dx, dy, facing) for the four steps an enemy can take
+STEPS = np.array([(1, 0, RIGHT), (-1, 0, LEFT), (0, 1, DOWN), (0, -1, UP)], dtype=np.int32)
+
+FAR = np.iinfo(np.int32).max // 8  # Distance used for tiles an enemy can't step onto
+
+ENEMY_MOVE = 'enemy_move'  # Timer event kind; the payload is the enemy index
+
+
+class EnemyStore:
+    def __init__(self, cols, rows, move_delay=30, capacity=64, timers=None, budget_ms=2.0, batch=256):
+        self.cols = cols
+        self.rows = rows
+        self.move_delay = move_delay
+        self.budget = None if budget_ms is None else budget_ms / 1000  # AI time per step; None for no limit
+        self.batch = batch
+        self._deferred = np.empty(0, dtype=np.intp)  # Due enemies the last step had no time for
+        self.timers = TimerWheel() if timers is None else timers
+        self.count = 0  # Rows in use, including dead enemies
+        self._allocate(capacity)
+        # Number of live enemies standing on each tile
+        self.occupancy = np.zeros(cols * rows, dtype=np.int16)
+        self.vision = np.zeros(cols * rows, dtype=bool)
+        self.field = np.full(cols * rows, -1, dtype=np.int32)
+        self.player_tile = None
+
+    def _allocate(self, capacity):
+        old = getattr(self, 'x', None)
+        columns = {
+            'x': np.int32, 'y': np.int32, 'level': np.int16, 'health': np.int32,
+            'attack': np.int32, 'direction': np.int8, 'frame': np.int8,
+            'alive': bool, 'awake': bool, 'pending': bool,
+        }
+        for name, dtype in columns.items():
+            column = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                column[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, column)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive[:self.count]))
+
+    def clear(self):
+        self.count = 0
+        self.alive[:] = False
+        self.awake[:] = False
+        self.pending[:] = False
+        self.occupancy[:] = 0
+        self.vision[:] = False
+        self.player_tile = None
+        self._deferred = self._deferred[:0]
+
+    def add(self, x, y, level):
+        if self.count == len(self.x):
+            self._allocate(len(self.x) * 2)
+        i = self.count
+        self.count += 1
+        self.x[i] = x
+        self.y[i] = y
+        self.level[i] = level
+        self.health[i], self.attack[i] = enemy_stats(level)
+        self.direction[i] = DOWN
+        self.frame[i] = 0
+        self.alive[i] = True
+        self.awake[i] = False
+        self.pending[i] = False
+        self.occupancy[y * self.cols + x] += 1
+        return i
+
+    def kill(self, index):
+        if self.alive[index]:
+            self.alive[index] = False
+            self.awake[index] = False
+            self.occupancy[self.y[index] * self.cols + self.x[index]] -= 1
+
+    def at(self, tile):
+        """Indices of live enemies standing on tile."""
+        x, y = tile
+        if not (0 <= x < self.cols and 0 <= y < self.rows) or not self.occupancy[y * self.cols + x]:
+            return np.empty(0, dtype=np.intp)
+        n = self.count
+        return np.flatnonzero(self.alive[:n] & (self.x[:n] == x) & (self.y[:n] == y))
+
+    def pack(self, tile, radius=1, limit=None):
+        """Live enemies on tile plus the awake ones within radius tiles of it.
+
+        These are the enemies that join a fight started on tile. Those on the
+        tile come first, and at most limit are returned; the rest stay on the
+        map for a later fight.
+        """
+        x, y = tile
+        n = self.count
+        near = (np.abs(self.x[:n] - x) <= radius) & (np.abs(self.y[:n] - y) <= radius)
+        on_tile = (self.x[:n] == x) & (self.y[:n] == y)
+        alive = self.alive[:n]
+        fighters = np.concatenate((np.flatnonzero(alive & on_tile),
+                                   np.flatnonzero(alive & near & self.awake[:n] & ~on_tile)))
+        return fighters[:limit]
+
+    def player_moved(self, player_tile, distances, vision_tiles, wake_radius, sleep_margin=2):
+        """Refresh everything that depends on the player's tile.
+
+        distances is the walking-distance field (-1 for unreachable), and
+        vision_tiles the tiles from which an enemy can see the player. Enemies
+        within wake_radius (Chebyshev) wake up; awake enemies further than
+        wake_radius + sleep_margin go dormant and stop ticking. Awake enemies
+        that can now see the player and have nothing scheduled get an
+        ENEMY_MOVE event for the next tick.
+        """
+        self.player_tile = player_tile
+        self.field[:] = distances
+        self.vision[:] = False
+        if vision_tiles:
+            xs, ys = np.array(vision_tiles, dtype=np.int32).T
+            self.vision[ys * self.cols + xs] = True
+
+        n = self.count
+        px, py = player_tile
+        reach = np.maximum(np.abs(self.x[:n] - px), np.abs(self.y[:n] - py))
+        awake = self.awake[:n]
+        awake |= reach <= wake_radius
+        awake &= reach <= wake_radius + sleep_margin
+        awake &= self.alive[:n]
+
+        idle = awake & ~self.pending[:n] & self.vision[self.y[:n] * self.cols + self.x[:n]]
+        self._schedule(1, np.flatnonzero(idle))
+
+    def _schedule(self, delay, indices):
+        if indices.size:
+            self.pending[indices] = True
+            self.timers.schedule_many(delay, [(ENEMY_MOVE, i) for i in indices.tolist()])
+
+    def step(self, due):
+        """Act for the enemies whose ENEMY_MOVE event is due. Returns the indices that moved.
+
+        Enemies that step act again after waiting move_delay ticks, ones that
+        are blocked retry next tick, and ones that have fallen asleep or lost
+        sight of the player go idle until player_moved() finds them eligible
+        again. Enemies left over when the budget runs out act first next step.
+        """
+        ready = np.asarray(due, dtype=np.intp)
+        if self._deferred.size:
+            ready = np.concatenate((self._deferred, ready))
+            self._deferred = self._deferred[:0]
+        if not ready.size:
+            return ready
+        deadline = None if self.budget is None else time.perf_counter() + self.budget
+        moved = []
+        for start in range(0, ready.size, self.batch):
+            if start and deadline is not None and time.perf_counter() > deadline:
+                self._deferred = ready[start:]  # Still pending, so nothing reschedules them meanwhile
+                break
+            moved.append(self._step_batch(ready[start:start + self.batch]))
+        return moved[0] if len(moved) == 1 else np.concatenate(moved)
+
+    def _step_batch(self, ready):
+        self.pending[ready] = False
+        ready = ready[self.awake[ready]]
+        x, y = self.x[ready], self.y[ready]
+        ready_tiles = y * self.cols + x
+        sees_player = self.vision[ready_tiles]
+        ready, x, y, ready_tiles = ready[sees_player], x[sees_player], y[sees_player], ready_tiles[sees_player]
+        if not ready.size:
+            return ready
+
+        # Distance-to-player through each of the four neighbours (one column per step)
+        nx = x[:, None] + STEPS[:, 0]
+        ny = y[:, None] + STEPS[:, 1]
+        in_bounds = (nx >= 0) & (nx < self.cols) & (ny >= 0) & (ny < self.rows)
+        neighbour_tiles = np.where(in_bounds, ny * self.cols + nx, 0)
+        distance = np.where(in_bounds, self.field[neighbour_tiles], -1)
+        blocked = (distance < 0) | (self.occupancy[neighbour_tiles] > 0)
+        distance = np.where(blocked, FAR, distance)
+
+        # Prefer closing the larger gap to the player first, as the old greedy chase did
+        px, py = self.player_tile
+        horizontal_first = np.abs(px - x) > np.abs(py - y)
+        minor_axis = np.where(horizontal_first[:, None], STEPS[:, 0] == 0, STEPS[:, 1] == 0)
+        choice = np.argmin(distance * 2 + minor_axis, axis=1)
+        rows = np.arange(ready.size)
+        best = distance[rows, choice]
+        moving = best < self.field[ready_tiles]
+
+        # Two enemies heading for the same tile: the first one gets it
+        movers = ready[moving]
+        targets = neighbour_tiles[rows, choice][moving]
+        targets, first = np.unique(targets, return_index=True)
+        movers = movers[first]
+        steps = STEPS[choice[moving][first]]
+
+        np.subtract.at(self.occupancy, self.y[movers] * self.cols + self.x[movers], 1)
+        np.add.at(self.occupancy, targets, 1)
+        self.x[movers] += steps[:, 0]
+        self.y[movers] += steps[:, 1]
+        self.direction[movers] = steps[:, 2]
+        self.frame[movers] = (self.frame[movers] + 1) % 3
+        self._schedule(self.move_delay + 1, movers)
+        self._schedule(1, np.setdiff1d(ready, movers, assume_unique=True))
+        return movers
+
+    def visible(self, tiles):
+        """Indices of live enemies standing on any of the given tiles."""
+        if not tiles:
+            return np.empty(0, dtype=np.intp)
+        mask = np.zeros(self.cols * self.rows, dtype=bool)
+        xs, ys = np.array(tiles, dtype=np.int32).T
+        mask[ys * self.cols + xs] = True
+        n = self.count
+        alive = np.flatnonzero(self.alive[:n])
+        return alive[mask[self.y[alive] * self.cols + self.x[alive]]]
+
+    def draw(self, surface, frames, tiles, grid_size):
+        """Blit the enemies standing on the given (visible) tiles.
+
+        frames maps a direction name to its list of animation frames.
+        """
+        indices = self.visible(tiles)
+        surface.blits([
+            (frames[DIRECTIONS[self.direction[i]]][self.frame[i]], (int(self.x[i]) * grid_size, int(self.y[i]) * grid_size))
+            for i in indices
+        ], doreturn=False)
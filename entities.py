@@ -0,0 +1,33 @@
+"""Compact records for map entities that don't need to be sprites.
+
+Walls are just blocked cells of the level's OccupancyGrid, and chests and
+stairs are small slotted records keyed by tile. Nothing here owns a surface
+or a rect; the game draws them from their tile positions, so each costs a few
+dozen bytes instead of a full pygame Sprite with its dict, rect and group
+bookkeeping.
+"""
+
+
+class Item:
+    __slots__ = ('x', 'y', 'type')
+
+    def __init__(self, x, y, item_type):
+        self.x = x
+        self.y = y
+        self.type = item_type
+
+    @property
+    def tile(self):
+        return (self.x, self.y)
+
+
+class Stairs:
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    @property
+    def tile(self):
+        return (self.x, self.y)
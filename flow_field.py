@@ -0,0 +1,100 @@
+"""Shared distance field (a "Dijkstra map") for enemy movement.
+
+One breadth-first search from the player's tile gives every floor tile its
+walking distance to the player. It is rebuilt only when the player changes
+tile, and any number of enemies then pursue by stepping to a neighbour with a
+smaller distance, which routes them around walls and corners. Stepping to a
+larger distance flees; comparing distances from other goals can be used for
+flanking.
+"""
+from collections import deque
+
+UNREACHABLE = -1
+
+# Neighbour order used when scanning around a tile
+STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+class DistanceField:
+    def __init__(self):
+        self.occupancy = None
+        self.goal = None
+        self.distances = []
+
+    def update(self, occupancy, goal):
+        """Rebuild the field if the level or the goal tile changed.
+
+        Returns True when a rebuild happened.
+        """
+        if occupancy is self.occupancy and goal == self.goal:
+            return False
+        self.occupancy = occupancy
+        self.goal = goal
+        self._build()
+        return True
+
+    def invalidate(self):
+        self.occupancy = None
+        self.goal = None
+
+    def _build(self):
+        cols, rows = self.occupancy.cols, self.occupancy.rows
+        cells = self.occupancy.cells
+        distances = [UNREACHABLE] * (cols * rows)
+        self.distances = distances
+        gx, gy = self.goal
+        if not (0 <= gx < cols and 0 <= gy < rows):
+            return
+        start = gy * cols + gx
+        distances[start] = 0
+        frontier = deque([start])
+        while frontier:
+            index = frontier.popleft()
+            next_distance = distances[index] + 1
+            x = index % cols
+            # Neighbour indices, skipping those that would wrap around a row edge
+            for neighbour in (index - cols, index + cols,
+                              index - 1 if x > 0 else -1,
+                              index + 1 if x < cols - 1 else -1):
+                if 0 <= neighbour < len(distances) and distances[neighbour] == UNREACHABLE \
+                        and not cells[neighbour]:
+                    distances[neighbour] = next_distance
+                    frontier.append(neighbour)
+
+    def distance(self, tile):
+        """Walking distance from tile to the goal, or None if it can't get there."""
+        x, y = tile
+        cols = self.occupancy.cols if self.occupancy else 0
+        if not (0 <= x < cols and 0 <= y < self.occupancy.rows):
+            return None
+        value = self.distances[y * cols + x]
+        return None if value == UNREACHABLE else value
+
+    def _best_step(self, tile, better, blocked):
+        current = self.distance(tile)
+        if current is None:
+            return None
+        x, y = tile
+        # Prefer closing the larger gap to the goal first, as the old greedy chase did
+        gx, gy = self.goal
+        steps = sorted(STEPS, key=lambda step: -(abs(gx - x) * abs(step[0]) + abs(gy - y) * abs(step[1])))
+        best = None
+        best_distance = current
+        for dx, dy in steps:
+            neighbour = (x + dx, y + dy)
+            distance = self.distance(neighbour)
+            if distance is None or not better(distance, best_distance):
+                continue
+            if blocked and blocked(neighbour):
+                continue
+            best = neighbour
+            best_distance = distance
+        return best
+
+    def downhill(self, tile, blocked=None):
+        """Neighbouring tile that gets closest to the goal (pursuit), or None."""
+        return self._best_step(tile, lambda distance, best: distance < best, blocked)
+
+    def uphill(self, tile, blocked=None):
+        """Neighbouring tile that gets furthest from the goal (fleeing), or None."""
+        return self._best_step(tile, lambda distance, best: distance > best, blocked)
@@ -0,0 +1,103 @@
+"""Field of view by recursive shadowcasting on the level grid.
+
+The visible set is computed from the player's tile and only recomputed when
+the player moves to a tile it hasn't been cached for. Enemy line-of-sight
+checks and the fog of war both read the same set, so each is a dictionary
+lookup per tile rather than a ray cast.
+"""
+from collections import OrderedDict
+
+# Transforms from octant-local (col, row) to grid (dx, dy) for the eight octants
+OCTANTS = (
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1),
+)
+
+
+def compute_visible(occupancy, origin, radius):
+    """Return {tile: squared distance} for every tile visible from origin within radius.
+
+    Walls that bound the view are included, so they can be drawn.
+    """
+    ox, oy = origin
+    visible = {origin: 0}
+    radius_squared = radius * radius
+
+    def cast(row, start, end, xx, xy, yx, yy):
+        if start < end:
+            return
+        new_start = start
+        for distance in range(row, radius + 1):
+            blocked = False
+            dy = -distance
+            for dx in range(-distance, 1):
+                # Slopes of the left and right edges of this cell
+                left_slope = (dx - 0.5) / (dy + 0.5)
+                right_slope = (dx + 0.5) / (dy - 0.5)
+                if start < right_slope:
+                    continue
+                if end > left_slope:
+                    break
+                x = ox + dx * xx + dy * xy
+                y = oy + dx * yx + dy * yy
+                squared = dx * dx + dy * dy
+                if squared <= radius_squared and occupancy.in_bounds(x, y):
+                    visible[(x, y)] = squared
+                opaque = occupancy.is_blocked(x, y)
+                if blocked:
+                    if opaque:
+                        new_start = right_slope
+                    else:
+                        blocked = False
+                        start = new_start
+                elif opaque and distance < radius:
+                    # Scan the lit part beyond this wall, then keep going past it
+                    blocked = True
+                    cast(distance + 1, start, left_slope, xx, xy, yx, yy)
+                    new_start = right_slope
+            if blocked:
+                break
+
+    for xx, xy, yx, yy in OCTANTS:
+        cast(1, 1.0, 0.0, xx, xy, yx, yy)
+    return visible
+
+
+class FieldOfView:
+    def __init__(self, radius, cache_size=64):
+        self.radius = radius
+        self.cache_size = cache_size
+        self.occupancy = None
+        self.origin = None
+        self.visible = {}
+        self._cache = OrderedDict()
+
+    def update(self, occupancy, origin):
+        """Make origin the viewpoint. Returns True if the visible set changed."""
+        if occupancy is not self.occupancy:
+            # New level: nothing cached for the old grid applies any more
+            self.occupancy = occupancy
+            self._cache.clear()
+        elif origin == self.origin:
+            return False
+        self.origin = origin
+        visible = self._cache.get(origin)
+        if visible is None:
+            visible = compute_visible(occupancy, origin, self.radius)
+            self._cache[origin] = visible
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(origin)
+        self.visible = visible
+        return True
+
+    def is_visible(self, tile, radius=None):
+        squared = self.visible.get(tile)
+        if squared is None:
+            return False
+        return radius is None or squared <= radius * radius
+
+    def tiles_within(self, radius):
+        radius_squared = radius * radius
+        return [tile for tile, squared in self.visible.items() if squared <= radius_squared]
@@ -0,0 +1,140 @@
+"""Frame watchdog that catches one-off stalls (hitches) in the act.
+
+Averages hide a single 200 ms frame, such as the one that generates the next
+level, starts a fight or loads a popup's sounds. The game calls frame() at
+the start of every frame, from get_events(). A watchdog thread sleeps until
+the current frame would go over budget. If the frame is still running then,
+the thread takes a stack snapshot of the game thread, and it keeps noting
+the phase (sampling_profiler.stack_phase) every interval until the frame
+ends. So each hitch records the frame's length, what the game was waiting on
+when the frame began, the stack where the budget ran out, and which phases
+the overrun was spent in.
+
+Only the worst `worst` hitches are kept, so the log stays small however long
+the game runs. save() writes it as JSON, worst first.
+"""
+import collections
+import heapq
+import json
+import sys
+import threading
+import time
+import traceback
+
+from sampling_profiler import PHASES, stack_phase
+
+BUDGET_MS = 2 * 1000 / 60  # Two frames at 60 fps
+WORST = 20  # Hitches kept in the log
+INTERVAL_MS = 2  # How often an overrunning frame is looked at
+HITCH_PATH = 'hitches.json'
+
+
+class Hitch:
+    __slots__ = ('frame', 'ms', 'mode', 'phases', 'stack')
+
+    def __init__(self, frame, ms, mode, phases, stack):
+        self.frame = frame  # Frame number, counted from start()
+        self.ms = ms
+        self.mode = mode  # What the game was waiting on when the frame began
+        self.phases = phases  # {phase: times seen} over the overrun
+        self.stack = stack  # Formatted stack lines, outermost first, when the budget ran out
+
+    @property
+    def phase(self):
+        return max(self.phases, key=self.phases.get) if self.phases else 'unknown'
+
+    def as_dict(self):
+        return {'frame': self.frame, 'ms': round(self.ms, 2), 'mode': self.mode, 'phase': self.phase,
+                'phases': self.phases, 'stack': self.stack}
+
+    def __str__(self):
+        return f"frame {self.frame}: {self.ms:.1f} ms in {self.mode}, mostly {self.phase}"
+
+
+class HitchWatchdog:
+    def __init__(self, budget_ms=BUDGET_MS, worst=WORST, interval_ms=INTERVAL_MS, phases=PHASES):
+        self.budget = budget_ms / 1000
+        self.worst = worst
+        self.interval = interval_ms / 1000
+        self.phases = phases
+        self.frames = 0
+        self.hitches = 0  # Every frame over budget, including those no longer in the log
+        self._log = []  # Heap of (ms, frame, Hitch), the mildest on top
+        self._current = None  # (frame, mode, started) for the frame in progress
+        self._overrun = None  # (frame, phases, stack) gathered by the watchdog thread
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Watch the calling thread's frames."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(threading.get_ident(),),
+                                        name='hitch-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._current = None
+
+    def frame(self, mode):
+        """Mark the start of a frame (and the end of the one before)."""
+        now = time.perf_counter()
+        current = self._current
+        if current is not None and now - current[2] > self.budget:
+            self._record(current, (now - current[2]) * 1000)
+        self.frames += 1
+        self._current = (self.frames, mode, now)
+
+    def _record(self, current, ms):
+        frame, mode, _ = current
+        overrun = self._overrun
+        phases, stack = (overrun[1], overrun[2]) if overrun is not None and overrun[0] == frame else ({}, [])
+        self.hitches += 1
+        entry = (ms, frame, Hitch(frame, ms, mode, dict(phases), stack))
+        if len(self._log) < self.worst:
+            heapq.heappush(self._log, entry)
+        elif ms > self._log[0][0]:
+            heapq.heapreplace(self._log, entry)
+
+    def _run(self, thread_id):
+        wait = self.interval
+        while not self._stop.wait(wait):
+            current = self._current
+            if current is None:
+                wait = self.interval
+                continue
+            overdue = time.perf_counter() - current[2] - self.budget
+            if overdue < 0:
+                wait = max(self.interval, -overdue)  # Sleep until this frame would be over budget
+                continue
+            wait = self.interval
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            overrun = self._overrun
+            if overrun is None or overrun[0] != current[0]:
+                stack = [line.rstrip() for line in traceback.format_stack(frame)]
+                overrun = self._overrun = (current[0], collections.Counter(), stack)
+            overrun[1][stack_phase(frame, self.phases)] += 1
+
+    def log(self):
+        """The hitches kept, worst first."""
+        return [hitch for _, _, hitch in sorted(self._log, key=lambda entry: (-entry[0], entry[1]))]
+
+    def save(self, path=HITCH_PATH):
+        with open(path, 'w') as f:
+            json.dump({'budget_ms': round(self.budget * 1000, 2), 'frames': self.frames, 'hitches': self.hitches,
+                       'worst': [hitch.as_dict() for hitch in self.log()]}, f, indent=2)
+
+    def summary(self):
+        log = self.log()
+        if not log:
+            return f"no frames over {self.budget * 1000:.1f} ms in {self.frames:,}"
+        return (f"{self.hitches:,} of {self.frames:,} frames over {self.budget * 1000:.1f} ms; "
+                f"worst {log[0]}")
@@ -0,0 +1,95 @@
+"""Retained-memory tracking across level transitions and fights, with tracemalloc.
+
+The game calls checkpoint() at moments when everything from the previous
+level or fight should be garbage: each level start and each combat end. A
+checkpoint collects garbage, takes a tracemalloc snapshot and records the
+bytes still allocated. It keeps the previous snapshot of the same kind
+to diff against, so a report can name the allocation sites that grew.
+
+Memory warming up (caches filling, the first fight's assets) grows for a
+while and then levels off, and bounded caches such as the FOV cache go up
+and down with the level. A leak keeps raising the floor. So a kind of
+checkpoint is flagged only when the least memory retained over its last
+`window` checkpoints is more than `min_growth` bytes above the most retained
+over the `window` before those. Tracking costs nothing unless
+start() is called: the game only makes a tracker with --track-leaks, and
+soak.py turns it on by default.
+"""
+import gc
+import sys
+import tracemalloc
+
+WINDOW = 5  # Checkpoints (of one kind) per window; a leak needs two windows
+MIN_GROWTH = 1024 * 1024  # Bytes the floor must rise by between the windows
+TOP = 8  # Allocation sites shown per diff
+
+
+class Leak:
+    __slots__ = ('label', 'sizes', 'sites')
+
+    def __init__(self, label, sizes, sites):
+        self.label = label
+        self.sizes = sizes  # Retained bytes at each checkpoint of both windows
+        self.sites = sites  # (file:line, bytes grown, count grown), biggest first
+
+    def __str__(self):
+        growth = self.sizes[-1] - self.sizes[0]
+        lines = [f"Possible leak at '{self.label}': retained memory grew {growth / 1024:,.0f} KiB "
+                 f"over {len(self.sizes) - 1} checkpoints, and never fell back"]
+        lines += [f"  {size / 1024:+9,.1f} KiB {count:+7,} blocks  {site}" for site, size, count in self.sites]
+        return '\n'.join(lines)
+
+
+class LeakTracker:
+    def __init__(self, window=WINDOW, min_growth=MIN_GROWTH, top=TOP, frames=1, out=sys.stderr):
+        self.window = window
+        self.min_growth = min_growth
+        self.top = top
+        self.frames = frames
+        self.out = out
+        self.history = {}  # label -> retained bytes at each checkpoint
+        self.snapshots = {}  # label -> previous snapshot
+        self.leaks = []
+        self._flagged = set()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self):
+        tracemalloc.stop()
+        self.snapshots.clear()
+
+    def checkpoint(self, label):
+        """Record retained memory at label; returns a Leak if this label now looks like one."""
+        if not tracemalloc.is_tracing():
+            return None
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+        size = sum(stat.size for stat in snapshot.statistics('filename'))
+        sizes = self.history.setdefault(label, [])
+        sizes.append(size)
+        previous = self.snapshots.get(label)
+        self.snapshots[label] = snapshot
+
+        recent = sizes[-2 * self.window:]
+        growing = (len(recent) == 2 * self.window
+                   and min(recent[self.window:]) - max(recent[:self.window]) > self.min_growth)
+        if not growing or label in self._flagged:
+            return None
+        self._flagged.add(label)  # Once per label, or a real leak floods the log
+        sites = [(str(stat.traceback[0]), stat.size_diff, stat.count_diff)
+                 for stat in snapshot.compare_to(previous, 'lineno')[:self.top] if stat.size_diff > 0]
+        leak = Leak(label, recent, sites)
+        self.leaks.append(leak)
+        if self.out is not None:
+            print(leak, file=self.out)
+        return leak
+
+    def summary(self):
+        """{label: (checkpoints, first retained bytes, last retained bytes)}."""
+        return {label: (len(sizes), sizes[0], sizes[-1]) for label, sizes in self.history.items()}
@@ -0,0 +1,110 @@
+"""Replay a recorded session (session_record) and check it ends in the recorded state.
+
+The game is loaded headless with its frame cap off, so a replay runs as fast
+as the game can simulate and draw. --render shows it in a window instead
+(still uncapped unless --fps is given). The same session always does the
+same work, so its ticks per second make a repeatable workload: record one
+with the game's --record or soak.py --record, then time it before and after
+a change, or --profile it (sampling_profiler) to see where the time goes.
+
+Replays run from the game's folder, where the game loads its assets, whatever
+directory replay.py is started from. Exits 1 if the replay diverges from the
+recording or ends in a different state.
+
+    python replay.py run.session
+    python replay.py run.session --render --fps 60
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import traceback
+
+from rng_streams import RngStreams
+from session_record import NO_HASH, Desync, Session, SessionPlayer
+from soak import GAME_PATH, load_game
+
+REPLAY_LOG_PATH = 'replay_combat_log.bin'
+
+
+def replay(path, render=False, fps=0, quiet=True, profile=None):
+    """Play the session at path back. Returns the report as a dict."""
+    session = Session.load(path)
+    # Assets load relative to the game's folder, and placeholders for missing ones (the
+    # blood splatter's frame count, say) change how long a fight's animations wait
+    os.chdir(os.path.dirname(GAME_PATH))
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+        game = load_game(headless=not render)
+    player = SessionPlayer(game.pygame, session)
+    game.rng_streams = RngStreams(session.seed)
+    game.combat_speed = game.COMBAT_SPEEDS[session.combat_speed]
+    game.auto_battle = session.auto_battle
+    game.input_source = player
+    game.party_ai.close()
+    game.party_ai = player.auto_battle()
+    game.frame_cap = fps
+    game.LOG_PATH = REPLAY_LOG_PATH  # Keep the player's own combat log
+    game.profile_scope = profile
+
+    state = None
+    error = None
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            game.main()
+        state = game.game_state_hash()
+    except Desync as desync:
+        error = f"desync: {desync}"
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        elapsed = time.perf_counter() - started
+        game.pygame.quit()
+
+    if error is None and not player.finished:
+        error = "desync: the game stopped before the recording ran out"
+    return {
+        'session': path,
+        'seed': session.seed,
+        'ticks': player.tick,
+        'recorded_ticks': session.ticks,
+        'seconds': round(elapsed, 2),
+        'ticks_per_second': round(player.tick / elapsed, 1) if elapsed else 0,
+        'verified': None if session.state == NO_HASH or state is None else state == session.state,
+        'error': error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session and verify its end state.")
+    parser.add_argument('session', help="a session saved with --record")
+    parser.add_argument('--render', action='store_true', help="show the replay in a window")
+    parser.add_argument('--fps', type=int, default=0, help="frame cap while replaying (default: uncapped)")
+    parser.add_argument('--profile', choices=('game', 'combat'),
+                        help="sample a profile of the whole replay, or of each fight in it")
+    parser.add_argument('--json', metavar='PATH', help="also write the report as JSON")
+    parser.add_argument('--verbose', action='store_true', help="show the game's own output")
+    args = parser.parse_args()
+    session, json_path = os.path.abspath(args.session), args.json and os.path.abspath(args.json)
+
+    report = replay(session, args.render, args.fps, not args.verbose, args.profile)
+    print(f"{report['ticks']:,} of {report['recorded_ticks']:,} ticks in {report['seconds']:.2f} s "
+          f"({report['ticks_per_second']:,.0f}/s)")
+    if report['error']:
+        print(f"FAILED: {report['error']}")
+    elif report['verified'] is None:
+        print("no end state was recorded, so the replay can't be checked")
+    else:
+        print("end state matches the recording" if report['verified'] else "FAILED: end state differs")
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if report['error'] or report['verified'] is False else 0)
+
+
+if __name__ == '__main__':
+    main()
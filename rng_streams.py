@@ -0,0 +1,58 @@
+"""Named random streams derived from one run seed.
+
+Every subsystem draws from its own random.Random instead of the global
+random module, so an extra draw in one (an enemy spawn, say) can't shift the
+dungeon layout, the floor tiles or the next fight:
+
+  layout  rooms, corridors, entrance, stairs and obstacles
+  spawns  enemy counts and positions
+  decor   floor tile variants
+  loot    chest positions and contents, and which treasure a chest holds
+  combat  the seed of each encounter (combat_engine draws from that)
+
+Stream seeds are hashed from the run seed, the stream name and an optional
+key with BLAKE2, not Python's per-process hash(), so the same run seed gives
+the same streams in any process, worker or build. Per-level streams are
+keyed by the level (and the game number, so a restart gets new levels), so
+level N is the same no matter how much was drawn on the levels before it.
+"""
+import hashlib
+import random
+
+STREAMS = ('layout', 'spawns', 'decor', 'loot', 'combat')
+
+
+def derive_seed(seed, name, *key):
+    """64-bit seed for stream `name` (and key) of run `seed`, the same everywhere."""
+    text = ':'.join(str(part) for part in (seed, name) + key)
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'little')
+
+
+class RngStreams:
+    def __init__(self, seed=None):
+        self.seed = random.SystemRandom().getrandbits(64) if seed is None else seed
+        self._streams = {}
+
+    def stream(self, name):
+        """The run-wide stream called name; it carries on from draw to draw."""
+        if name not in STREAMS:
+            raise ValueError(f"unknown random stream {name!r}")
+        rng = self._streams.get(name)
+        if rng is None:
+            rng = self._streams[name] = random.Random(derive_seed(self.seed, name))
+        return rng
+
+    def fork(self, name, *key):
+        """A new stream for name and key, independent of every other stream."""
+        if name not in STREAMS:
+            raise ValueError(f"unknown random stream {name!r}")
+        return random.Random(derive_seed(self.seed, name, *key))
+
+    def level(self, *key):
+        """Keyword arguments giving dungeon_generator.generate_level its streams for one level."""
+        return {'rng': self.fork('layout', *key), 'decor': self.fork('decor', *key),
+                'spawns': self.fork('spawns', *key), 'loot': self.fork('loot', *key)}
+
+    def state(self):
+        """(name, state) of each run-wide stream drawn from so far, for checking two runs match."""
+        return tuple((name, self._streams[name].getstate()) for name in sorted(self._streams))
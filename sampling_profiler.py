@@ -0,0 +1,197 @@
+"""Sampling profiler for the game loop, exported for flame graphs.
+
+A capture runs a sampler thread that wakes every interval, reads the main
+thread's Python stack with sys._current_frames() and counts it. Nothing is
+instrumented, so when no capture is running the game pays nothing. While one
+runs, the game thread loses a sliver of time to each sample. The sampler can
+only look when the main thread lets go of the GIL, at the latest every
+sys.getswitchinterval() (5 ms by default), so that is the finest interval
+worth asking for.
+
+Each sample is put under a game phase, found from its stack: the innermost
+function listed in PHASES decides (so the enemy pathing inside a level
+change counts as ai, not generation). When the stack holds none of them, the
+line the innermost frame is on decides instead, for time spent in pygame's C
+calls (display.flip, clock.tick). Anything else counts as 'other'.
+stack_phase() sorts a single stack this way (hitch_watchdog uses it too).
+
+write() saves a speedscope profile (https://www.speedscope.app) for a .json
+path and collapsed stacks (one 'phase;outer;...;inner count' line per stack,
+for flamegraph.pl and friends) for anything else. The phase is the root frame
+in both.
+"""
+import collections
+import json
+import linecache
+import os
+import sys
+import threading
+import time
+
+INTERVAL_MS = 5
+
+# (file, function) -> phase
+PHASES = {
+    ('dungeon-crawler-game.py', 'generate_dungeon'): 'generation',
+    ('dungeon_generator.py', 'generate_level'): 'generation',
+    ('enemy_store.py', 'player_moved'): 'ai',
+    ('enemy_store.py', 'step'): 'ai',
+    ('flow_field.py', 'update'): 'ai',
+    ('fov.py', 'update'): 'ai',
+    ('combat_ai.py', 'request'): 'ai',
+    ('combat_ai.py', 'poll'): 'ai',
+    ('dungeon-crawler-game.py', 'move'): 'collision',
+    ('enemy_store.py', 'at'): 'collision',
+    ('enemy_store.py', 'pack'): 'collision',
+    ('spatial.py', 'at'): 'collision',
+    ('dungeon-crawler-game.py', 'update'): 'combat animation',
+    ('dungeon-crawler-game.py', 'skip'): 'combat animation',
+    ('dungeon-crawler-game.py', 'draw'): 'draw',
+    ('dungeon-crawler-game.py', 'draw_exploration'): 'draw',
+    ('dungeon-crawler-game.py', 'update_fog_surface'): 'draw',
+    ('dungeon-crawler-game.py', 'show_treasure_popup'): 'draw',
+    ('enemy_store.py', 'draw'): 'draw',
+    ('dungeon-crawler-game.py', 'get_events'): 'input',
+    ('dungeon-crawler-game.py', 'load_image'): 'loading',
+    ('dungeon-crawler-game.py', 'load_sound'): 'loading',
+    ('dungeon-crawler-game.py', 'load_sprite_sheet'): 'loading',
+    ('dungeon-crawler-game.py', 'play_music'): 'loading',
+}
+
+# Text on the innermost frame's line -> phase, for time inside C calls
+LINE_PHASES = (('display.flip', 'draw'), ('.blit(', 'draw'), ('clock.tick', 'wait'))
+
+_basenames = {}
+
+
+def stack_phase(frame, phases=PHASES):
+    """The phase of the stack from frame (the innermost) outwards."""
+    leaf = frame
+    while frame is not None:
+        code = frame.f_code
+        filename = _basenames.get(code.co_filename)
+        if filename is None:
+            filename = _basenames[code.co_filename] = os.path.basename(code.co_filename)
+        phase = phases.get((filename, code.co_name))
+        if phase is not None:
+            return phase
+        frame = frame.f_back
+    line = linecache.getline(leaf.f_code.co_filename, leaf.f_lineno)
+    return next((phase for text, phase in LINE_PHASES if text in line), 'other')
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms=INTERVAL_MS, phases=PHASES):
+        self.interval = interval_ms / 1000
+        self.phases = phases
+        self.samples = collections.Counter()  # (phase, code objects outermost first) -> samples
+        self.seconds = 0.0  # Length of the capture
+        self._names = {}  # code object -> (function name, file, first line)
+        self._thread = None
+        self._stop = threading.Event()
+        self._started = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        """Start sampling the calling thread."""
+        if self._thread is not None:
+            return
+        self.samples.clear()
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, args=(threading.get_ident(),),
+                                        name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.seconds = time.perf_counter() - self._started
+
+    def _run(self, thread_id):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                self.samples[self.sample(frame)] += 1
+
+    def sample(self, frame):
+        phase = stack_phase(frame, self.phases)
+        codes = []
+        while frame is not None:
+            code = frame.f_code
+            codes.append(code)
+            if code not in self._names:
+                self._names[code] = (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+            frame = frame.f_back
+        codes.reverse()
+        return phase, tuple(codes)
+
+    def frame_name(self, code):
+        name, filename, line = self._names[code]
+        return f"{name} ({filename}:{line})"
+
+    def by_phase(self):
+        """{phase: samples}, most first."""
+        totals = collections.Counter()
+        for (phase, _), count in self.samples.items():
+            totals[phase] += count
+        return dict(totals.most_common())
+
+    def collapsed(self):
+        lines = []
+        for (phase, codes), count in sorted(self.samples.items(), key=lambda item: -item[1]):
+            lines.append(';'.join([phase] + [self.frame_name(code) for code in codes]) + f" {count}")
+        return '\n'.join(lines) + '\n'
+
+    def speedscope(self, name='capture'):
+        frames = []
+        index = {}
+
+        def frame_index(key, frame):
+            if key not in index:
+                index[key] = len(frames)
+                frames.append(frame)
+            return index[key]
+
+        samples = []
+        weights = []
+        total = sum(self.samples.values())
+        ms_per_sample = self.seconds * 1000 / total if total else 0
+        for (phase, codes), count in self.samples.items():
+            stack = [frame_index(phase, {'name': phase})]
+            for code in codes:
+                function, _, line = self._names[code]
+                stack.append(frame_index(code, {'name': function, 'file': code.co_filename, 'line': line}))
+            samples.append(stack)
+            weights.append(round(count * ms_per_sample, 3))
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled', 'name': name, 'unit': 'milliseconds',
+                'startValue': 0, 'endValue': round(sum(weights), 3),
+                'samples': samples, 'weights': weights,
+            }],
+            'name': name,
+            'exporter': 'sampling_profiler.py',
+        }
+
+    def write(self, path, name='capture'):
+        with open(path, 'w') as f:
+            if path.endswith('.json'):
+                json.dump(self.speedscope(name), f)
+            else:
+                f.write(self.collapsed())
+
+    def summary(self):
+        total = sum(self.samples.values())
+        if not total:
+            return f"no samples in {self.seconds:.2f} s"
+        phases = ', '.join(f"{phase} {count * 100 / total:.0f}%" for phase, count in self.by_phase().items())
+        return f"{total:,} samples over {self.seconds:.2f} s: {phases}"
@@ -0,0 +1,231 @@
+"""Recorded play sessions: a run seed plus a tick-stamped input stream, replayed exactly.
+
+Given its run seed (rng_streams), the game is deterministic in what
+get_events() returns frame by frame, with one exception: auto-battle's search
+is time-budgeted, so which move it picks, and on which frame, depends on the
+machine. A session therefore stores:
+
+  the run seed, and the combat speed and auto-battle setting at the start
+  every key press and quit, as (tick, mode, key)
+  every mouse click, as (tick, mode, button and position) for the menus
+  every auto-battle decision, as (tick, choice)
+
+A tick is one get_events() call, and mode is what the game was waiting on.
+A replay feeds the same events back on the same ticks and plays the recorded
+decisions instead of searching. It can run uncapped and headless and still end
+in the same state, and the end state's hash is stored with the session and
+checked. If the game asks for input in a different mode than was recorded,
+the replay has diverged and Desync is raised. The menus take a click's position
+from the event rather than the live pointer, so a replayed click lands on the
+button the recorded one did.
+
+The file is little-endian: a 40-byte header (magic, version, combat speed
+index, auto-battle, seed, ticks, events, 16-byte state hash), then one 10-byte
+record per event (tick, kind, mode, value).
+
+    python dungeon-crawler-game.py --seed 3 --record run.session
+    python replay.py run.session             # headless, uncapped, verified
+    python replay.py run.session --render    # watch it in a window
+"""
+import hashlib
+import struct
+
+from combat_log import ACTION_KINDS, NONE
+
+MAGIC = b'DCRS'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBxQII16s')
+RECORD = struct.Struct('<IBBI')
+
+KEY, QUIT, CHOICE, CLICK = range(4)
+MODES = ('menu', 'explore', 'combat', 'popup', 'game_over')
+NO_HASH = bytes(16)  # Saved when the game stopped before its state could be hashed
+
+
+class Desync(Exception):
+    """The game stopped matching the recording it's replaying."""
+
+
+def state_hash(*parts):
+    """16-byte digest of parts: bytes-like parts as they are, anything else by its repr()."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, (bytes, bytearray, memoryview)) else repr(part).encode())
+    return digest.digest()
+
+
+def pack_click(button, pos):
+    # A mouse click as one 32-bit value: button, then x and y in 12 bits each
+    x, y = (min(max(int(coordinate), 0), 0xFFF) for coordinate in pos)
+    return button << 24 | x << 12 | y
+
+
+def unpack_click(value):
+    return value >> 24, (value >> 12 & 0xFFF, value & 0xFFF)
+
+
+def pack_choice(choice):
+    # An auto-battle choice (actor slot, kind, target slot, skill index) as one 32-bit value
+    actor, kind, target, skill_index = choice
+    return (actor << 24 | ACTION_KINDS.index(kind) << 16 | (NONE if target is None else target) << 8
+            | (NONE if skill_index is None else skill_index))
+
+
+def unpack_choice(value):
+    target, skill_index = value >> 8 & 0xFF, value & 0xFF
+    return (value >> 24, ACTION_KINDS[value >> 16 & 0xFF],
+            None if target == NONE else target, None if skill_index == NONE else skill_index)
+
+
+class Session:
+    def __init__(self, seed, combat_speed=0, auto_battle=False):
+        if not 0 <= seed < 1 << 64:
+            raise ValueError(f"a recorded session needs a run seed from 0 to 2**64 - 1, not {seed}")
+        self.seed = seed
+        self.combat_speed = combat_speed  # Index into the game's COMBAT_SPEEDS
+        self.auto_battle = auto_battle
+        self.ticks = 0
+        self.records = []  # (tick, kind, mode index, value), in tick order
+        self.state = NO_HASH
+
+    def add(self, tick, kind, mode, value=0):
+        self.records.append((tick, kind, MODES.index(mode), value))
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.combat_speed, self.auto_battle, self.seed,
+                                self.ticks, len(self.records), self.state))
+            f.write(b''.join(RECORD.pack(*record) for record in self.records))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, combat_speed, auto_battle, seed, ticks, count, state = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} session recording")
+        session = cls(seed, combat_speed, bool(auto_battle))
+        session.ticks = ticks
+        session.state = state
+        session.records = list(RECORD.iter_unpack(data[HEADER.size:HEADER.size + count * RECORD.size]))
+        return session
+
+
+class SessionRecorder:
+    """Input source that passes another source's events through and records them.
+
+    source is called like the game's input_source; None reads the keyboard.
+    Wrap the game's AutoBattle with auto_battle() to record its decisions too.
+    """
+
+    def __init__(self, pygame, session, source=None):
+        self.pygame = pygame
+        self.session = session
+        self.source = source
+        self.tick = 0
+
+    def __call__(self, mode):
+        self.tick += 1
+        self.session.ticks = self.tick
+        events = self.pygame.event.get() if self.source is None else self.source(mode)
+        for event in events:
+            if event.type == self.pygame.KEYDOWN:
+                self.session.add(self.tick, KEY, mode, event.key)
+            elif event.type == self.pygame.QUIT:
+                self.session.add(self.tick, QUIT, mode)
+            elif event.type == self.pygame.MOUSEBUTTONDOWN:
+                self.session.add(self.tick, CLICK, mode, pack_click(event.button, event.pos))
+        return events
+
+    def auto_battle(self, party_ai):
+        return RecordedAutoBattle(self, party_ai)
+
+
+class RecordedAutoBattle:
+    """An AutoBattle whose decisions are added to the recording as they're made."""
+
+    def __init__(self, recorder, party_ai):
+        self.recorder = recorder
+        self.party_ai = party_ai
+
+    def __getattr__(self, name):
+        return getattr(self.party_ai, name)  # budget, start(), close(), ...
+
+    def request(self, encounter):
+        self.party_ai.request(encounter)
+
+    def poll(self, encounter):
+        choice = self.party_ai.poll(encounter)
+        if choice is not None:
+            self.recorder.session.records.append((self.recorder.tick, CHOICE, MODES.index('combat'),
+                                                  pack_choice(choice)))
+        return choice
+
+
+class SessionPlayer:
+    """Input source that plays a session's events back on the ticks they were recorded on.
+
+    Once the recording runs out it sends QUIT, so a session cut short still ends.
+    """
+
+    def __init__(self, pygame, session):
+        self.pygame = pygame
+        self.session = session
+        self.tick = 0
+        self.events = [record for record in session.records if record[1] != CHOICE]
+        self.choices = [record for record in session.records if record[1] == CHOICE]
+        self.next_event = 0
+        self.next_choice = 0
+
+    @property
+    def finished(self):
+        return self.next_event == len(self.events) and self.next_choice == len(self.choices)
+
+    def __call__(self, mode):
+        self.tick += 1
+        if self.next_choice < len(self.choices) and self.choices[self.next_choice][0] < self.tick:
+            raise Desync(f"auto-battle decision recorded at tick {self.choices[self.next_choice][0]} "
+                         f"was never asked for")
+        if self.tick > self.session.ticks:
+            return [self.pygame.event.Event(self.pygame.QUIT)]
+        events = []
+        while self.next_event < len(self.events) and self.events[self.next_event][0] == self.tick:
+            _, kind, mode_index, value = self.events[self.next_event]
+            if MODES[mode_index] != mode:
+                raise Desync(f"tick {self.tick}: recorded in {MODES[mode_index]}, replaying in {mode}")
+            self.next_event += 1
+            if kind == KEY:
+                events.append(self.pygame.event.Event(self.pygame.KEYDOWN, key=value))
+            elif kind == CLICK:
+                button, pos = unpack_click(value)
+                events.append(self.pygame.event.Event(self.pygame.MOUSEBUTTONDOWN, button=button, pos=pos))
+            else:
+                events.append(self.pygame.event.Event(self.pygame.QUIT))
+        return events
+
+    def auto_battle(self):
+        return ReplayedAutoBattle(self)
+
+
+class ReplayedAutoBattle:
+    """Stands in for AutoBattle during a replay, answering with the recorded decisions."""
+
+    def __init__(self, player):
+        self.player = player
+        self.budget = 0
+
+    def start(self):
+        pass
+
+    def request(self, encounter):
+        pass
+
+    def poll(self, encounter):
+        player = self.player
+        if player.next_choice == len(player.choices) or player.choices[player.next_choice][0] != player.tick:
+            return None
+        player.next_choice += 1
+        return unpack_choice(player.choices[player.next_choice - 1][3])
+
+    def close(self):
+        pass
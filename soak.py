@@ -0,0 +1,265 @@
+"""Headless soak test: a scripted bot plays the game with no window or human.
+
+The game runs on SDL's dummy video and audio drivers with its frame cap off.
+SoakBot is installed as the game's input source. In the menus it presses
+Enter. Exploring, it walks downhill on a distance field to the nearest item
+or visible enemy, or to the stairs when there are none. In combat it leaves
+the party to auto-battle (combat_ai) at instant speed. A death restarts the
+game from the game over menu, the way a player would.
+
+The run stops after --levels staircases. It also stops when the bot goes
+--stuck-ticks frames without reaching new stairs, or when the stairs can't be
+reached at all. It reports ticks per second, level generation times, peak
+memory and any exception, and exits non-zero on an exception or a stuck run.
+
+Allocations are traced (leak_tracker) unless --no-leak-check is given, and
+memory that keeps growing across level starts or fight ends also fails the
+run. The leak checkpoints run outside the timed level generation, but tracing
+itself slows every allocation, so measure throughput and generation times
+with it off.
+--record saves the run as a session (session_record) that replay.py plays
+back exactly, so a run that turned something up can be kept and rerun.
+
+    python soak.py --levels 20 --seed 7 --json soak.json
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from collections import Counter
+
+from flow_field import DistanceField
+from leak_tracker import WINDOW, LeakTracker
+from rng_streams import RngStreams
+from session_record import Session, SessionRecorder
+
+GAME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dungeon-crawler-game.py')
+SOAK_LOG_PATH = 'soak_combat_log.bin'
+
+
+def load_game(headless=True):
+    """Import the game module, headless by default (it opens its window and loads assets on import)."""
+    if headless:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    spec = importlib.util.spec_from_file_location('dungeon_crawler_game', GAME_PATH)
+    game = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(game)
+    return game
+
+
+def peak_memory_mb():
+    """Peak resident set size of this process, or None where it can't be read."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class SoakBot:
+    """Input source for the game that plays until `levels` staircases are taken."""
+
+    def __init__(self, game, levels, stuck_ticks):
+        self.game = game
+        self.pygame = game.pygame
+        self.levels = levels
+        self.stuck_ticks = stuck_ticks
+        self.field = DistanceField()
+        self.ticks = Counter()  # Frames by what the game was waiting on
+        self.last_mode = None
+        self.stairs_taken = 0
+        self.fights = 0
+        self.items = 0
+        self.deaths = 0
+        self.level = None  # (player level, stairs tile) of the level being played
+        self.level_ticks = 0
+        self.stuck = None
+
+    def key(self, key):
+        return [self.pygame.event.Event(self.pygame.KEYDOWN, key=key)]
+
+    def quit(self):
+        return [self.pygame.event.Event(self.pygame.QUIT)]
+
+    def __call__(self, mode):
+        self.ticks[mode] += 1
+        entered = mode != self.last_mode
+        self.last_mode = mode
+        if mode == 'combat':
+            self.fights += entered
+            return []  # Auto-battle picks the party's moves
+        if mode == 'popup':
+            self.items += entered
+            return self.key(self.pygame.K_RETURN)
+        if mode == 'game_over':
+            self.deaths += 1
+            return self.key(self.pygame.K_RETURN)  # Restart
+        if mode == 'menu':
+            return self.key(self.pygame.K_RETURN)  # New game
+        return self.explore()
+
+    def explore(self):
+        game = self.game
+        level = (game.player.level, game.stairs.tile)
+        if level != self.level:
+            if self.level is not None and level[0] > self.level[0]:
+                self.stairs_taken += 1
+            self.level = level
+            self.level_ticks = 0
+        self.level_ticks += 1
+        if self.stairs_taken >= self.levels:
+            return self.quit()
+        if self.level_ticks > self.stuck_ticks:
+            self.stuck = f"no stairs reached on level {game.player.level} after {self.stuck_ticks} ticks"
+            return self.quit()
+
+        tile = (game.player.rect.x // game.GRID_SIZE, game.player.rect.y // game.GRID_SIZE)
+        self.field.update(game.wall_grid, self.target(tile))
+        step = self.field.downhill(tile)
+        if step is None:
+            if self.field.goal == game.stairs.tile:
+                self.stuck = f"stairs at {game.stairs.tile} unreachable from {tile} on level {game.player.level}"
+                return self.quit()
+            return []
+        dx, dy = step[0] - tile[0], step[1] - tile[1]
+        keys = {(1, 0): self.pygame.K_RIGHT, (-1, 0): self.pygame.K_LEFT,
+                (0, 1): self.pygame.K_DOWN, (0, -1): self.pygame.K_UP}
+        return self.key(keys[(dx, dy)])
+
+    def target(self, tile):
+        # The nearest reachable item or visible enemy; the stairs once there are none
+        game = self.game
+        store = game.enemy_store
+        distances = game.player_field
+        goals = [item.tile for item in game.level_items.in_area(0, 0, game.COLS - 1, game.ROWS - 1)]
+        seen = store.visible(game.player_fov.tiles_within(game.ENEMY_VISION_RANGE))
+        goals += [(int(store.x[i]), int(store.y[i])) for i in seen]
+        reachable = [(distances.distance(goal), goal) for goal in goals if distances.distance(goal) is not None]
+        return min(reachable)[1] if reachable else game.stairs.tile
+
+
+def soak(levels, seed=0, stuck_ticks=20000, budget_ms=20, log_path=SOAK_LOG_PATH, quiet=True, leak_window=WINDOW,
+         record_path=None):
+    """Play until `levels` staircases are taken. Returns the report as a dict."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+        game = load_game()
+    bot = SoakBot(game, levels, stuck_ticks)
+    game.rng_streams = RngStreams(seed)
+    game.input_source = bot
+    game.frame_cap = 0
+    game.combat_speed = game.COMBAT_SPEEDS[-1]
+    game.auto_battle = True
+    game.party_ai.budget = budget_ms / 1000
+    game.LOG_PATH = log_path
+    if leak_window:
+        game.leak_tracker = LeakTracker(window=leak_window, out=None)
+        game.leak_tracker.start()
+    recorder = None
+    if record_path:
+        session = Session(seed, len(game.COMBAT_SPEEDS) - 1, True)
+        recorder = game.input_source = SessionRecorder(game.pygame, session, source=bot)
+        game.party_ai = recorder.auto_battle(game.party_ai)
+
+    generation_ms = []
+    generate_dungeon = game.generate_dungeon
+
+    def timed_generate_dungeon(level):
+        started = time.perf_counter()
+        generate_dungeon(level)
+        generation_ms.append((time.perf_counter() - started) * 1000)
+    game.generate_dungeon = timed_generate_dungeon
+
+    error = None
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            game.main()
+        if recorder is not None:
+            recorder.session.state = game.game_state_hash()
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        elapsed = time.perf_counter() - started
+        game.party_ai.close()
+        game.pygame.quit()
+        if game.leak_tracker is not None:
+            game.leak_tracker.stop()
+        if recorder is not None:
+            recorder.session.save(record_path)
+
+    ticks = sum(bot.ticks.values())
+    generation_ms.sort()
+    return {
+        'seed': seed,
+        'levels': bot.stairs_taken,
+        'seconds': round(elapsed, 2),
+        'ticks': ticks,
+        'ticks_per_second': round(ticks / elapsed, 1) if elapsed else 0,
+        'ticks_by_mode': dict(bot.ticks),
+        'generation_ms': {
+            'count': len(generation_ms),
+            'median': round(generation_ms[len(generation_ms) // 2], 2) if generation_ms else None,
+            'max': round(generation_ms[-1], 2) if generation_ms else None,
+        },
+        'fights': bot.fights,
+        'items': bot.items,
+        'deaths': bot.deaths,
+        'peak_memory_mb': peak_memory_mb(),
+        'retained_kb': {label: [first // 1024, last // 1024, count] for label, (count, first, last)
+                        in game.leak_tracker.summary().items()} if game.leak_tracker else None,
+        'leaks': [str(leak) for leak in game.leak_tracker.leaks] if game.leak_tracker else [],
+        'stuck': bot.stuck,
+        'exception': error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play the game headless with a bot and report on the run.")
+    parser.add_argument('--levels', type=int, default=10, help="staircases to take before stopping")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stuck-ticks', type=int, default=20000, help="give up on a level after this many frames")
+    parser.add_argument('--budget-ms', type=int, default=20, help="auto-battle search time per decision")
+    parser.add_argument('--combat-log', default=SOAK_LOG_PATH, help="where the game saves its combat log")
+    parser.add_argument('--json', metavar='PATH', help="also write the report as JSON")
+    parser.add_argument('--verbose', action='store_true', help="show the game's own output")
+    parser.add_argument('--leak-window', type=int, default=WINDOW,
+                        help="checkpoints per window when comparing retained memory")
+    parser.add_argument('--no-leak-check', action='store_true', help="don't trace allocations")
+    parser.add_argument('--record', metavar='PATH', help="save the bot's session for replay.py")
+    args = parser.parse_args()
+
+    report = soak(args.levels, args.seed, args.stuck_ticks, args.budget_ms, args.combat_log, not args.verbose,
+                  0 if args.no_leak_check else args.leak_window, args.record)
+    generation = report['generation_ms']
+    modes = ', '.join(f"{count:,} {mode}" for mode, count in sorted(report['ticks_by_mode'].items()))
+    memory = f"{report['peak_memory_mb']:.1f} MB" if report['peak_memory_mb'] is not None else 'unknown'
+    print(f"{report['levels']} levels in {report['seconds']:.1f} s: {report['ticks']:,} ticks "
+          f"({report['ticks_per_second']:,.0f}/s; {modes})")
+    tracing = ' (slowed by allocation tracing; --no-leak-check for real times)' if report['retained_kb'] else ''
+    print(f"level generation: {generation['count']} levels, median {generation['median']} ms, "
+          f"max {generation['max']} ms{tracing}")
+    print(f"{report['fights']} fights, {report['items']} items, {report['deaths']} deaths, peak memory {memory}")
+    for label, (first, last, count) in (report['retained_kb'] or {}).items():
+        print(f"retained at {label}: {first:,} KiB -> {last:,} KiB over {count} checkpoints")
+    for leak in report['leaks']:
+        print(f"LEAK: {leak}")
+    if report['stuck']:
+        print(f"STUCK: {report['stuck']}")
+    if report['exception']:
+        print(f"EXCEPTION:\n{report['exception']}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if report['stuck'] or report['exception'] or report['leaks'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Tile-indexed collision lookups.
+
+Everything in the dungeon moves one grid tile at a time, so "can I step here?"
+is answered by looking the destination tile up instead of testing rectangles
+against every wall and every enemy.
+"""
+
+
+class OccupancyGrid:
+    """Blocked/open flag for every tile of the level (walls and obstacles)."""
+
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.cells = bytearray(cols * rows)
+
+    @classmethod
+    def from_rows(cls, grid):
+        # grid is the generator's [row][col] list with 1 for rock and 0 for floor
+        occupancy = cls(len(grid[0]), len(grid))
+        for y, row in enumerate(grid):
+            for x, cell in enumerate(row):
+                if cell:
+                    occupancy.cells[y * occupancy.cols + x] = 1
+        return occupancy
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.cols and 0 <= y < self.rows
+
+    def set_blocked(self, x, y, blocked=True):
+        self.cells[y * self.cols + x] = 1 if blocked else 0
+
+    def is_blocked(self, x, y):
+        # Anything off the map counts as solid rock
+        if not (0 <= x < self.cols and 0 <= y < self.rows):
+            return True
+        return self.cells[y * self.cols + x] == 1
+
+
+class TileHash:
+    """Spatial hash from tile to the entities standing on it."""
+
+    def __init__(self):
+        self._tiles = {}
+
+    def __len__(self):
+        return sum(len(entities) for entities in self._tiles.values())
+
+    def clear(self):
+        self._tiles.clear()
+
+    def add(self, entity, tile):
+        self._tiles.setdefault(tile, []).append(entity)
+
+    def remove(self, entity, tile):
+        entities = self._tiles.get(tile)
+        if entities and entity in entities:
+            entities.remove(entity)
+            if not entities:
+                del self._tiles[tile]
+
+    def move(self, entity, old_tile, new_tile):
+        self.remove(entity, old_tile)
+        self.add(entity, new_tile)
+
+    def at(self, tile):
+        return self._tiles.get(tile, ())
+
+    def is_occupied(self, tile, ignore=None):
+        return any(entity is not ignore for entity in self._tiles.get(tile, ()))
+
+    def in_area(self, left, top, right, bottom):
+        """Yield entities on tiles within the inclusive rectangle."""
+        tiles = self._tiles
+        # Walk whichever is smaller: the area's tiles or the occupied tiles
+        if (right - left + 1) * (bottom - top + 1) <= len(tiles):
+            for y in range(top, bottom + 1):
+                for x in range(left, right + 1):
+                    yield from tiles.get((x, y), ())
+        else:
+            for (x, y), entities in list(tiles.items()):
+                if left <= x <= right and top <= y <= bottom:
+                    yield from entities
@@ -0,0 +1,144 @@
+import contextlib
+import importlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# minimal_test.py puts a mock pygame in sys.modules when it's collected; these
+# tests need the real one, here and in the modules under test, so swap it back out
+if isinstance(sys.modules.get('pygame'), mock.Mock):
+    del sys.modules['pygame']
+import pygame  # noqa: E402
+import asset_pack  # noqa: E402
+import asset_loader  # noqa: E402
+importlib.reload(asset_pack)
+importlib.reload(asset_loader)
+
+from asset_loader import AssetLoader  # noqa: E402
+
+
+def setUpModule():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))  # Needed for convert() and convert_alpha()
+
+
+def tearDownModule():
+    pygame.display.quit()
+
+
+def pixels(surface):
+    return pygame.image.tobytes(surface, 'RGBA')
+
+
+class FakePack:
+    def __init__(self, surface):
+        self.surface = surface
+        self.asked = []
+
+    def image(self, path, size):
+        self.asked.append(path)
+        return self.surface
+
+    def sprite_sheet(self, path, frame_count, frame_width, frame_height, size):
+        self.asked.append(path)
+        return [self.surface] * frame_count
+
+
+class TestAssetLoader(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.folder = directory.name
+        self.images = [self.source(f'image{i}.png', i + 2, 3, alpha=i % 2 == 0) for i in range(4)]
+        self.sheet = self.source('sheet.png', 6, 2, alpha=True)  # Three 2x2 frames
+        self.missing = os.path.join(self.folder, 'missing.png')
+
+    def source(self, name, width, height, alpha):
+        surface = pygame.Surface((width, height), pygame.SRCALPHA if alpha else 0)
+        for x in range(width):
+            for y in range(height):
+                surface.set_at((x, y), (x * 40, y * 80, 100, 255 - x * 30 if alpha else 255))
+        path = os.path.join(self.folder, name)
+        pygame.image.save(surface, path)
+        return path
+
+    def queue(self, loader):
+        for i, path in enumerate(self.images):
+            loader.add_image(path, (8, 8) if i % 2 else None)
+        loader.add_sprite_sheet(self.sheet, 3, 2, 2, (4, 4))
+
+    def load(self, loader, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            stats = loader.load(**kwargs)
+        return stats, out.getvalue()
+
+    def test_threaded_load_matches_serial(self):
+        loaded = []
+        for workers in (0, 4):
+            loader = AssetLoader(max_workers=workers)
+            self.queue(loader)
+            stats, _ = self.load(loader)
+            self.assertEqual((stats['assets'], stats['failed'], stats['workers']), (5, 0, workers))
+            loaded.append(([pixels(loader.image(path, (8, 8) if i % 2 else None)) for i, path in enumerate(self.images)],
+                           [pixels(frame) for frame in loader.sprite_sheet(self.sheet, 3, 2, 2, (4, 4))]))
+        self.assertEqual(loaded[0], loaded[1])
+        self.assertEqual(loader.image(self.images[1], (8, 8)).get_size(), (8, 8))
+        self.assertEqual(loader.image(self.images[0]).get_size(), (2, 3))
+        self.assertEqual(len(loaded[1][1]), 3)
+
+    def test_failures_are_counted_and_skipped(self):
+        for workers in (0, 2):
+            loader = AssetLoader(max_workers=workers)
+            self.queue(loader)
+            loader.add_image(self.missing, (8, 8))
+            stats, out = self.load(loader)
+            self.assertEqual((stats['assets'], stats['failed']), (5, 1))
+            self.assertIn(f"Error loading {self.missing}", out)
+            self.assertIsNone(loader.image(self.missing, (8, 8)))
+
+    def test_cached_assets_are_not_loaded_again(self):
+        loader = AssetLoader(max_workers=2)
+        loader.add_image(self.images[0], (8, 8))
+        self.load(loader)
+        first = loader.image(self.images[0], (8, 8))
+        os.remove(self.images[0])
+        loader.add_image(self.images[0], (8, 8))
+        stats, _ = self.load(loader)
+        self.assertEqual((stats['assets'], stats['failed'], stats['decode_ms']), (1, 0, 0.0))
+        self.assertIs(loader.image(self.images[0], (8, 8)), first)
+
+    def test_pack_short_circuits_decoding(self):
+        baked = pygame.Surface((8, 8), pygame.SRCALPHA)
+        baked.fill((1, 2, 3, 4))
+        pack = FakePack(baked)
+        loader = AssetLoader(max_workers=2, pack=pack)
+        loader.add_image(self.missing, (8, 8))  # Would fail to decode
+        loader.add_sprite_sheet(self.missing, 3, 2, 2, (4, 4))
+        loader.add_image(self.images[0])  # Unsized images never come from the pack
+        stats, _ = self.load(loader)
+        self.assertEqual((stats['assets'], stats['failed']), (3, 0))
+        self.assertEqual(pack.asked, [self.missing, self.missing])
+        self.assertEqual(pixels(loader.image(self.missing, (8, 8))), pixels(baked))
+        self.assertEqual(len(loader.sprite_sheet(self.missing, 3, 2, 2, (4, 4))), 3)
+
+    def test_progress_is_reported_to_the_end(self):
+        for workers in (0, 3):
+            loader = AssetLoader(max_workers=workers)
+            self.queue(loader)
+            loader.add_image(self.missing, (8, 8))
+            calls = []
+            self.load(loader, on_progress=lambda loaded, total: calls.append((loaded, total)))
+            self.assertEqual(calls[-1], (6, 6))
+            self.assertEqual({total for _, total in calls}, {6})
+            self.assertEqual([loaded for loaded, _ in calls], sorted(loaded for loaded, _ in calls))
+            if workers == 0:
+                self.assertEqual([loaded for loaded, _ in calls], list(range(1, 7)))
+
+
+if __name__ == '__main__':
+    unittest.main()
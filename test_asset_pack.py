@@ -0,0 +1,94 @@
+import contextlib
+import importlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# minimal_test.py puts a mock pygame in sys.modules when it's collected; these
+# tests need the real one, here and in asset_pack, so swap it back out
+if isinstance(sys.modules.get('pygame'), mock.Mock):
+    del sys.modules['pygame']
+import pygame  # noqa: E402
+import asset_pack  # noqa: E402
+importlib.reload(asset_pack)
+
+from asset_pack import HEADER, MAGIC, PACK_VERSION, AssetPack, bake, open_pack, slice_sheet  # noqa: E402
+
+
+def pixels(surface):
+    return pygame.image.tobytes(surface, 'RGBA')
+
+
+class TestAssetPack(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.folder = directory.name
+        self.image = self.source('tile.png', 4, 2)
+        self.sheet = self.source('sheet.png', 4, 2)  # Two 2x2 frames side by side
+        self.path = os.path.join(self.folder, 'assets.pack')
+        with contextlib.redirect_stdout(io.StringIO()):
+            counts = bake(self.path, ([(self.image, (8, 4)), (os.path.join(self.folder, 'missing.png'), (8, 4))],
+                                      [(self.sheet, 2, 2, 2, (4, 4))]))
+        self.assertEqual(counts[:2], (1, 1))
+
+    def source(self, name, width, height):
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        for x in range(width):
+            for y in range(height):
+                surface.set_at((x, y), (x * 60, y * 120, 200, 255 - x * 50))
+        path = os.path.join(self.folder, name)
+        pygame.image.save(surface, path)
+        return path
+
+    def open(self):
+        pack = AssetPack(self.path)
+        self.addCleanup(pack.close)
+        return pack
+
+    def test_images_read_back_as_baked(self):
+        pack = self.open()
+        surface = pack.image(self.image, (8, 4))
+        self.assertEqual(surface.get_size(), (8, 4))
+        self.assertTrue(surface.get_flags() & pygame.SRCALPHA)
+        self.assertEqual(pixels(surface), pixels(pygame.transform.scale(pygame.image.load(self.image), (8, 4))))
+        self.assertIsNone(pack.image(self.image, (16, 8)))
+        self.assertIsNone(pack.image(os.path.join(self.folder, 'missing.png'), (8, 4)))
+        del surface
+
+    def test_sprite_sheets_read_back_as_baked(self):
+        pack = self.open()
+        frames = pack.sprite_sheet(self.sheet, 2, 2, 2, (4, 4))
+        expected = slice_sheet(pygame.image.load(self.sheet), 2, 2, 2, (4, 4))
+        self.assertEqual([frame.get_size() for frame in frames], [(4, 4), (4, 4)])
+        self.assertEqual([pixels(frame) for frame in frames], [pixels(frame) for frame in expected])
+        self.assertNotEqual(pixels(frames[0]), pixels(frames[1]))
+        del frames
+
+    def test_edited_source_is_not_served(self):
+        stat = os.stat(self.image)
+        os.utime(self.image, (stat.st_atime, stat.st_mtime + 10))
+        pack = self.open()
+        entry = pack.index['images'][next(iter(pack.index['images']))]
+        self.assertFalse(pack._is_fresh(self.image, entry))
+        self.assertIsNone(pack.image(self.image, (8, 4)))
+        self.assertIsNotNone(pack.sprite_sheet(self.sheet, 2, 2, 2, (4, 4)))
+
+    def test_open_pack_rejects_other_files(self):
+        self.assertIsNone(open_pack(os.path.join(self.folder, 'none.pack')))
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        _, _, index_length = HEADER.unpack_from(data)
+        for magic, version in ((b'NOTPACK\x00', PACK_VERSION), (MAGIC, PACK_VERSION + 1)):
+            with open(self.path, 'wb') as f:
+                f.write(HEADER.pack(magic, version, index_length) + data[HEADER.size:])
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                self.assertIsNone(open_pack(self.path))
+            self.assertIn('Ignoring asset pack', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
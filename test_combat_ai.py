@@ -0,0 +1,77 @@
+import random
+import time
+import unittest
+
+from combat_ai import AutoBattle, candidates, restore, search, snapshot
+from combat_engine import ATTACK, RUN, SKILL, Encounter, Fighter, Skill, new_enemies, new_party
+
+
+def fight(seed=1, level=3):
+    rng = random.Random(seed)
+    return Encounter(new_party(), new_enemies(level, rng, groups=2), rng)
+
+
+class TestCombatAI(unittest.TestCase):
+    def test_snapshot_round_trip(self):
+        encounter = fight()
+        encounter.party[1].health = 7
+        encounter.next_turn()
+        copy = restore(snapshot(encounter), random.Random(0))
+        self.assertEqual(snapshot(copy), snapshot(encounter))
+        self.assertEqual(copy.current.name, encounter.current.name)
+        self.assertEqual(copy.enemies_left, encounter.enemies_left)
+
+    def test_candidates_cover_every_kind_of_action(self):
+        healer = Fighter('Healer', 90, 8, [Skill("Heal", 30, 20, effect_type='heal'), Skill("Nova", 5, 500)],
+                         mana=40)
+        hurt = Fighter('Warrior', 120, 12)
+        hurt.health = 50
+        goblins = [Fighter(f'Goblin {i}', 30 + i, 5) for i in range(6)]
+        encounter = Encounter.resume([healer, hurt], goblins, [(healer, 20, False)])
+        actions = candidates(encounter)
+        # The four weakest goblins, a heal for the one hurt ally, defend and run; Nova costs too much
+        self.assertEqual([target for kind, target, _ in actions if kind == ATTACK], [2, 3, 4, 5])
+        self.assertEqual([(target, skill) for kind, target, skill in actions if kind == SKILL], [(1, 0)])
+        self.assertEqual(actions[-1][0], RUN)
+
+    def test_search_takes_the_finishing_blow(self):
+        hero = Fighter('Hero', 50, 10, role='Warrior')
+        goblin = Fighter('Goblin', 30, 40)
+        goblin.health = 5
+        encounter = Encounter.resume([hero], [goblin], [(hero, 15, False), (goblin, 10, True)])
+        self.assertEqual(search(snapshot(encounter), budget=1, max_rollouts=50), (0, ATTACK, 1, None))
+
+    def test_search_does_not_touch_the_fight(self):
+        encounter = fight()
+        state = snapshot(encounter)
+        rng_state = encounter.rng.getstate()
+        actor, kind, target, skill = search(state, budget=0.05, seed=3)
+        self.assertEqual(snapshot(encounter), state)
+        self.assertEqual(encounter.rng.getstate(), rng_state)
+        self.assertEqual(actor, (encounter.party + encounter.enemies).index(encounter.current))
+
+    def test_auto_battle_answers_without_blocking(self):
+        encounter = fight()
+        while encounter.current_is_enemy:
+            encounter.next_turn()
+        ai = AutoBattle(budget_ms=100)
+        self.addCleanup(ai.close)
+        ai.start()
+        started = time.perf_counter()
+        ai.request(encounter)
+        ai.request(encounter)  # Already searching this turn
+        self.assertLess(time.perf_counter() - started, 0.05)
+        choice = None
+        while choice is None and time.perf_counter() - started < 10:
+            choice = ai.poll(encounter)
+            time.sleep(0.01)
+        self.assertEqual(choice[0], encounter.party.index(encounter.current))
+        self.assertEqual(ai.decisions, 1)
+        # An answer for an earlier turn is thrown away
+        ai.request(encounter)
+        encounter.next_turn()
+        self.assertIsNone(ai.poll(encounter))
+
+
+if __name__ == '__main__':
+    unittest.main()
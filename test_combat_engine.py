@@ -0,0 +1,145 @@
+import random
+import unittest
+
+from combat_engine import (
+    ATTACK, DEFEND, PARTY_ORDER, Action, Encounter, Fighter, Skill, enemy_stats,
+    greedy_policy, new_enemies, new_party, random_target_policy,
+)
+from combat_sim import simulate
+
+
+class FixedRng:
+    # Rolls 10 for initiative and always picks the first choice
+    def __init__(self, run_roll=0.0):
+        self.run_roll = run_roll
+
+    def randint(self, low, high):
+        return 10
+
+    def choice(self, options):
+        return options[0]
+
+    def random(self):
+        return self.run_roll
+
+
+def duel(hero_attack=10, enemy_attack=6):
+    hero = Fighter('Hero', 50, hero_attack, mana=40, role='Mage')
+    goblin = Fighter('Goblin', 30, enemy_attack)
+    return Encounter([hero], [goblin], FixedRng()), hero, goblin
+
+
+class TestEncounter(unittest.TestCase):
+    def test_initiative_bonus_orders_turns(self):
+        encounter, hero, goblin = duel()
+        self.assertEqual([entry['combatant'] for entry in encounter.order], [hero, goblin])
+        self.assertEqual([entry['initiative'] for entry in encounter.order], [13, 10])
+
+    def test_fallen_members_never_take_a_turn(self):
+        fallen = Fighter('Fallen', 50, 10, role='Mage')
+        fallen.health = 0
+        fallen.is_alive = False
+        hero = Fighter('Hero', 50, 10)
+        encounter = Encounter([fallen, hero], [Fighter('Goblin', 30, 6)], FixedRng())
+        self.assertEqual([entry['combatant'].name for entry in encounter.order], ['Hero', 'Goblin'])
+        self.assertIs(encounter.current, hero)
+
+    def test_the_fallen_leave_the_turn_order(self):
+        hero = Fighter('Hero', 500, 10, role='Mage')
+        enemies = [Fighter(f'Goblin {i}', 10 + i, 1) for i in range(6)]
+        encounter = Encounter([hero], enemies, FixedRng())
+        encounter.next_turn()
+        encounter.next_turn()
+        self.assertIs(encounter.current, enemies[1])
+        # Enemies either side of the current turn fall together
+        encounter.hurt_all([enemies[0], enemies[3], enemies[4]], 20)
+        self.assertIs(encounter.current, enemies[1])
+        self.assertEqual([entry['combatant'] for entry in encounter.order], [hero, enemies[1], enemies[2], enemies[5]])
+        self.assertEqual(encounter.living_enemies(), [enemies[1], enemies[2], enemies[5]])
+        self.assertEqual(encounter.enemies_left, 3)
+        encounter.next_turn()
+        encounter.next_turn()
+        self.assertIs(encounter.current, enemies[5])
+        encounter.next_turn()
+        self.assertIs(encounter.current, hero)
+
+    def test_horde(self):
+        rng = random.Random(2)
+        encounter = Encounter(new_party(), new_enemies(1, rng, groups=150), rng)
+        self.assertGreater(len(encounter.enemies), 150)
+        result = encounter.play(greedy_policy, random_target_policy, max_turns=100000)
+        self.assertTrue(encounter.over)
+        self.assertEqual(len(encounter.order), encounter.party_left + encounter.enemies_left)
+        self.assertEqual(result['damage_dealt'], sum(e.max_health - e.health for e in encounter.enemies))
+
+    def test_attack_kills_and_ends_the_fight(self):
+        encounter, hero, goblin = duel(hero_attack=20)
+        self.assertEqual(encounter.attack(hero, goblin), 20)
+        self.assertFalse(encounter.over)
+        encounter.attack(hero, goblin)
+        self.assertFalse(goblin.is_alive)
+        self.assertEqual(goblin.health, 0)
+        self.assertTrue(encounter.won)
+        # Overkill isn't counted
+        self.assertEqual(encounter.damage_dealt, 30)
+
+    def test_defend_lasts_until_the_defenders_next_turn(self):
+        encounter, hero, goblin = duel(enemy_attack=6)
+        encounter.defend(hero)
+        encounter.next_turn()
+        self.assertIs(encounter.current, goblin)
+        self.assertEqual(encounter.attack(goblin, hero), 3)
+        encounter.next_turn()
+        self.assertEqual(hero.defense_bonus, 1)
+
+    def test_skills(self):
+        healer = Fighter('Healer', 90, 8, mana=40)
+        hurt = Fighter('Warrior', 120, 12)
+        hurt.health = 100
+        enemies = [Fighter('Orc', 20, 5), Fighter('Troll', 40, 5)]
+        encounter = Encounter([healer, hurt], enemies, FixedRng())
+        heal = Skill("Heal", 30, 20, effect_type='heal')
+        self.assertEqual(encounter.use_skill(healer, heal, hurt), [(hurt, 20)])
+        self.assertEqual(hurt.health, 120)
+        storm = Skill("Storm", 25, 20, target_type='all')
+        self.assertEqual([amount for _, amount in encounter.use_skill(healer, storm)], [25, 25])
+        self.assertEqual([enemy.is_alive for enemy in enemies], [False, True])
+        self.assertEqual(healer.mana, 0)
+        self.assertFalse(encounter.can_use(healer, heal))
+
+    def test_running_away(self):
+        encounter = Encounter([Fighter('Hero', 50, 10)], [Fighter('Orc', 20, 5)], FixedRng(run_roll=0.9))
+        self.assertTrue(encounter.try_run(encounter.party[0]))
+        self.assertTrue(encounter.over)
+        self.assertFalse(encounter.won)
+
+    def test_play_is_deterministic_for_a_seed(self):
+        def fight(seed):
+            rng = random.Random(seed)
+            return Encounter(new_party(), new_enemies(3, rng), rng).play(greedy_policy, random_target_policy)
+        self.assertEqual(fight(7), fight(7))
+        result = fight(7)
+        self.assertTrue(result['won'] or result['party_deaths'] == len(PARTY_ORDER))
+
+    def test_policies_return_actions(self):
+        encounter, hero, goblin = duel()
+        self.assertEqual(random_target_policy(encounter, goblin).target, hero)
+        action = greedy_policy(encounter, hero)
+        self.assertIsInstance(action, Action)
+        self.assertIn(action.kind, (ATTACK, DEFEND, 'skill'))
+
+    def test_enemy_stats_scale_with_level(self):
+        self.assertEqual(enemy_stats(1), (40, 7))
+        self.assertEqual(enemy_stats(5), (80, 15))
+
+
+class TestSimulator(unittest.TestCase):
+    def test_results_do_not_depend_on_workers(self):
+        serial = simulate([1, 4], 40, seed=3, workers=0)
+        pooled = simulate([1, 4], 40, seed=3, workers=2)
+        self.assertEqual(serial, pooled)
+        self.assertEqual(sum(serial[1]['turns'].values()), 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
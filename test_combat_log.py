@@ -0,0 +1,108 @@
+import os
+import random
+import tempfile
+import unittest
+
+from combat_engine import Encounter, greedy_policy, new_enemies, new_party, random_target_policy
+from combat_log import ACTION, BEGIN, DEATH, END, RECORD, CombatLog, read_encounter, replay
+
+
+def record_fight(log, seed, level=3, party=None, groups=1):
+    party = party or new_party()
+    rng = random.Random(seed)
+    log.begin(seed, level, party, groups)
+    encounter = Encounter(party, new_enemies(level, rng, groups), rng, log=log)
+    encounter.play(greedy_policy, random_target_policy)
+    log.end(encounter)
+    return encounter
+
+
+class TestCombatLog(unittest.TestCase):
+    def test_records_are_fixed_size(self):
+        log = CombatLog()
+        encounter = record_fight(log, seed=1)
+        blob, = log.encounters()
+        self.assertEqual(len(blob), len(log) * RECORD.size)
+        kinds = [record[0] for record in RECORD.iter_unpack(blob)]
+        self.assertEqual(kinds[0], BEGIN)
+        self.assertEqual(kinds[-1], END)
+        self.assertEqual(kinds.count(DEATH), sum(not c.is_alive for c in encounter.party + encounter.enemies))
+
+    def test_replay_is_identical(self):
+        log = CombatLog()
+        for seed in range(20):
+            record_fight(log, seed)
+        for blob in log.encounters():
+            encounter, identical = replay(blob)
+            self.assertTrue(identical)
+
+    def test_horde_replay(self):
+        log = CombatLog(capacity=100000)
+        record_fight(log, seed=8, level=1, groups=60)
+        blob, = log.encounters()
+        self.assertEqual(read_encounter(blob)[2], 60)
+        encounter, identical = replay(blob)
+        self.assertTrue(identical)
+        self.assertGreater(len(encounter.enemies), 60)
+
+    def test_replay_starts_from_the_recorded_party(self):
+        party = new_party()
+        party[0].health = 40
+        party[2].mana = 10
+        party[3].health = 0
+        party[3].is_alive = False
+        log = CombatLog()
+        record_fight(log, seed=5, party=party)
+        _, _, _, states, _, _ = read_encounter(log.encounters()[0])
+        self.assertEqual(states[0][1], 40)
+        self.assertEqual(states[2][3], 10)
+        self.assertTrue(replay(log.encounters()[0])[1])
+
+    def test_ring_buffer_drops_the_oldest_encounters(self):
+        log = CombatLog(capacity=200)
+        for seed in range(30):
+            record_fight(log, seed)
+        self.assertEqual(len(log), 200)
+        self.assertEqual(len(log.buffer), 200 * RECORD.size)
+        blobs = log.encounters()
+        self.assertLess(len(blobs), 30)
+        self.assertEqual(read_encounter(blobs[-1])[0], 29)
+        self.assertTrue(all(replay(blob)[1] for blob in blobs))
+
+    def test_save_and_load(self):
+        log = CombatLog(capacity=100)
+        for seed in range(5):
+            record_fight(log, seed)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'combat.bin')
+            log.save(path)
+            self.assertEqual(CombatLog.load(path).encounters(), log.encounters())
+
+    def test_unfinished_recording_replays_as_far_as_it_went(self):
+        # The window closed during the enemies' turns: the recording stops after one enemy action
+        log = CombatLog()
+        encounter = record_fight(log, seed=0)
+        blob, = log.encounters()
+        party_size = len(encounter.party)
+        records = list(RECORD.iter_unpack(blob))
+        cut = next(i for i, record in enumerate(records) if record[0] == ACTION and record[1] >= party_size) + 1
+        truncated = blob[:cut * RECORD.size]
+        self.assertIsNone(read_encounter(truncated)[5])
+        self.assertTrue(replay(truncated)[1])
+        first_action = next(i for i, record in enumerate(records) if record[0] == ACTION)
+        for events in range(first_action, len(records)):
+            self.assertTrue(replay(blob[:events * RECORD.size])[1], events)
+        tampered = bytearray(truncated)
+        tampered[-1] ^= 1
+        self.assertFalse(replay(bytes(tampered))[1])
+
+    def test_deep_levels(self):
+        log = CombatLog()
+        record_fight(log, seed=3, level=300)
+        blob, = log.encounters()
+        self.assertEqual(read_encounter(blob)[1], 300)
+        self.assertTrue(replay(blob)[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
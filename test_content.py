@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import content as content_module
+from content import DATA_DIR, compile_content, load, read_cache
+
+
+class TestContent(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.data = os.path.join(directory.name, 'data')
+        shutil.copytree(DATA_DIR, self.data)
+        self.cache = os.path.join(directory.name, 'content.cache')
+
+    def edit(self, name, change):
+        path = os.path.join(self.data, name)
+        with open(path) as f:
+            data = json.load(f)
+        change(data)
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+    def test_tables(self):
+        content = compile_content(self.data)
+        mage = content.role_ids['Mage']
+        self.assertEqual((content.role_health[mage], content.role_attack[mage]), (80, 15))
+        self.assertEqual([skill.name for skill in content.role_skill_list('Mage')], ['Fireball', 'Lightning Storm'])
+        self.assertIs(content.skills[content.skill_ids['Heal']], content.role_skill_list('Healer')[0])
+        self.assertEqual(content.enemy_stats(5), (80, 15))
+        self.assertEqual(content.enemy_stats(10 ** 6), content.enemy_stats(content.max_level))
+        self.assertEqual(content.item_weights(3), (0.7, 0.2, 0.1))
+        self.assertEqual(content.item_weights(4), (0.5, 0.3, 0.2))
+        self.assertEqual(content.item_weights(50), (0.4, 0.3, 0.3))
+        speed = content.item_ids['speed_potion']
+        self.assertEqual([content.treasures[i][0] for i in content.treasures_by_item[speed]],
+                         ['Swift Boots', 'Magic Amulet'])
+
+    def test_cache_is_used_until_a_data_file_changes(self):
+        self.assertIsNone(read_cache(self.data, self.cache))
+        load(self.data, self.cache)
+        cached = read_cache(self.data, self.cache)
+        self.assertEqual(cached.roles, compile_content(self.data).roles)
+        self.edit('roles.json', lambda roles: roles[0].update(health=999))
+        self.assertIsNone(read_cache(self.data, self.cache))
+        self.assertEqual(load(self.data, self.cache).role_health[0], 999)
+
+    def test_script_writes_a_cache_importers_can_read(self):
+        subprocess.run([sys.executable, content_module.__file__, '--data', self.data, '--output', self.cache],
+                       check=True, capture_output=True)
+        cached = read_cache(self.data, self.cache)
+        self.assertIsInstance(cached, content_module.Content)
+        self.assertIsInstance(cached.skills[0], content_module.Skill)
+        self.assertEqual(cached.roles, compile_content(self.data).roles)
+
+    def test_validation(self):
+        broken = [
+            ('roles.json', lambda roles: roles[1]['skills'].append('Moonbeam'), 'Moonbeam'),
+            ('skills.json', lambda skills: skills[0].update(target='some'), 'Power Attack'),
+            ('skills.json', lambda skills: skills.append(dict(skills[0])), 'duplicate skill'),
+            ('enemies.json', lambda enemies: enemies['health'].pop('base'), "'base'"),
+            ('treasures.json', lambda treasures: treasures['treasures'][0].update(type='gold'), 'gold'),
+            ('treasures.json', lambda treasures: treasures['entrance_weights'].update(mana_potion=1), 'mana_potion'),
+        ]
+        for name, change, message in broken:
+            with self.subTest(message=message):
+                shutil.rmtree(self.data)
+                shutil.copytree(DATA_DIR, self.data)
+                self.edit(name, change)
+                with self.assertRaisesRegex(ValueError, message):
+                    compile_content(self.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import random
+import unittest
+
+from dungeon_corpus import dead_ends, generate_corpus
+from dungeon_generator import connect_stairs, create_corridor, generate_level, reachable
+from spatial import OccupancyGrid
+
+COLS, ROWS = 60, 40
+
+
+def layout_of(level):
+    return (bytes(level.walls.cells), bytes(level.floor), level.rooms, level.entrance, level.stairs.tile,
+            [(item.x, item.y, item.type) for item in level.items], level.enemies)
+
+
+class TestDungeonGenerator(unittest.TestCase):
+    def test_seeded_levels_repeat(self):
+        for level in range(1, 6):
+            with self.subTest(level=level):
+                first = generate_level(level, COLS, ROWS, random.Random(level))
+                second = generate_level(level, COLS, ROWS, random.Random(level))
+                self.assertEqual(layout_of(first), layout_of(second))
+
+    def test_level_contents_stand_on_floor(self):
+        level = generate_level(3, COLS, ROWS, random.Random(3))  # Rectangular rooms only below level 4
+        self.assertGreater(len(level.rooms), 1)
+        self.assertLessEqual(len(level.rooms), level.target_rooms)
+        tiles = [level.entrance, level.stairs.tile] + [item.tile for item in level.items] + level.enemies
+        for x, y in tiles:
+            self.assertFalse(level.walls.is_blocked(x, y), (x, y))
+        # The map border is always rock
+        self.assertTrue(all(level.walls.is_blocked(x, 0) for x in range(COLS)))
+
+    def test_create_corridor(self):
+        path = create_corridor((1, 1), (5, 3), COLS, ROWS)
+        self.assertEqual((path[0], path[-1]), ((1, 1), (5, 3)))
+        self.assertEqual(len(path), 7)  # Manhattan distance + 1
+        self.assertTrue(all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in zip(path, path[1:])))
+
+
+class TestConnectStairs(unittest.TestCase):
+    def setUp(self):
+        # Two pockets, two rock tiles apart at their closest
+        self.walls = OccupancyGrid.from_rows([
+            [1, 1, 1, 1, 1, 1, 1, 1],
+            [1, 0, 0, 1, 1, 1, 0, 1],
+            [1, 0, 0, 0, 1, 1, 0, 1],
+            [1, 1, 1, 1, 1, 1, 1, 1],
+        ])
+
+    def test_opens_the_fewest_tiles(self):
+        self.assertFalse(reachable(self.walls, (1, 1))[1 * 8 + 6])
+        self.assertEqual(connect_stairs(self.walls, (1, 1), (6, 1)), 2)
+        self.assertTrue(reachable(self.walls, (1, 1))[1 * 8 + 6])
+        self.assertEqual([x for x in range(8) if not self.walls.is_blocked(x, 2)], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(connect_stairs(self.walls, (1, 1), (6, 1)), 0)
+
+    def test_stairs_in_rock(self):
+        self.assertEqual(connect_stairs(self.walls, (1, 1), (3, 1)), 1)
+        self.assertFalse(self.walls.is_blocked(3, 1))
+
+    def test_generated_stairs_are_always_reachable(self):
+        for seed in range(30):
+            level = generate_level(1 + seed % 5, COLS, ROWS, random.Random(seed))
+            stairs_x, stairs_y = level.stairs.tile
+            self.assertTrue(reachable(level.walls, level.entrance)[stairs_y * COLS + stairs_x], seed)
+
+
+class TestDungeonCorpus(unittest.TestCase):
+    def test_dead_ends(self):
+        walls = OccupancyGrid.from_rows([
+            [1, 1, 1, 1, 1],
+            [1, 0, 0, 0, 1],
+            [1, 1, 1, 0, 1],
+            [1, 1, 1, 1, 1],
+        ])
+        self.assertEqual(dead_ends(walls), 2)
+
+    def test_rows_do_not_depend_on_chunking(self):
+        rows = []
+        self.assertEqual(generate_corpus([1, 5], 3, seed=4, workers=0, on_row=rows.append), 6)
+        again = []
+        generate_corpus([5], 3, seed=4, workers=0, on_row=again.append)
+        strip = lambda row: {key: value for key, value in row.items() if key != 'ms'}
+        self.assertEqual([strip(row) for row in rows[3:]], [strip(row) for row in again])
+        self.assertEqual([row['level_type'] for row in rows[::3]], ['cramped', 'cavernous'])
+
+
+if __name__ == '__main__':
+    unittest.main()
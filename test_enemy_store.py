@@ -0,0 +1,148 @@
+import unittest
+
+from enemy_store import DOWN, ENEMY_MOVE, RIGHT, EnemyStore
+from flow_field import DistanceField
+from spatial import OccupancyGrid
+from timer_wheel import TimerWheel
+
+# A corridor along the middle row of a small walled room
+LEVEL = [
+    [1, 1, 1, 1, 1, 1, 1, 1],
+    [1, 0, 0, 0, 0, 0, 0, 1],
+    [1, 0, 0, 0, 0, 0, 0, 1],
+    [1, 1, 1, 1, 1, 1, 1, 1],
+]
+
+
+def all_tiles(grid):
+    return [(x, y) for y in range(grid.rows) for x in range(grid.cols)]
+
+
+class TestEnemyStore(unittest.TestCase):
+    def setUp(self):
+        self.grid = OccupancyGrid.from_rows(LEVEL)
+        self.timers = TimerWheel()
+        self.store = EnemyStore(self.grid.cols, self.grid.rows, move_delay=3, capacity=2, timers=self.timers)
+        self.field = DistanceField()
+
+    def step(self):
+        return self.store.step([payload for kind, payload in self.timers.advance() if kind == ENEMY_MOVE])
+
+    def player_at(self, tile, vision=None):
+        self.field.update(self.grid, tile)
+        self.store.player_moved(tile, self.field.distances,
+                                all_tiles(self.grid) if vision is None else vision, wake_radius=8)
+
+    def test_add_grows_and_sets_stats(self):
+        for x in range(1, 7):
+            self.store.add(x, 1, level=2)
+        self.assertEqual(len(self.store), 6)
+        self.assertEqual(int(self.store.health[5]), 50)
+        self.assertEqual(int(self.store.attack[5]), 9)
+        self.assertEqual(list(self.store.at((3, 1))), [2])
+
+    def test_step_moves_towards_player_then_waits(self):
+        goblin = self.store.add(1, 1, level=1)
+        self.player_at((6, 1))
+        self.assertEqual(list(self.step()), [goblin])
+        self.assertEqual((int(self.store.x[goblin]), int(self.store.y[goblin])), (2, 1))
+        self.assertEqual(int(self.store.direction[goblin]), RIGHT)
+
+        # Nothing is due for move_delay ticks
+        for _ in range(3):
+            self.assertEqual(self.timers.advance(), [])
+        self.assertEqual(list(self.step()), [goblin])
+        self.assertEqual(list(self.store.at((3, 1))), [goblin])
+        self.assertEqual(len(self.store.at((2, 1))), 0)
+
+    def test_enemies_do_not_share_tiles(self):
+        self.store.add(1, 1, level=1)
+        self.store.add(1, 2, level=1)
+        self.store.add(3, 1, level=1)
+        self.player_at((4, 2))
+        self.step()
+        tiles = [(int(x), int(y)) for x, y in zip(self.store.x[:3], self.store.y[:3])]
+        self.assertEqual(len(set(tiles)), 3)
+
+    def test_enemies_that_cannot_see_the_player_stay(self):
+        goblin = self.store.add(1, 1, level=1)
+        self.player_at((6, 2), vision=[(6, 1)])
+        self.assertEqual(len(self.step()), 0)
+        self.assertEqual(int(self.store.direction[goblin]), DOWN)
+        # Idle enemies aren't scheduled until the player moves into view
+        self.assertEqual(len(self.timers), 0)
+        self.player_at((6, 1))
+        self.assertEqual(list(self.step()), [goblin])
+
+    def test_sleeping_enemies_drop_their_turn(self):
+        goblin = self.store.add(1, 1, level=1)
+        self.player_at((6, 1))
+        self.store.awake[goblin] = False
+        self.assertEqual(len(self.step()), 0)
+        self.assertFalse(self.store.pending[goblin])
+        self.assertEqual(len(self.timers), 0)
+
+    def test_budget_defers_the_rest_to_the_next_step(self):
+        store = EnemyStore(self.grid.cols, self.grid.rows, move_delay=3, timers=self.timers, budget_ms=0, batch=1)
+        self.store = store
+        goblins = [store.add(1, 1, level=1), store.add(1, 2, level=1)]
+        self.player_at((6, 1))
+        self.assertEqual(list(self.step()), [goblins[0]])  # Out of time after one batch
+        self.assertTrue(store.pending[goblins[1]])
+        self.assertEqual(list(self.step()), [goblins[1]])  # Goes first next tick
+        self.assertEqual((int(store.x[goblins[1]]), int(store.y[goblins[1]])), (2, 2))
+
+        self.timers.clear()
+        unlimited = self.store = EnemyStore(self.grid.cols, self.grid.rows, timers=self.timers, budget_ms=None, batch=1)
+        both = [unlimited.add(1, 1, level=1), unlimited.add(1, 2, level=1)]
+        self.player_at((6, 1))
+        self.assertEqual(sorted(self.step().tolist()), both)
+
+    def test_distant_enemies_sleep(self):
+        store = EnemyStore(40, 4)
+        near = store.add(2, 1, level=1)
+        far = store.add(30, 1, level=1)
+        store.player_moved((1, 1), [0] * (40 * 4), [], wake_radius=8)
+        self.assertTrue(store.awake[near])
+        self.assertFalse(store.awake[far])
+        store.player_moved((25, 1), [0] * (40 * 4), [], wake_radius=8)
+        self.assertTrue(store.awake[far])
+        # Just outside the wake radius but inside the margin: stays awake
+        store.player_moved((21, 1), [0] * (40 * 4), [], wake_radius=8)
+        self.assertTrue(store.awake[far])
+
+    def test_kill(self):
+        goblin = self.store.add(2, 1, level=1)
+        self.store.kill(goblin)
+        self.store.kill(goblin)
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(len(self.store.at((2, 1))), 0)
+        self.assertEqual(int(self.store.occupancy.sum()), 0)
+
+    def test_pack(self):
+        bumped = self.store.add(3, 1, level=1)
+        beside = self.store.add(4, 2, level=1)
+        asleep = self.store.add(2, 2, level=1)
+        self.store.add(6, 1, level=1)
+        self.store.awake[beside] = True
+        self.assertEqual(list(self.store.pack((3, 1))), [bumped, beside])
+        self.store.awake[asleep] = True
+        self.store.kill(beside)
+        self.assertEqual(list(self.store.pack((3, 1))), [bumped, asleep])
+
+    def test_pack_limit_keeps_the_tile_first(self):
+        beside = [self.store.add(4, 1, level=1) for _ in range(3)]
+        bumped = self.store.add(3, 1, level=1)
+        self.store.awake[beside] = True
+        self.assertEqual(list(self.store.pack((3, 1))), [bumped] + beside)
+        self.assertEqual(list(self.store.pack((3, 1), limit=2)), [bumped, beside[0]])
+
+    def test_visible(self):
+        self.store.add(1, 1, level=1)
+        seen = self.store.add(5, 2, level=1)
+        self.assertEqual(list(self.store.visible([(5, 2), (6, 2)])), [seen])
+        self.assertEqual(len(self.store.visible([])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
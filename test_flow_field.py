@@ -0,0 +1,53 @@
+import unittest
+
+from flow_field import DistanceField
+from spatial import OccupancyGrid
+
+# A wall with a single gap at the bottom: the goal is on the right-hand side
+LEVEL = [
+    [1, 1, 1, 1, 1, 1, 1],
+    [1, 0, 0, 1, 0, 0, 1],
+    [1, 0, 0, 1, 0, 0, 1],
+    [1, 0, 0, 0, 0, 0, 1],
+    [1, 1, 1, 1, 1, 1, 1],
+]
+
+
+class TestDistanceField(unittest.TestCase):
+    def setUp(self):
+        self.grid = OccupancyGrid.from_rows(LEVEL)
+        self.field = DistanceField()
+        self.field.update(self.grid, (4, 1))
+
+    def test_distances_route_around_walls(self):
+        self.assertEqual(self.field.distance((4, 1)), 0)
+        self.assertEqual(self.field.distance((5, 1)), 1)
+        # Straight-line distance is 2, but the path goes down through the gap
+        self.assertEqual(self.field.distance((2, 1)), 6)
+
+    def test_walls_are_unreachable(self):
+        self.assertIsNone(self.field.distance((3, 1)))
+        self.assertIsNone(self.field.distance((-1, 0)))
+
+    def test_update_only_rebuilds_on_change(self):
+        self.assertFalse(self.field.update(self.grid, (4, 1)))
+        self.assertTrue(self.field.update(self.grid, (5, 1)))
+        self.assertTrue(self.field.update(OccupancyGrid.from_rows(LEVEL), (5, 1)))
+
+    def test_downhill_goes_around_the_corner(self):
+        # Heading straight for the goal would walk into the wall at (3, 1)
+        self.assertEqual(self.field.downhill((2, 1)), (2, 2))
+
+    def test_downhill_respects_blocked(self):
+        blocked = {(2, 2)}
+        self.assertEqual(self.field.downhill((2, 1), blocked=blocked.__contains__), None)
+        self.assertEqual(self.field.downhill((2, 3), blocked={(3, 3)}.__contains__), None)
+        self.assertEqual(self.field.downhill((1, 3), blocked=blocked.__contains__), (2, 3))
+
+    def test_uphill_flees(self):
+        self.assertEqual(self.field.uphill((4, 2)), (4, 3))
+        self.assertIsNone(self.field.downhill((4, 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+from fov import FieldOfView, compute_visible
+from spatial import OccupancyGrid
+
+# An open room split by a wall with a doorway at (5, 3)
+LEVEL = [
+    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+    [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1],
+    [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1],
+    [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+    [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1],
+    [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1],
+    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+]
+
+
+class TestComputeVisible(unittest.TestCase):
+    def setUp(self):
+        self.grid = OccupancyGrid.from_rows(LEVEL)
+
+    def test_sees_own_room_and_bounding_walls(self):
+        visible = compute_visible(self.grid, (2, 2), 8)
+        for tile in [(1, 1), (4, 5), (2, 2), (0, 0), (5, 1)]:
+            self.assertIn(tile, visible)
+
+    def test_walls_block_sight(self):
+        visible = compute_visible(self.grid, (2, 1), 8)
+        self.assertNotIn((8, 1), visible)
+        self.assertNotIn((6, 1), visible)
+        self.assertNotIn((6, 5), visible)
+
+    def test_sees_through_doorway(self):
+        visible = compute_visible(self.grid, (2, 3), 8)
+        self.assertIn((8, 3), visible)
+
+    def test_radius(self):
+        visible = compute_visible(self.grid, (1, 3), 3)
+        self.assertIn((4, 3), visible)
+        self.assertNotIn((5, 3), visible)
+        self.assertEqual(visible[(4, 3)], 9)
+
+
+class TestFieldOfView(unittest.TestCase):
+    def setUp(self):
+        self.grid = OccupancyGrid.from_rows(LEVEL)
+        self.fov = FieldOfView(8)
+
+    def test_update_only_on_move(self):
+        self.assertTrue(self.fov.update(self.grid, (2, 2)))
+        self.assertFalse(self.fov.update(self.grid, (2, 2)))
+        self.assertTrue(self.fov.update(self.grid, (3, 2)))
+
+    def test_revisited_tiles_come_from_cache(self):
+        self.fov.update(self.grid, (2, 2))
+        first = self.fov.visible
+        self.fov.update(self.grid, (3, 2))
+        self.fov.update(self.grid, (2, 2))
+        self.assertIs(self.fov.visible, first)
+
+    def test_new_level_recomputes(self):
+        self.fov.update(self.grid, (2, 2))
+        self.assertTrue(self.fov.update(OccupancyGrid.from_rows(LEVEL), (2, 2)))
+
+    def test_is_visible_with_radius(self):
+        self.fov.update(self.grid, (1, 3))
+        self.assertTrue(self.fov.is_visible((8, 3)))
+        self.assertFalse(self.fov.is_visible((8, 3), radius=5))
+        self.assertFalse(self.fov.is_visible((8, 1)) and self.fov.is_visible((99, 99)))
+        self.assertIn((4, 3), self.fov.tiles_within(3))
+        self.assertNotIn((5, 3), self.fov.tiles_within(3))
+
+
+if __name__ == '__main__':
+    unittest.main()
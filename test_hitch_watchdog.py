@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from hitch_watchdog import HitchWatchdog
+
+
+def generate_level_slowly(seconds):
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        pass
+
+
+class TestHitchWatchdog(unittest.TestCase):
+    def setUp(self):
+        self.watchdog = HitchWatchdog(budget_ms=20, worst=2, interval_ms=1,
+                                      phases={('test_hitch_watchdog.py', 'generate_level_slowly'): 'generation'})
+        self.watchdog.start()
+        self.addCleanup(self.watchdog.stop)
+
+    def play(self, frame_seconds):
+        for seconds in frame_seconds:
+            self.watchdog.frame('explore')
+            generate_level_slowly(seconds)
+        self.watchdog.frame('explore')
+
+    def test_fast_frames_are_not_hitches(self):
+        self.play([0.001] * 20)
+        self.assertEqual((self.watchdog.frames, self.watchdog.hitches), (21, 0))
+        self.assertEqual(self.watchdog.log(), [])
+
+    def test_slow_frame_is_caught_in_the_act(self):
+        self.play([0.001, 0.08, 0.001])
+        [hitch] = self.watchdog.log()
+        self.assertEqual((hitch.frame, hitch.mode, hitch.phase), (2, 'explore', 'generation'))
+        self.assertGreaterEqual(hitch.ms, 80)
+        self.assertIn('generate_level_slowly', hitch.stack[-1])
+
+    def test_only_the_worst_are_kept(self):
+        self.play([0.03, 0.07, 0.05])
+        self.assertEqual(self.watchdog.hitches, 3)
+        self.assertEqual([hitch.frame for hitch in self.watchdog.log()], [2, 3])
+        path = os.path.join(tempfile.mkdtemp(), 'hitches.json')
+        self.watchdog.save(path)
+        with open(path) as f:
+            saved = json.load(f)
+        self.assertEqual((saved['budget_ms'], saved['frames'], saved['hitches']), (20, 4, 3))
+        self.assertEqual([hitch['frame'] for hitch in saved['worst']], [2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
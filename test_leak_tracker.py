@@ -0,0 +1,38 @@
+import unittest
+
+from leak_tracker import LeakTracker
+
+
+class TestLeakTracker(unittest.TestCase):
+    def setUp(self):
+        self.tracker = LeakTracker(window=3, min_growth=64 * 1024, out=None)
+        self.tracker.start()
+        self.addCleanup(self.tracker.stop)
+
+    def test_steady_memory_is_not_a_leak(self):
+        cache = []
+        for i in range(12):
+            # A bounded cache: fills, then churns
+            cache.append(bytearray(48 * 1024))
+            del cache[:-4]
+            self.assertIsNone(self.tracker.checkpoint('level start'))
+        self.assertEqual(self.tracker.summary()['level start'][0], 12)
+
+    def test_growing_memory_is_flagged_once(self):
+        kept = []
+        leaks = []
+        for i in range(10):
+            kept.append(bytearray(64 * 1024))
+            leaks.append(self.tracker.checkpoint('combat end'))
+        flagged = [leak for leak in leaks if leak is not None]
+        self.assertEqual(len(flagged), 1)
+        self.assertEqual(self.tracker.leaks, flagged)
+        self.assertIn('test_leak_tracker.py', str(flagged[0]))
+
+    def test_idle_when_not_tracing(self):
+        self.tracker.stop()
+        self.assertIsNone(LeakTracker().checkpoint('level start'))
+
+
+if __name__ == '__main__':
+    unittest.main()
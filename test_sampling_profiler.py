@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from sampling_profiler import SamplingProfiler
+
+
+def spin(seconds):
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        pass
+
+
+def draw_frame():
+    spin(0.15)
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = SamplingProfiler(interval_ms=1, phases={('test_sampling_profiler.py', 'draw_frame'): 'draw'})
+
+    def capture(self):
+        self.profiler.start()
+        self.assertTrue(self.profiler.running)
+        draw_frame()
+        spin(0.1)
+        self.profiler.stop()
+        self.assertFalse(self.profiler.running)
+
+    def test_samples_go_to_the_innermost_listed_phase(self):
+        self.capture()
+        phases = self.profiler.by_phase()
+        self.assertEqual(set(phases), {'draw', 'other'})
+        self.assertGreater(phases['draw'], phases['other'])
+        self.assertIn('draw', self.profiler.summary())
+
+    def test_exports(self):
+        self.capture()
+        folder = tempfile.mkdtemp()
+        self.profiler.write(os.path.join(folder, 'capture.folded'))
+        with open(os.path.join(folder, 'capture.folded')) as f:
+            lines = f.read().splitlines()
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertTrue(stack.startswith('draw;'))
+        self.assertIn('draw_frame (test_sampling_profiler.py:', stack)
+        self.assertEqual(sum(int(line.rsplit(' ', 1)[1]) for line in lines), sum(self.profiler.samples.values()))
+
+        self.profiler.write(os.path.join(folder, 'capture.json'))
+        with open(os.path.join(folder, 'capture.json')) as f:
+            profile = json.load(f)
+        frames = profile['shared']['frames']
+        sampled = profile['profiles'][0]
+        self.assertEqual(sampled['type'], 'sampled')
+        self.assertEqual(len(sampled['samples']), len(sampled['weights']))
+        self.assertTrue(all(0 <= index < len(frames) for stack in sampled['samples'] for index in stack))
+        self.assertEqual({frames[stack[0]]['name'] for stack in sampled['samples']}, {'draw', 'other'})
+
+    def test_idle_until_started(self):
+        self.profiler.stop()  # Not running: nothing to do
+        self.assertFalse(self.profiler.running)
+        self.assertEqual(self.profiler.summary(), "no samples in 0.00 s")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from combat_engine import ATTACK, DEFEND
+from session_record import (
+    CHOICE, CLICK, KEY, NO_HASH, QUIT, Desync, Session, SessionPlayer, SessionRecorder, pack_choice, state_hash,
+    unpack_choice,
+)
+
+KEYDOWN, QUIT_EVENT, MOUSEBUTTONDOWN = 2, 256, 1025
+
+
+def fake_pygame():
+    # Just enough of pygame for the recorder and player
+    event = SimpleNamespace(Event=lambda type, **attributes: SimpleNamespace(type=type, **attributes))
+    return SimpleNamespace(KEYDOWN=KEYDOWN, QUIT=QUIT_EVENT, MOUSEBUTTONDOWN=MOUSEBUTTONDOWN, event=event)
+
+
+class FakeAutoBattle:
+    def __init__(self, choices):
+        self.choices = list(choices)
+
+    def request(self, encounter):
+        pass
+
+    def poll(self, encounter):
+        return self.choices.pop(0) if self.choices else None
+
+
+class TestSessionRecord(unittest.TestCase):
+    def setUp(self):
+        self.pygame = fake_pygame()
+
+    def key(self, key):
+        return [self.pygame.event.Event(KEYDOWN, key=key)]
+
+    def record(self):
+        inputs = {1: self.key(13), 3: self.key(1073741903), 6: [self.pygame.event.Event(QUIT_EVENT)]}
+        modes = ['menu', 'explore', 'explore', 'combat', 'combat', 'explore']
+        recorder = SessionRecorder(self.pygame, Session(2 ** 64 - 1, 3, True),
+                                   source=lambda mode: inputs.get(recorder.tick, []))
+        party_ai = recorder.auto_battle(FakeAutoBattle([(0, ATTACK, 4, None), (1, DEFEND, None, None)]))
+        for mode in modes:
+            recorder(mode)
+            if mode == 'combat':
+                party_ai.poll(None)
+        recorder.session.state = state_hash('end')
+        return recorder.session
+
+    def test_choices_pack_into_one_value(self):
+        for choice in [(0, ATTACK, 4, None), (2, DEFEND, None, None), (1, 'skill', 0, 3)]:
+            self.assertEqual(unpack_choice(pack_choice(choice)), choice)
+
+    def test_saved_sessions_load_the_same(self):
+        session = self.record()
+        self.assertEqual([record[1] for record in session.records], [KEY, KEY, CHOICE, CHOICE, QUIT])
+        path = os.path.join(tempfile.mkdtemp(), 'run.session')
+        session.save(path)
+        self.assertEqual(os.path.getsize(path), 40 + 5 * 10)
+        loaded = Session.load(path)
+        self.assertEqual((loaded.seed, loaded.combat_speed, loaded.auto_battle, loaded.ticks, loaded.state),
+                         (2 ** 64 - 1, 3, True, 6, state_hash('end')))
+        self.assertEqual(loaded.records, session.records)
+        with self.assertRaises(ValueError):
+            Session(-1)
+
+    def test_replay_gives_back_the_same_input(self):
+        player = SessionPlayer(self.pygame, self.record())
+        party_ai = player.auto_battle()
+        got = []
+        for mode in ['menu', 'explore', 'explore', 'combat', 'combat', 'explore']:
+            got.append([(event.type, getattr(event, 'key', None)) for event in player(mode)])
+            if mode == 'combat':
+                got.append(party_ai.poll(None))
+        self.assertEqual(got, [[(KEYDOWN, 13)], [], [(KEYDOWN, 1073741903)], [], (0, ATTACK, 4, None),
+                               [], (1, DEFEND, None, None), [(QUIT_EVENT, None)]])
+        self.assertTrue(player.finished)
+        self.assertEqual(player('explore')[0].type, QUIT_EVENT)  # Past the end: quit
+
+    def test_replay_clicks_a_menu_button(self):
+        click = self.pygame.event.Event(MOUSEBUTTONDOWN, button=1, pos=(600, 437))
+        recorder = SessionRecorder(self.pygame, Session(9), source=lambda mode: [click] if mode == 'menu' else [])
+        recorder('explore')
+        recorder('menu')
+        self.assertEqual([record[1] for record in recorder.session.records], [CLICK])
+        path = os.path.join(tempfile.mkdtemp(), 'click.session')
+        recorder.session.save(path)
+        player = SessionPlayer(self.pygame, Session.load(path))
+        self.assertEqual(player('explore'), [])
+        replayed, = player('menu')
+        self.assertEqual((replayed.type, replayed.button, replayed.pos), (MOUSEBUTTONDOWN, 1, (600, 437)))
+        self.assertTrue(player.finished)
+
+    def test_diverging_replay_raises(self):
+        player = SessionPlayer(self.pygame, self.record())
+        player('menu')
+        player('explore')
+        with self.assertRaises(Desync):
+            player('popup')
+        # A decision that was never asked for
+        player = SessionPlayer(self.pygame, self.record())
+        for mode in ['menu', 'explore', 'explore', 'combat']:
+            player(mode)
+        with self.assertRaises(Desync):
+            player('combat')
+
+    def test_state_hash(self):
+        self.assertEqual(len(state_hash(1, b'x')), 16)
+        self.assertNotEqual(state_hash(1, b'x'), state_hash(1, b'y'))
+        self.assertNotEqual(state_hash(1), NO_HASH)
+
+
+if __name__ == '__main__':
+    unittest.main()
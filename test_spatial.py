@@ -0,0 +1,76 @@
+import unittest
+
+from spatial import OccupancyGrid, TileHash
+
+
+class TestOccupancyGrid(unittest.TestCase):
+    def test_from_rows(self):
+        """Rock cells are blocked and floor cells are open"""
+        grid = OccupancyGrid.from_rows([
+            [1, 1, 1],
+            [1, 0, 1],
+            [1, 0, 0],
+        ])
+        self.assertEqual((grid.cols, grid.rows), (3, 3))
+        self.assertTrue(grid.is_blocked(0, 0))
+        self.assertFalse(grid.is_blocked(1, 1))
+        self.assertFalse(grid.is_blocked(2, 2))
+
+    def test_out_of_bounds_is_blocked(self):
+        grid = OccupancyGrid(4, 3)
+        self.assertFalse(grid.is_blocked(3, 2))
+        self.assertTrue(grid.is_blocked(-1, 0))
+        self.assertTrue(grid.is_blocked(4, 0))
+        self.assertTrue(grid.is_blocked(0, 3))
+
+    def test_set_blocked(self):
+        grid = OccupancyGrid(4, 4)
+        grid.set_blocked(2, 1)
+        self.assertTrue(grid.is_blocked(2, 1))
+        grid.set_blocked(2, 1, False)
+        self.assertFalse(grid.is_blocked(2, 1))
+
+
+class TestTileHash(unittest.TestCase):
+    def test_move_updates_occupancy(self):
+        tiles = TileHash()
+        goblin = object()
+        tiles.add(goblin, (1, 1))
+        self.assertTrue(tiles.is_occupied((1, 1)))
+
+        tiles.move(goblin, (1, 1), (2, 1))
+        self.assertFalse(tiles.is_occupied((1, 1)))
+        self.assertTrue(tiles.is_occupied((2, 1)))
+        self.assertEqual(len(tiles), 1)
+
+    def test_ignore_self(self):
+        """An entity never blocks its own tile"""
+        tiles = TileHash()
+        goblin, orc = object(), object()
+        tiles.add(goblin, (3, 3))
+        self.assertFalse(tiles.is_occupied((3, 3), ignore=goblin))
+
+        # Two enemies spawned on the same tile still block each other
+        tiles.add(orc, (3, 3))
+        self.assertTrue(tiles.is_occupied((3, 3), ignore=goblin))
+
+    def test_remove(self):
+        tiles = TileHash()
+        goblin = object()
+        tiles.add(goblin, (0, 0))
+        tiles.remove(goblin, (0, 0))
+        tiles.remove(goblin, (0, 0))  # Removing twice is harmless
+        self.assertEqual(len(tiles), 0)
+        self.assertEqual(tiles.at((0, 0)), ())
+
+    def test_in_area(self):
+        tiles = TileHash()
+        near, far = object(), object()
+        tiles.add(near, (2, 2))
+        tiles.add(far, (30, 30))
+        self.assertEqual(list(tiles.in_area(0, 0, 5, 5)), [near])
+        self.assertEqual(set(tiles.in_area(0, 0, 40, 40)), {near, far})
+
+
+if __name__ == '__main__':
+    unittest.main()
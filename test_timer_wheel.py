@@ -0,0 +1,54 @@
+import unittest
+
+from timer_wheel import TimerWheel
+
+
+class TestTimerWheel(unittest.TestCase):
+    def test_events_fire_on_their_tick(self):
+        wheel = TimerWheel(size=8)
+        wheel.schedule(1, 'soon')
+        wheel.schedule(3, 'later')
+        wheel.schedule_many(3, ['a', 'b'])
+        self.assertEqual(wheel.advance(), ['soon'])
+        self.assertEqual(wheel.advance(), [])
+        self.assertEqual(wheel.advance(), ['later', 'a', 'b'])
+        self.assertEqual(len(wheel), 0)
+
+    def test_delay_is_at_least_one_tick(self):
+        wheel = TimerWheel(size=8)
+        self.assertEqual(wheel.schedule(0, 'now'), 1)
+        self.assertEqual(wheel.advance(), ['now'])
+
+    def test_events_beyond_one_revolution(self):
+        wheel = TimerWheel(size=4)
+        wheel.schedule(10, 'far')
+        wheel.schedule_many(6, ['x', 'y'])
+        wheel.schedule(2, 'near')
+        fired = {}
+        for _ in range(12):
+            for event in wheel.advance():
+                fired[event] = wheel.now
+        self.assertEqual(fired, {'near': 2, 'x': 6, 'y': 6, 'far': 10})
+
+    def test_repeating_event(self):
+        # Regeneration-style ticks reschedule themselves when they fire
+        wheel = TimerWheel(size=4)
+        wheel.schedule(5, 'regen')
+        ticks = []
+        for _ in range(20):
+            for event in wheel.advance():
+                ticks.append(wheel.now)
+                wheel.schedule(5, event)
+        self.assertEqual(ticks, [5, 10, 15, 20])
+
+    def test_clear(self):
+        wheel = TimerWheel(size=4)
+        wheel.schedule(1, 'a')
+        wheel.schedule(9, 'b')
+        wheel.clear()
+        self.assertEqual(len(wheel), 0)
+        self.assertEqual([wheel.advance() for _ in range(10)], [[]] * 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Timer wheel for game-tick scheduling.
+
+Entities register the tick of their next action instead of counting a
+cooldown down every frame. Each call to advance() moves time forward one tick
+and returns only the events that are due, so the cost of a tick is
+proportional to the number of due events, not the number of entities.
+
+Events within one revolution of the wheel go straight into their slot; ones
+further in the future wait in a heap and are due on the same tick either way.
+Events are opaque to the wheel; the game uses (kind, payload) tuples so enemy
+moves, status effects and regeneration ticks can share one wheel.
+"""
+import heapq
+
+
+class TimerWheel:
+    def __init__(self, size=256):
+        self.size = size
+        self.now = 0
+        self._slots = [[] for _ in range(size)]
+        self._later = []  # (tick, sequence, event) beyond one revolution
+        self._sequence = 0
+
+    def __len__(self):
+        return sum(len(slot) for slot in self._slots) + len(self._later)
+
+    def clear(self):
+        for slot in self._slots:
+            slot.clear()
+        self._later.clear()
+
+    def schedule(self, delay, event):
+        """Fire event after delay ticks (at least one)."""
+        tick = self.now + max(1, delay)
+        if tick - self.now < self.size:
+            self._slots[tick % self.size].append(event)
+        else:
+            self._sequence += 1
+            heapq.heappush(self._later, (tick, self._sequence, event))
+        return tick
+
+    def schedule_many(self, delay, events):
+        """Fire every event in events after the same delay."""
+        tick = self.now + max(1, delay)
+        if tick - self.now < self.size:
+            self._slots[tick % self.size].extend(events)
+        else:
+            for event in events:
+                self._sequence += 1
+                heapq.heappush(self._later, (tick, self._sequence, event))
+        return tick
+
+    def advance(self):
+        """Move to the next tick and return the events due on it."""
+        self.now += 1
+        index = self.now % self.size
+        due = self._slots[index]
+        self._slots[index] = []
+        later = self._later
+        while later and later[0][0] <= self.now:
+            due.append(heapq.heappop(later)[2])
+        return due